@@ -2,7 +2,6 @@
 Auxiliary functions for surface modeling
 '''
 import numpy as np
-import copy
 
 from .foil import Section, transform, interplot_from_curve, curve_intersect
 from .surface import Surface
@@ -48,11 +47,11 @@ def section_flap(sec: Section, ratio, angle, dy_axis=None):
 
     #* Update 3D section
     xu_, xl_, yu_, yl_ = transform(xu_new, xl_new, yu_new, yl_new, 
-        scale=sec.chord, rot=sec.twist, dx=sec.xLE, dy=sec.yLE, proj=True)
+        scale=sec.chord, rot=sec.twist, dx=sec.xLE, dy=sec.yLE, proj=True, dtype=sec.x.dtype)
 
     sec.x = np.concatenate((np.flip(xl_),xu_[1:]), axis=0)
     sec.y = np.concatenate((np.flip(yl_),yu_[1:]), axis=0)
-    sec.z = np.ones(2*nn-1)*sec.zLE
+    sec.z = np.full_like(sec.x, sec.zLE)
 
 
 class WingVariableCamber(Surface):
@@ -68,6 +67,8 @@ class WingVariableCamber(Surface):
     nn:      number of points of upper/lower section
     ns:      number of spanwise
     project: True ~ projected chord length does not change when twisted
+    dtype:   floating-point precision of sections and surfaces, None means get_dtype()
+    vectorized: True ~ generate all sections by one SectionArray
 
     flap_loc:   list [2*n_flap], z coordinates of the flap ends. 
                 [z_flap1_1, z_flap1_2, z_flap2_1, z_flap2_2, ...]
@@ -95,6 +96,8 @@ class WingVariableCamber(Surface):
         project = True
         nn = 1001
         ns = 101
+        dtype = None
+        vectorized = False
 
         if 'tail' in kwargs.keys():
             tail = kwargs['tail']
@@ -108,7 +111,13 @@ class WingVariableCamber(Surface):
         if 'ns' in kwargs.keys():
             ns = kwargs['ns']
 
-        super().__init__(n_sec=n_sec, name=name, nn=nn, ns=ns, project=project)
+        if 'dtype' in kwargs.keys():
+            dtype = kwargs['dtype']
+
+        if 'vectorized' in kwargs.keys():
+            vectorized = kwargs['vectorized']
+
+        super().__init__(n_sec=n_sec, name=name, nn=nn, ns=ns, project=project, dtype=dtype, vectorized=vectorized)
 
         self.read_setting(fname, tail=tail)
 
@@ -246,7 +255,7 @@ class DeflectSurf():
         angle:  deflection angle (degree), positive means downwards deflection
         '''
 
-        surf2 = copy.deepcopy(self.surfs)
+        surf2 = self.surf.clone()
 
 
 
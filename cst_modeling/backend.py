@@ -0,0 +1,385 @@
+'''
+This is a module containing the registry of compute kernels.
+
+The hot loops of cst_modeling (e.g., curve_curvature, check_valid_batch, toCylinder)
+call kernels by name. The 'numpy' backend provides vectorized kernels and is always available.
+The 'numba' backend provides JIT-compiled kernels when numba is installed.
+
+The backend is selected by the environment variable CST_MODELING_BACKEND, or by set_backend().
+Kernels that are not provided by the selected backend fall back to the 'numpy' kernels.
+'''
+import os
+import warnings
+
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+
+#* Registered kernels, {name: {backend: function}}
+_KERNELS = {}
+
+#* Sample inputs of the self-test, {name: function that returns the arguments}
+_SAMPLES = {}
+
+#* Name of the selected backend
+_BACKEND = 'numpy'
+
+
+def register_kernel(name: str, backend='numpy', sample=None):
+    '''
+    Decorator that registers a compute kernel.
+
+    >>> @register_kernel('curve_curvature', backend='numpy')
+    >>> def _curve_curvature_numpy(x, y): ...
+
+    ### Inputs:
+    ```text
+    name:       kernel name
+    backend:    backend name, e.g., 'numpy', 'numba'
+    sample:     optional function without inputs, returns a tuple of arguments for self_test()
+    ```
+    '''
+    def decorator(func):
+
+        if name not in _KERNELS.keys():
+            _KERNELS[name] = {}
+
+        _KERNELS[name][backend] = func
+
+        if sample is not None:
+            _SAMPLES[name] = sample
+
+        return func
+
+    return decorator
+
+def get_kernel(name: str, backend=None):
+    '''
+    Get the kernel of the selected backend, or the 'numpy' kernel if it is not provided.
+
+    >>> func = get_kernel(name, backend=None)
+
+    ### Inputs:
+    ```text
+    name:       kernel name
+    backend:    backend name, None means the selected backend (see set_backend)
+    ```
+    '''
+    if name not in _KERNELS.keys():
+        raise Exception('Kernel [%s] is not registered'%(name))
+
+    if backend is None:
+        backend = _BACKEND
+
+    kernels = _KERNELS[name]
+
+    if backend in kernels.keys():
+        return kernels[backend]
+
+    return kernels['numpy']
+
+def available_backends() -> list:
+    '''
+    List of backends that can be selected
+    '''
+    backends = ['numpy']
+
+    if numba is not None:
+        backends.append('numba')
+
+    return backends
+
+def get_backend() -> str:
+    '''
+    Name of the selected backend
+    '''
+    return _BACKEND
+
+def set_backend(backend: str):
+    '''
+    Select the backend of compute kernels.
+
+    >>> set_backend('numba')
+
+    ### Inputs:
+    ```text
+    backend:    'numpy' (default) or 'numba'
+    ```
+    '''
+    global _BACKEND
+
+    if backend not in available_backends():
+        raise Exception('Backend [%s] is not available, select from %s'%(backend, str(available_backends())))
+
+    _BACKEND = backend
+
+def self_test(backend=None, rtol=1e-8, atol=1e-10, info=False) -> dict:
+    '''
+    Check the kernels of a backend against the 'numpy' kernels.
+
+    >>> errors = self_test(backend='numba')
+
+    ### Inputs:
+    ```text
+    backend:    backend name, None means the selected backend
+    rtol, atol: tolerance of the parity check
+    info:       if True, print the result of each kernel
+    ```
+
+    ### Return:
+    ```text
+    errors:     dict, {name: maximum absolute difference},
+                only kernels provided by the backend are tested
+    ```
+
+    ### Note:
+    ```text
+    Raise an exception if any kernel does not agree with the 'numpy' kernel.
+    ```
+    '''
+    # Kernels of cst_modeling are registered when the modules are imported
+    import cst_modeling.foil
+
+    if backend is None:
+        backend = _BACKEND
+
+    errors = {}
+    failed = []
+
+    for name in sorted(_KERNELS.keys()):
+
+        kernels = _KERNELS[name]
+        if backend == 'numpy' or backend not in kernels.keys() or name not in _SAMPLES.keys():
+            continue
+
+        args = _SAMPLES[name]()
+        out0 = kernels['numpy'](*args)
+        out1 = kernels[backend](*args)
+
+        if not isinstance(out0, tuple):
+            out0 = (out0,)
+            out1 = (out1,)
+
+        err = 0.0
+        ok  = True
+        for a0, a1 in zip(out0, out1):
+            a0 = np.asarray(a0, dtype=float)
+            a1 = np.asarray(a1, dtype=float)
+            err = max(err, float(np.max(np.abs(a0-a1), initial=0.0)))
+            ok  = ok and a0.shape == a1.shape and np.allclose(a0, a1, rtol=rtol, atol=atol)
+
+        errors[name] = err
+        if not ok:
+            failed.append(name)
+
+        if info:
+            print('Kernel %-24s %-8s max error = %.3e'%(name, backend, err))
+
+    if len(failed) > 0:
+        raise Exception('Backend [%s] does not agree with numpy in kernels %s'%(backend, str(failed)))
+
+    return errors
+
+
+#* ===========================================
+#* Sample inputs of the self-test
+#* ===========================================
+
+def _sample_curve(nn=201):
+    '''
+    A smooth airfoil-like curve on a cosine distribution
+    '''
+    x = 0.5*(1.0-np.cos(np.linspace(0.0, np.pi, nn)))
+    y = 0.6*np.sqrt(x)*(1.0-x) + 0.02*np.sin(3*np.pi*x)
+    return x, y
+
+def _sample_cst_curve():
+    x, _ = _sample_curve()
+    coef = np.array([0.12, 0.15, 0.11, 0.20, 0.08, 0.16, 0.10])
+    return x, coef, 0.5, 1.0, np.float64
+
+def _sample_curve_curvature():
+    return _sample_curve()
+
+def _sample_curve_curvature_batch():
+    x, y = _sample_curve()
+    return x, np.array([y, -0.5*y, y+0.01*np.cos(5*np.pi*x)])
+
+def _sample_to_cylinder():
+    x, y = _sample_curve()
+    return x, 2.0+y, -1.0
+
+def _sample_stretch_fixed_point():
+    x, y = _sample_curve()
+    return x, y, 0.1, -0.05, x[0], y[0], x[-1], y[-1]
+
+def _sample_bump_gaussian():
+    x, _ = _sample_curve()
+    return x, 0.03, 0.01, 0.2
+
+def _sample_bump_hicks_henne():
+    x, _ = _sample_curve()
+    return x, np.log(0.5)/np.log(0.4), 0.01, 3
+
+_SAMPLES.update({
+    'cst_curve':            _sample_cst_curve,
+    'curve_curvature':      _sample_curve_curvature,
+    'curve_curvature_batch': _sample_curve_curvature_batch,
+    'to_cylinder':          _sample_to_cylinder,
+    'stretch_fixed_point':  _sample_stretch_fixed_point,
+    'bump_gaussian':        _sample_bump_gaussian,
+    'bump_hicks_henne':     _sample_bump_hicks_henne,
+})
+
+
+#* ===========================================
+#* Numba kernels
+#* ===========================================
+
+if numba is not None:
+
+    @numba.njit(cache=True)
+    def _cst_curve_loop(x, coef, xn1, xn2):
+        nn = x.shape[0]
+        n  = coef.shape[0] - 1
+        y  = np.zeros(nn)
+        for i in range(nn):
+            C = x[i]**xn1 * (1.0-x[i])**xn2
+            K = 1.0
+            s = 0.0
+            for k in range(n+1):
+                s += coef[k] * K * x[i]**k * (1.0-x[i])**(n-k)
+                K = K*(n-k)/(k+1)
+            y[i] = C*s
+        return y
+
+    @register_kernel('cst_curve', backend='numba')
+    def _cst_curve_numba(x, coef, xn1, xn2, dtype):
+        x = np.ascontiguousarray(x, dtype=np.float64)
+        coef = np.ascontiguousarray(coef, dtype=np.float64)
+        return _cst_curve_loop(x, coef, float(xn1), float(xn2)).astype(dtype)
+
+    @numba.njit(cache=True)
+    def _curve_curvature_loop(x, y):
+        nn = x.shape[0]
+        curv = np.zeros(nn)
+        for i in range(1, nn-1):
+            a = np.hypot(x[i-1]-x[i], y[i-1]-y[i])
+            b = np.hypot(x[i]-x[i+1], y[i]-y[i+1])
+            c = np.hypot(x[i+1]-x[i-1], y[i+1]-y[i-1])
+            p = 0.5*(a+b+c)
+            t = max(p*(p-a)*(p-b)*(p-c), 0.0)
+            R = a*b*c
+            if R <= 1.0E-12:
+                curv_ = 0.0
+            else:
+                curv_ = 4.0*np.sqrt(t)/R
+
+            a1 = x[i] - x[i-1]
+            a2 = y[i] - y[i-1]
+            b1 = x[i+1] - x[i-1]
+            b2 = y[i+1] - y[i-1]
+            if a1*b2 < a2*b1:
+                curv_ = -curv_
+
+            curv[i] = curv_
+
+        curv[0] = curv[1]
+        curv[-1] = curv[-2]
+        return curv
+
+    @register_kernel('curve_curvature', backend='numba')
+    def _curve_curvature_numba(x, y):
+        return _curve_curvature_loop(np.ascontiguousarray(x, dtype=np.float64),
+                                    np.ascontiguousarray(y, dtype=np.float64))
+
+    @numba.njit(cache=True)
+    def _curve_curvature_batch_loop(x, Y):
+        curv = np.zeros(Y.shape)
+        for k in range(Y.shape[0]):
+            curv[k] = _curve_curvature_loop(x, Y[k])
+        return curv
+
+    @register_kernel('curve_curvature_batch', backend='numba')
+    def _curve_curvature_batch_numba(x, Y):
+        return _curve_curvature_batch_loop(np.ascontiguousarray(x, dtype=np.float64),
+                                    np.ascontiguousarray(Y, dtype=np.float64))
+
+    @numba.njit(cache=True)
+    def _to_cylinder_loop(X, Z, coef):
+        nn = X.shape[0]
+        x = np.zeros(nn)
+        y = np.zeros(nn)
+        for i in range(nn):
+            theta = X[i]/Z[i] * coef
+            x[i] = Z[i]*np.cos(theta)
+            y[i] = Z[i]*np.sin(theta)
+        return x, y
+
+    @register_kernel('to_cylinder', backend='numba')
+    def _to_cylinder_numba(X, Z, coef):
+        return _to_cylinder_loop(np.ascontiguousarray(X, dtype=np.float64),
+                                np.ascontiguousarray(Z, dtype=np.float64), float(coef))
+
+    @numba.njit(cache=True)
+    def _stretch_fixed_point_loop(x, y, dx, dy, xm, ym, xf, yf):
+        lm = np.hypot(xm-xf, ym-yf)
+        x_ = x.copy()
+        y_ = y.copy()
+        for i in range(x.shape[0]):
+            rr = np.hypot(x[i]-xf, y[i]-yf) / lm
+            x_[i] = x_[i] + rr*dx
+            y_[i] = y_[i] + rr*dy
+        return x_, y_
+
+    @register_kernel('stretch_fixed_point', backend='numba')
+    def _stretch_fixed_point_numba(x, y, dx, dy, xm, ym, xf, yf):
+        return _stretch_fixed_point_loop(np.ascontiguousarray(x, dtype=np.float64),
+                    np.ascontiguousarray(y, dtype=np.float64),
+                    float(dx), float(dy), float(xm), float(ym), float(xf), float(yf))
+
+    @numba.njit(cache=True)
+    def _bump_gaussian_loop(x, xc, h, s):
+        dy = np.zeros(x.shape[0])
+        for i in range(x.shape[0]):
+            if xc-s<0.0 and x[i]<xc:
+                sigma = xc/3.5
+            elif  xc+s>1.0 and x[i]>xc:
+                sigma = (1.0-xc)/3.5
+            else:
+                sigma = s/6.0
+            aa = -(x[i]-xc)**2/2.0/sigma**2
+            dy[i] = h*np.exp(aa)
+        return dy
+
+    @register_kernel('bump_gaussian', backend='numba')
+    def _bump_gaussian_numba(x, xc, h, s):
+        return _bump_gaussian_loop(np.ascontiguousarray(x, dtype=np.float64), float(xc), float(h), float(s))
+
+    @numba.njit(cache=True)
+    def _bump_hicks_henne_loop(x, s0, h, Pow):
+        dy = np.zeros(x.shape[0])
+        for i in range(x.shape[0]):
+            rr = np.pi*x[i]**s0
+            dy[i] = h*np.sin(rr)**Pow
+        return dy
+
+    @register_kernel('bump_hicks_henne', backend='numba')
+    def _bump_hicks_henne_numba(x, s0, h, Pow):
+        return _bump_hicks_henne_loop(np.ascontiguousarray(x, dtype=np.float64), float(s0), float(h), int(Pow))
+
+
+#* ===========================================
+#* Backend selected by environment variable
+#* ===========================================
+
+_backend_env = os.environ.get('CST_MODELING_BACKEND', 'numpy').strip().lower()
+
+if _backend_env in available_backends():
+    _BACKEND = _backend_env
+else:
+    warnings.warn('CST_MODELING_BACKEND=%s is not available, use numpy backend'%(_backend_env), RuntimeWarning)
@@ -0,0 +1,335 @@
+'''
+This is a module containing functions to convert airfoil coordinate files to CST coefficients.
+
+Airfoil files in Selig and Lednicer formats are read, split into upper and lower surfaces,
+normalized to unit chord, and fitted by CST in a process pool.
+The coefficients and fitting residuals are written to one numpy archive (.npz),
+which is also the checkpoint for resuming an interrupted conversion.
+'''
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from cst_modeling.foil import cst_basis, fit_curve, rotate
+
+
+def read_airfoil(fname: str):
+    '''
+    Read an airfoil coordinate file in Selig or Lednicer format
+
+    >>> name, xu, yu, xl, yl = read_airfoil(fname)
+
+    ### Inputs:
+    ```text
+    fname:  airfoil file name
+    ```
+
+    ### Return:
+    ```text
+    name:           airfoil name (the first line of the file)
+    xu, yu, xl, yl: upper and lower surface points from leading edge to trailing edge (ndarray)
+    ```
+
+    ### Note:
+    ```text
+    Selig:      name line, then points from the trailing edge,
+                over the upper surface to the leading edge, and back along the lower surface.
+    Lednicer:   name line, then the numbers of upper and lower surface points,
+                then upper surface points (LE to TE), then lower surface points (LE to TE).
+    ```
+    '''
+    if not os.path.exists(fname):
+        raise Exception(fname+' does not exist for airfoil reading')
+
+    with open(fname, 'r') as f:
+        lines = f.readlines()
+
+    name = lines[0].strip()
+
+    points = []
+    for line in lines[1:]:
+        line = line.replace(',', ' ').split()
+        if len(line) < 2:
+            continue
+        try:
+            points.append([float(line[0]), float(line[1])])
+        except ValueError:
+            continue
+
+    if len(points) < 5:
+        raise Exception(fname+' does not contain enough airfoil points')
+
+    points = np.array(points)
+
+    #* Lednicer format
+    n_upp, n_low = points[0]
+    if n_upp > 1.5 and n_low > 1.5 and n_upp == int(n_upp) and n_low == int(n_low):
+
+        n_upp = int(n_upp)
+        n_low = int(n_low)
+        if points.shape[0] != 1 + n_upp + n_low:
+            raise Exception(fname+' has a wrong number of points in Lednicer format')
+
+        upp = points[1:1+n_upp]
+        low = points[1+n_upp:]
+
+    #* Selig format
+    else:
+        iLE = np.argmin(points[:,0])
+        upp = np.flip(points[:iLE+1], axis=0)
+        low = points[iLE:]
+
+    if np.mean(upp[:,1]) < np.mean(low[:,1]):
+        upp, low = low, upp
+
+    return name, upp[:,0], upp[:,1], low[:,0], low[:,1]
+
+def normalize_airfoil(xu, yu, xl, yl):
+    '''
+    Normalize the airfoil, so that the leading edge is at (0,0),
+    the middle point of the trailing edge is at (1,0).
+
+    >>> xu, yu, xl, yl, tail = normalize_airfoil(xu, yu, xl, yl)
+
+    ### Inputs:
+    ```text
+    xu, yu, xl, yl: upper and lower surface points from leading edge to trailing edge (ndarray)
+    ```
+
+    ### Return:
+    ```text
+    xu, yu, xl, yl: normalized airfoil (ndarray), x is in [0,1]
+    tail:           tail thickness of the normalized airfoil
+    ```
+    '''
+    # Leading edge, i.e., the point with minimum x
+    if xu[0] <= xl[0]:
+        x0, y0 = xu[0], yu[0]
+    else:
+        x0, y0 = xl[0], yl[0]
+
+    # Middle point of the trailing edge
+    x1 = 0.5*(xu[-1]+xl[-1])
+    y1 = 0.5*(yu[-1]+yl[-1])
+
+    chord = np.sqrt((x1-x0)**2+(y1-y0)**2)
+    twist = np.arctan2(y1-y0, x1-x0)*180/np.pi
+
+    xu, yu, _ = rotate((xu-x0)/chord, (yu-y0)/chord, None, angle=-twist, axis='Z')
+    xl, yl, _ = rotate((xl-x0)/chord, (yl-y0)/chord, None, angle=-twist, axis='Z')
+
+    # Clip roundoff errors of the rotation
+    xu = np.clip(xu, 0.0, 1.0)
+    xl = np.clip(xl, 0.0, 1.0)
+
+    return xu, yu, xl, yl, yu[-1]-yl[-1]
+
+def fit_surface(x, y, n_order=7, xn1=0.5, xn2=1.0):
+    '''
+    Fit one surface by fit_curve, and calculate the root mean square error
+
+    >>> coef, rms = fit_surface(x, y, n_order, xn1, xn2)
+    '''
+    # Each file has its own points, so the basis is not cached (same as fit_curve)
+    coef = fit_curve(x, y, n_order=n_order, xn1=xn1, xn2=xn2)
+
+    x_ = (x-x[0])/(x[-1]-x[0])
+    y_ = np.dot(cst_basis(x_, n_order, xn1=xn1, xn2=xn2, cache=False), coef) + x_*y[-1]
+
+    return coef, np.sqrt(np.mean((y_-y)**2))
+
+def convert_airfoil(fname: str, n_order=7, xn1=0.5, xn2=1.0) -> dict:
+    '''
+    Read, normalize and fit an airfoil file
+
+    >>> result = convert_airfoil(fname, n_order, xn1, xn2)
+
+    ### Return:
+    ```text
+    result: dict of name, cst_u, cst_l, tail, residual (root mean square error of upper and lower surfaces)
+    ```
+    '''
+    name, xu, yu, xl, yl = read_airfoil(fname)
+
+    xu, yu, xl, yl, tail = normalize_airfoil(xu, yu, xl, yl)
+
+    cst_u, res_u = fit_surface(xu, yu, n_order=n_order, xn1=xn1, xn2=xn2)
+    cst_l, res_l = fit_surface(xl, yl, n_order=n_order, xn1=xn1, xn2=xn2)
+
+    if not np.all(np.isfinite(cst_u)) or not np.all(np.isfinite(cst_l)):
+        raise Exception('CST fitting is not finite')
+
+    return {'name': name, 'cst_u': cst_u, 'cst_l': cst_l, 'tail': tail,
+            'residual': np.array([res_u, res_l])}
+
+def _convert_airfoil_safe(fname: str, n_order: int, xn1: float, xn2: float):
+    '''
+    Worker of the process pool, returns (fname, result, error message)
+    '''
+    try:
+        return fname, convert_airfoil(fname, n_order=n_order, xn1=xn1, xn2=xn2), ''
+    except Exception as e:
+        return fname, None, '%s: %s'%(type(e).__name__, str(e))
+
+def convert_database(files: list, fname='airfoils.npz', n_order=7, xn1=0.5, xn2=1.0,
+                        n_process=None, n_save=500, resume=True, info=True) -> dict:
+    '''
+    Convert airfoil coordinate files to CST coefficients in a process pool.
+
+    >>> data = convert_database(files, fname='airfoils.npz', n_order=7)
+
+    ### Inputs:
+    ```text
+    files:      list of airfoil file names (Selig or Lednicer format)
+    fname:      name of the archive file (.npz)
+    n_order:    number of CST parameters
+    xn1,2:      CST parameters
+    n_process:  number of processes, None means the number of CPUs, 1 means no process pool
+    n_save:     write the archive every n_save converted files
+    resume:     if True, skip the files that are already converted in the archive
+    info:       if True, print the progress
+    ```
+
+    ### Return:
+    ```text
+    data:   dict of the archive (see load_database)
+    ```
+
+    ### Note:
+    ```text
+    Files that failed are recorded in the archive with their error messages,
+    and they are tried again when resuming.
+    On Windows, the process pool must be used under `if __name__ == "__main__":`.
+    ```
+    '''
+    data = _empty_database(n_order, xn1, xn2)
+
+    if resume and os.path.exists(fname):
+        data_ = load_database(fname)
+        if data_['n_order'] == n_order and data_['xn1'] == xn1 and data_['xn2'] == xn2:
+            data = data_
+            data['error_files'] = []
+            data['error_messages'] = []
+        elif info:
+            print('Archive %s has different CST settings, it is not resumed'%(fname))
+
+    done  = set(data['files'])
+    todo  = [f for f in files if f not in done]
+    n_all = len(todo)
+
+    if info:
+        print('Convert %d airfoils (%d already in archive)'%(n_all, len(files)-n_all))
+
+    t0 = time.perf_counter()
+    n_done = 0
+
+    def collect(fname_, result, message):
+        nonlocal n_done
+        n_done += 1
+
+        if result is None:
+            data['error_files'].append(fname_)
+            data['error_messages'].append(message)
+        else:
+            data['files'].append(fname_)
+            for key in ['name', 'cst_u', 'cst_l', 'tail', 'residual']:
+                data[key].append(result[key])
+
+        if n_done % n_save == 0 or n_done == n_all:
+            save_database(fname, data)
+
+            if info:
+                print('  Converted %d/%d files, %d errors, %.1f s'%(
+                    n_done, n_all, len(data['error_files']), time.perf_counter()-t0))
+
+    if n_process == 1:
+        for f in todo:
+            collect(*_convert_airfoil_safe(f, n_order, xn1, xn2))
+
+    else:
+        with ProcessPoolExecutor(max_workers=n_process) as executor:
+            futures = [executor.submit(_convert_airfoil_safe, f, n_order, xn1, xn2) for f in todo]
+            for future in as_completed(futures):
+                collect(*future.result())
+
+    if n_all == 0:
+        save_database(fname, data)
+
+    return load_database(fname)
+
+def _empty_database(n_order: int, xn1: float, xn2: float) -> dict:
+    return {'files': [], 'name': [], 'cst_u': [], 'cst_l': [], 'tail': [], 'residual': [],
+            'error_files': [], 'error_messages': [], 'n_order': n_order, 'xn1': xn1, 'xn2': xn2}
+
+def save_database(fname: str, data: dict):
+    '''
+    Write the converted airfoils to a compressed numpy archive.
+    The archive is replaced atomically, so that it is always complete.
+
+    >>> save_database(fname, data)
+    '''
+    n_order = data['n_order']
+
+    arrays = {
+        'files':    np.array(data['files'], dtype=str),
+        'name':     np.array(data['name'], dtype=str),
+        'cst_u':    np.array(data['cst_u'], dtype=float).reshape(-1, n_order),
+        'cst_l':    np.array(data['cst_l'], dtype=float).reshape(-1, n_order),
+        'tail':     np.array(data['tail'], dtype=float),
+        'residual': np.array(data['residual'], dtype=float).reshape(-1, 2),
+        'error_files':      np.array(data['error_files'], dtype=str),
+        'error_messages':   np.array(data['error_messages'], dtype=str),
+        'n_order':  np.array(n_order),
+        'xn1':      np.array(data['xn1']),
+        'xn2':      np.array(data['xn2']),
+    }
+
+    fname_tmp = fname + '.tmp'
+    try:
+        with open(fname_tmp, 'wb') as f:
+            np.savez_compressed(f, **arrays)
+    except BaseException:
+        os.remove(fname_tmp)
+        raise
+
+    os.replace(fname_tmp, fname)
+
+def load_database(fname: str) -> dict:
+    '''
+    Read the archive of converted airfoils
+
+    >>> data = load_database(fname)
+
+    ### Return:
+    ```text
+    data:   dict of
+            files, name:    lists of file names and airfoil names
+            cst_u, cst_l:   lists of CST coefficients (ndarray [n_order])
+            tail:           list of tail thickness
+            residual:       list of root mean square errors of upper and lower surfaces (ndarray [2])
+            error_files, error_messages: lists of files that failed and the error messages
+            n_order, xn1, xn2: CST settings
+    ```
+    '''
+    if not os.path.exists(fname):
+        raise Exception(fname+' does not exist for airfoil database')
+
+    with np.load(fname, allow_pickle=False) as archive:
+
+        data = {
+            'files':    archive['files'].tolist(),
+            'name':     archive['name'].tolist(),
+            'cst_u':    list(archive['cst_u']),
+            'cst_l':    list(archive['cst_l']),
+            'tail':     archive['tail'].tolist(),
+            'residual': list(archive['residual']),
+            'error_files':      archive['error_files'].tolist(),
+            'error_messages':   archive['error_messages'].tolist(),
+            'n_order':  int(archive['n_order']),
+            'xn1':      float(archive['xn1']),
+            'xn2':      float(archive['xn2']),
+        }
+
+    return data
@@ -2,14 +2,21 @@
 This is a module containing functions to construct an airfoil
 '''
 import copy
+import functools
+import hashlib
+import math
+import os
+import threading
+from collections import OrderedDict
 
 import numpy as np
-from numpy.linalg import lstsq
+from numpy.linalg import lstsq, svd
 from scipy import spatial
 from scipy.interpolate import interp1d
-from scipy.special import factorial
+from scipy.special import gammaln, xlog1py, xlogy
 
-from .naca import naca
+from .backend import get_kernel, register_kernel
+from .naca import naca, naca_batch
 
 import matplotlib.pyplot as plt
 
@@ -17,8 +24,18 @@ import matplotlib.pyplot as plt
 class BasicSection():
     '''
     Section: 3D curve and 2D unit curve
+
+    ### Attributes:
+    ```text
+    dirty:  True if parameters are changed after the last section(), 
+            it is set when any attribute in _params is assigned.
+            Changing arrays in place (e.g., sec.cst_u[0] = 0.1) is not tracked.
+    ```
     '''
+    _params = ('xLE', 'yLE', 'zLE', 'chord', 'twist', 'thick_set')
+
     def __init__(self, thick=None, chord=1.0, twist=0.0):
+        self.dirty = True
         self.xLE = 0.0
         self.yLE = 0.0
         self.zLE = 0.0
@@ -38,6 +55,11 @@ class BasicSection():
         self.y = np.zeros(1)
         self.z = np.zeros(1)
 
+    def __setattr__(self, name, value):
+        if name in self._params:
+            object.__setattr__(self, 'dirty', True)
+        object.__setattr__(self, name, value)
+
     def set_params(self, init=False, **kwargs):
         '''
         Set parameters of the section
@@ -81,7 +103,7 @@ class BasicSection():
         if 'thick' in kwargs.keys():
             self.thick_set = kwargs['thick']
 
-    def section(self, nn=1001, flip_x=False, proj=True):
+    def section(self, nn=1001, flip_x=False, proj=True, dtype=None):
         '''
         ### Functions:
         ```text
@@ -94,30 +116,38 @@ class BasicSection():
         nn:     total amount of points (it's here for function BasicSurface.geo_secs)
         flip_x: True ~ flip section.xx in reverse order
         proj:   True => for unit airfoil, the rotation keeps the projection length the same
+        dtype:  floating-point precision of the 3D curve, None means get_dtype()
         ```
         '''
         if not isinstance(self.xx, np.ndarray):
             raise Exception('The 2D curve has not been constructed')
 
+        dtype = get_dtype(dtype)
+
         #* Flip xx
         if flip_x:
             self.xx = np.flip(self.xx)
 
-        #* Transform to 3D for open section
+        #* Transform to 3D for open section (same as transform)
         if isinstance(self.yy, np.ndarray):
-            self.x, _, self.y, _ = transform(self.xx, self.xx, self.yy, self.yy, 
-                scale=self.chord, rot=self.twist, dx=self.xLE, dy=self.yLE, proj=proj)
+            M = transform_matrix(scale=self.chord, rot=self.twist, 
+                    x0=self.xx[0]+self.xLE, y0=self.yy[0]+self.yLE, dx=self.xLE, dy=self.yLE, proj=proj)
 
-            self.z = np.ones_like(self.x)*self.zLE
+            self.x, self.y = apply_transform(M, self.xx, self.yy, dtype=dtype)
+            self.z = np.full_like(self.x, self.zLE)
 
-        #* Transform to 3D for closed section
+        #* Transform to 3D for closed section (same as transform)
         if isinstance(self.yu, np.ndarray):
-            xu_, xl_, yu_, yl_ = transform(self.xx, self.xx, self.yu, self.yl, 
-                scale=self.chord, rot=self.twist, dx=self.xLE, dy=self.yLE, proj=proj)
+            M = transform_matrix(scale=self.chord, rot=self.twist, 
+                    x0=self.xx[0]+self.xLE, y0=0.5*(self.yu[0]+self.yl[0])+self.yLE, dx=self.xLE, dy=self.yLE, proj=proj)
+
+            xx = np.concatenate((np.flip(self.xx), self.xx[1:]), axis=0)
+            yy = np.concatenate((np.flip(self.yl), self.yu[1:]), axis=0)
 
-            self.x = np.concatenate((np.flip(xl_),xu_[1:]), axis=0)
-            self.y = np.concatenate((np.flip(yl_),yu_[1:]), axis=0)
-            self.z = np.ones_like(self.x)*self.zLE
+            self.x, self.y = apply_transform(M, xx, yy, dtype=dtype)
+            self.z = np.full_like(self.x, self.zLE)
+
+        self.dirty = False
 
     def copyfrom(self, other):
         '''
@@ -141,11 +171,38 @@ class BasicSection():
         self.y = other.y.copy()
         self.z = other.z.copy()
 
+    def clone(self):
+        '''
+        Copy-on-write clone of the section, i.e., all attributes are copied,
+        and this section and the clone hold the same read-only views of the arrays (see share_array).
+        Use copyfrom or copy.deepcopy for an independent copy.
+
+        >>> sec_new = sec.clone()
+
+        ### Note:
+        ```text
+        In-place operators on the arrays of either section make a copy (e.g., sec.x += 1.0),
+        item assignment (e.g., sec.x[0] = 0.0) raises an error, 
+        so that a write on one section is never seen by the other.
+        ```
+        '''
+        other = copy.copy(self)
+        for key, value in list(self.__dict__.items()):
+            value = share_array(value)
+            # Not by __setattr__, the parameters are unchanged
+            self.__dict__[key] = value
+            other.__dict__[key] = value
+
+        return other
+
 
 class Section(BasicSection):
     '''
     Section 3D curve generated by CST foil (upper & lower surface)
     '''
+    _params = BasicSection._params + ('tail', 'cst_u', 'cst_l', 
+                'refine_u', 'refine_l', 'cst_flip_u', 'cst_flip_l')
+
     def __init__(self, thick=None, chord=1.0, twist=0.0, tail=0.0):
 
         super().__init__(thick=thick, chord=chord, twist=twist)
@@ -220,7 +277,7 @@ class Section(BasicSection):
             if isinstance(aa_, np.ndarray):
                 self.cst_flip_l = aa_.copy()
 
-    def section(self, cst_u=None, cst_l=None, nn=1001, flip_x=False, proj=True):
+    def section(self, cst_u=None, cst_l=None, nn=1001, flip_x=False, proj=True, dtype=None):
         '''
         Generating the section (3D) by cst_foil. 
 
@@ -237,42 +294,70 @@ class Section(BasicSection):
         cst_l:  CST coefficients of lower surface (ndarray, optional)
         flip_x: True ~ flip section.xx in reverse order
         proj:   True => for unit airfoil, the rotation keeps the projection length the same
+        dtype:  floating-point precision of the section, None means get_dtype()
+        ```
+
+        ### Note:
+        ```text
+        If SECTION_CACHE is enabled, the results are taken from (and stored in) the cache,
+        which is keyed by a fingerprint of all parameters of the section.
+        The cache stores copies of the arrays, and the section gets writable copies from it.
         ```
         '''
+        dtype = get_dtype(dtype)
+
         #* Update CST parameters
         if isinstance(cst_u, np.ndarray) and isinstance(cst_l, np.ndarray):
             self.cst_u = cst_u.copy()
             self.cst_l = cst_l.copy()
 
+        #* Take the section from the cache
+        key = None
+        if SECTION_CACHE.enabled:
+            key = ('section', parameter_fingerprint(
+                self.cst_u, self.cst_l, self.refine_u, self.refine_l, self.cst_flip_u, self.cst_flip_l,
+                self.tail, self.thick_set, self.chord, self.twist, self.xLE, self.yLE, self.zLE,
+                nn, flip_x, proj, np.dtype(dtype).str))
+
+            value = SECTION_CACHE.get(key)
+            if value is not None:
+                self.xx, self.yu, self.yl, self.thick, self.RLE, self.x, self.y, self.z = [
+                    v.copy() if isinstance(v, np.ndarray) else v for v in value]
+                self.dirty = False
+                return
+
         #* Construct airfoil with CST parameters
         self.xx, self.yu, self.yl, self.thick, self.RLE = cst_foil(
-            nn, self.cst_u, self.cst_l, t=self.thick_set, tail=self.tail)
+            nn, self.cst_u, self.cst_l, t=self.thick_set, tail=self.tail, dtype=dtype)
 
         #* Refine the airfoil by incremental curves
-        yu_i = np.zeros(nn)
-        yl_i = np.zeros(nn)
+        yu_i = np.zeros(nn, dtype=dtype)
+        yl_i = np.zeros(nn, dtype=dtype)
 
         if isinstance(self.refine_u, np.ndarray):
-            _, y_tmp = cst_curve(nn, self.refine_u, x=self.xx)
+            _, y_tmp = cst_curve(nn, self.refine_u, x=self.xx, dtype=dtype)
             yu_i += y_tmp
 
         if isinstance(self.refine_l, np.ndarray):
-            _, y_tmp = cst_curve(nn, self.refine_l, x=self.xx)
+            _, y_tmp = cst_curve(nn, self.refine_l, x=self.xx, dtype=dtype)
             yl_i += y_tmp
 
         #* Add round tail with incremental curves
         if isinstance(self.cst_flip_u, np.ndarray):
-            _, y_tmp = cst_curve(nn, self.cst_flip_u, x=1.0-self.xx)
+            _, y_tmp = cst_curve(nn, self.cst_flip_u, x=1.0-self.xx, dtype=dtype)
             yu_i += y_tmp
 
         if isinstance(self.cst_flip_l, np.ndarray):
-            _, y_tmp = cst_curve(nn, self.cst_flip_l, x=1.0-self.xx)
+            _, y_tmp = cst_curve(nn, self.cst_flip_l, x=1.0-self.xx, dtype=dtype)
             yl_i += y_tmp
 
         self.yu, self.yl = foil_increment_curve(self.xx, self.yu, self.yl, yu_i=yu_i, yl_i=yl_i, t=self.thick_set)
 
         #* Transform to 3D
-        super().section(flip_x=flip_x, proj=proj)
+        super().section(flip_x=flip_x, proj=proj, dtype=dtype)
+
+        if key is not None:
+            SECTION_CACHE.put(key, (self.xx, self.yu, self.yl, self.thick, self.RLE, self.x, self.y, self.z), copy_arrays=True)
 
     def copyfrom(self, other):
         '''
@@ -299,6 +384,8 @@ class OpenSection(BasicSection):
     '''
     Section 3D curve generated by CST curve (open curve)
     '''
+    _params = BasicSection._params + ('cst', 'refine', 'cst_flip')
+
     def __init__(self, thick=None, chord=1.0, twist=0.0):
 
         super().__init__(thick=thick, chord=chord, twist=twist)
@@ -346,7 +433,7 @@ class OpenSection(BasicSection):
             if isinstance(aa_, np.ndarray):
                 self.cst_flip = aa_.copy()
 
-    def section(self, cst=None, nn=1001, flip_x=False, proj=True):
+    def section(self, cst=None, nn=1001, flip_x=False, proj=True, dtype=None):
         '''
         Generating the section (3D) by cst_curve. 
 
@@ -362,24 +449,27 @@ class OpenSection(BasicSection):
         cst:    CST coefficients of the curve (ndarray, optional)
         flip_x: True ~ flip section.xx in reverse order
         proj:   True => for unit airfoil, the rotation keeps the projection length the same
+        dtype:  floating-point precision of the section, None means get_dtype()
         ```
         '''
+        dtype = get_dtype(dtype)
+
         #* Update CST parameters
         if isinstance(cst, np.ndarray):
             self.cst = cst.copy()
 
         #* Construct curve with CST parameters
-        self.xx, self.yy = cst_curve(nn, self.cst)
+        self.xx, self.yy = cst_curve(nn, self.cst, dtype=dtype)
 
         #* Refine the geometry with an incremental curve
         if isinstance(self.refine, np.ndarray):
-            _, y_i = cst_curve(nn, self.refine, x=self.xx)
-            self.yy += y_i
+            _, y_i = cst_curve(nn, self.refine, x=self.xx, dtype=dtype)
+            self.yy = self.yy + y_i
 
         #* Add round tail with an incremental curve
         if isinstance(self.cst_flip, np.ndarray):
-            _, y_i = cst_curve(nn, self.cst_flip, x=1.0-self.xx)
-            self.yy += y_i
+            _, y_i = cst_curve(nn, self.cst_flip, x=1.0-self.xx, dtype=dtype)
+            self.yy = self.yy + y_i
 
         #* Apply thickness
         self.thick = np.max(self.yy, axis=0)
@@ -388,7 +478,7 @@ class OpenSection(BasicSection):
             self.thick = self.thick_set
 
         #* Transform to 3D
-        super().section(flip_x=flip_x, proj=proj)
+        super().section(flip_x=flip_x, proj=proj, dtype=dtype)
 
     def copyfrom(self, other):
         '''
@@ -405,340 +495,1369 @@ class OpenSection(BasicSection):
         self.cst_flip = copy.deepcopy(other.cst_flip)
 
 
-#* ===========================================
-#* Static functions
-#* ===========================================
-
-def cst_foil(nn, coef_upp, coef_low, x=None, t=None, tail=0.0):
+class SectionArray():
     '''
-    Constructing upper and lower curves of an airfoil based on CST method
-
-    CST:    class shape transfermation method (Kulfan, 2008)
+    Sections stored as arrays, so that all sections are generated by one pass of batch operations.
+    The CST coefficients of different numbers are padded by degree elevation (see elevate_cst),
+    which does not change the curves.
 
-    >>> x_, yu, yl, t0, R0 = cst_foil()
+    >>> array = SectionArray(secs)
+    >>> array.section(nn=1001, flip_x=False, proj=True, dtype=None)
+    >>> array.update_sections(secs)
 
     ### Inputs:
     ```text
-    nn:         total amount of points
-    coef_upp:   CST coefficients of upper surface (ndarray)
-    coef_low:   CST coefficients of lower surface (ndarray)
-    x:          point x [0,1] (optional ndarray, size is nn)
-    t:          relative maximum thickness (optional)
-    tail:       relative tail thickness (optional)
+    secs:   list of Section, OpenSection or BasicSection objects (the same class)
     ```
 
-    ### Return
-    x (ndarray), y_upp (ndarray), y_low (ndarray), t0, R0
+    ### Attributes:
+    ```text
+    kind:           'closed' (Section), 'open' (OpenSection) or 'basic' (BasicSection)
+    xLE, yLE, zLE, chord, twist, tail:  ndarray [n_sec]
+    thick_set:      ndarray [n_sec], NaN means no thickness constraint
+    cst_u, cst_l, refine_u, refine_l, cst_flip_u, cst_flip_l:   
+                    ndarray [n_sec, n_order] of Section (None if no section has it)
+    cst, refine, cst_flip:  ndarray [n_sec, n_order] of OpenSection
+    xx:             ndarray [nn], 2D unit curve x,
+                    or ndarray [n_sec, nn] if BasicSection objects have different xx
+    yu, yl, yy:     ndarray [n_sec, nn], 2D unit curves
+    thick, RLE:     ndarray [n_sec]
+    x, y, z:        ndarray [n_sec, 2*nn-1] (closed) or [n_sec, nn], 3D curves
+    ```
     '''
-    x_, yu = cst_curve(nn, coef_upp, x=x)
-    x_, yl = cst_curve(nn, coef_low, x=x)
-    
-    thick = yu-yl
-    it = np.argmax(thick)
-    t0 = thick[it]
-
-    # Apply thickness constraint
-    if t is not None:
-        r  = (t-tail*x_[it])/t0
-        t0 = t
-        yu = yu * r
-        yl = yl * r
+    def __init__(self, secs: list):
 
-    # Add tail
-    for i in range(nn):
-        yu[i] += 0.5*tail*x_[i]
-        yl[i] -= 0.5*tail*x_[i]
+        if len(secs) == 0:
+            raise Exception('SectionArray needs at least one section')
 
-    # Calculate leading edge radius
-    x_RLE = 0.005
-    yu_RLE = interplot_from_curve(x_RLE, x_, yu)
-    yl_RLE = interplot_from_curve(x_RLE, x_, yl)
-    R0, _ = find_circle_3p([0.0,0.0], [x_RLE,yu_RLE], [x_RLE,yl_RLE])
+        if isinstance(secs[0], Section):
+            self.kind = 'closed'
+        elif isinstance(secs[0], OpenSection):
+            self.kind = 'open'
+        else:
+            self.kind = 'basic'
+
+        if not self.batchable(secs):
+            raise Exception('Sections in SectionArray must be the same class, '
+                            'and BasicSection objects must have 2D curves of the same size')
+
+        self.n_sec = len(secs)
+        self.xLE   = np.array([sec.xLE for sec in secs], dtype=np.float64)
+        self.yLE   = np.array([sec.yLE for sec in secs], dtype=np.float64)
+        self.zLE   = np.array([sec.zLE for sec in secs], dtype=np.float64)
+        self.chord = np.array([sec.chord for sec in secs], dtype=np.float64)
+        self.twist = np.array([sec.twist for sec in secs], dtype=np.float64)
+
+        self.xx = None
+        self.yu = None
+        self.yl = None
+        self.yy = None
+        self.thick = np.zeros(self.n_sec)
+        self.RLE   = np.zeros(self.n_sec)
+        self.x = None
+        self.y = None
+        self.z = None
+
+        if self.kind == 'closed':
+            # Section applies the thickness when it is not None
+            self.thick_set = np.array([np.nan if sec.thick_set is None else sec.thick_set for sec in secs], dtype=np.float64)
+            self.tail  = np.array([sec.tail for sec in secs], dtype=np.float64)
+            self.cst_u = self._stack([sec.cst_u for sec in secs])
+            self.cst_l = self._stack([sec.cst_l for sec in secs])
+            self.refine_u   = self._stack([sec.refine_u for sec in secs])
+            self.refine_l   = self._stack([sec.refine_l for sec in secs])
+            self.cst_flip_u = self._stack([sec.cst_flip_u for sec in secs])
+            self.cst_flip_l = self._stack([sec.cst_flip_l for sec in secs])
+
+        elif self.kind == 'open':
+            # OpenSection applies the thickness when it is a float
+            self.thick_set = np.array([sec.thick_set if isinstance(sec.thick_set, float) else np.nan for sec in secs], dtype=np.float64)
+            self.tail  = np.zeros(self.n_sec)
+            self.cst      = self._stack([sec.cst for sec in secs])
+            self.refine   = self._stack([sec.refine for sec in secs])
+            self.cst_flip = self._stack([sec.cst_flip for sec in secs])
 
-    return x_, yu, yl, t0, R0
+        else:
+            self.thick_set = np.full(self.n_sec, np.nan)
+            self.tail  = np.zeros(self.n_sec)
 
-def cst_foil_fit(xu, yu, xl, yl, n_order=7):
-    '''
-    Using CST method to fit an airfoil
+            if all([np.array_equal(sec.xx, secs[0].xx) for sec in secs]):
+                self.xx = np.array(secs[0].xx, dtype=np.float64)
+            else:
+                self.xx = np.array([sec.xx for sec in secs], dtype=np.float64)
+            if isinstance(secs[0].yy, np.ndarray):
+                self.yy = np.array([sec.yy for sec in secs])
+            if isinstance(secs[0].yu, np.ndarray):
+                self.yu = np.array([sec.yu for sec in secs])
+                self.yl = np.array([sec.yl for sec in secs])
+
+    def __len__(self):
+        return self.n_sec
+
+    @staticmethod
+    def batchable(secs: list) -> bool:
+        '''
+        True if the sections can be stored in one SectionArray, i.e., they are the same class,
+        and BasicSection objects have constructed 2D curves of the same size
 
-    This function allows the airfoil has non-zero tail thickness.
-    Also allows the airfoil chord length not equals to one.
+        >>> flag = SectionArray.batchable(secs)
+        '''
+        if len(secs) == 0 or any([type(sec) is not type(secs[0]) for sec in secs]):
+            return False
 
-    >>> cst_u, cst_l = cst_foil_fit(xu, yu, xl, yl, n_order=7)
+        if isinstance(secs[0], (Section, OpenSection)):
+            return True
 
-    ### Inputs:
-    ```text
-    xu, yu:  upper surface points (ndarray)
-    xl, yl:  lower surface points (ndarray)
-    n_order: number of CST parameters
-    ```
+        names = ['xx', 'yy'] if isinstance(secs[0].yy, np.ndarray) else ['xx', 'yu', 'yl']
+        for sec in secs:
+            for name in names:
+                a = getattr(sec, name)
+                if not isinstance(a, np.ndarray) or a.shape != secs[0].xx.shape:
+                    return False
 
-    ### Return: 
-    cst_u, cst_l (ndarray)
-    '''
-    cst_u = fit_curve(xu, yu, n_order=n_order)
-    cst_l = fit_curve(xl, yl, n_order=n_order)
-    return cst_u, cst_l
+        return True
 
-def foil_bump_modify(x: np.array, yu: np.array, yl: np.array,
-            xc: float, h: float, s: float, side=1, n_order=0,
-            return_cst=False, keep_tmax=True):
-    '''
-    Add bumps on the airfoil
+    @staticmethod
+    def _stack(coefs: list):
+        '''
+        Stack CST coefficients to a matrix padded by degree elevation, None is zero.
+        Return None if all coefficients are None.
+        '''
+        coefs = [c if isinstance(c, np.ndarray) else None for c in coefs]
+        n_order = [c.shape[0] for c in coefs if c is not None]
+        if len(n_order) == 0:
+            return None
 
-    >>> yu_new, yl_new (, cst_u, cst_l) = foil_bump_modify(
-    >>>         x: np.array, yu: np.array, yl: np.array, 
-    >>>         xc: float, h: float, s: float, side=1,
-    >>>         n_order=0, return_cst=False, keep_tmax=True)
+        n_max = max(n_order)
+        matrix = np.zeros((len(coefs), n_max))
+        for i, c in enumerate(coefs):
+            if c is not None:
+                matrix[i] = elevate_cst(c, n_max)
 
-    ### Inputs:
-    ```text
-    x, yu, yl:  current airfoil (ndarray)
-    xc:         x of the bump center
-    h:          relative height of the bump (to maximum thickness)
-    s:          span of the bump
-    side:       +1/-1 upper/lower side of the airfoil
-    n_order:    if specified (>0), then use CST to fit the new foil
-    return_cst: if True, also return cst_u, cst_l when n_order > 0
-    keep_tmax:  if True, keep the maximum thickness unchanged
-    ```
+        return matrix
 
-    ### Return:
-    yu_new, yl_new (ndarray)
-    '''
-    yu_new = yu.copy()
-    yl_new = yl.copy()
-    t0 = np.max(yu_new-yl_new)
+    def section(self, nn=1001, flip_x=False, proj=True, dtype=None):
+        '''
+        Generating all sections (3D), same as the section() of each section object
 
-    yu_ = yu.copy()
-    yl_ = yl.copy()
+        >>> array.section(nn=1001, flip_x=False, proj=True, dtype=None)
 
-    if xc<0.1 or xc>0.9:
-        kind = 'H'
-    else:
-        kind = 'G'
+        ### Inputs:
+        ```text
+        nn:     total amount of points (not used by BasicSection)
+        flip_x: True ~ flip xx in reverse order
+        proj:   True => for unit airfoil, the rotation keeps the projection length the same
+        dtype:  floating-point precision of the sections, None means get_dtype()
+        ```
+        '''
+        dtype = get_dtype(dtype)
 
-    if side > 0:
-        yu_new = add_bump(x, yu_new, xc, h*t0, s, kind=kind)
-    else:
-        yl_new = add_bump(x, yl_new, xc, h*t0, s, kind=kind)
+        if self.kind == 'closed':
+            self._section_closed(nn, dtype)
+        elif self.kind == 'open':
+            self._section_open(nn, dtype)
 
-    if keep_tmax:
+        if flip_x:
+            self.xx = np.flip(self.xx, axis=-1)
 
-        it = np.argmax(yu_new-yl_new)
-        tu = np.abs(yu_new[it])
-        tl = np.abs(yl_new[it])
+        #* Transform to 3D, the same as transform() for each section
+        x0 = self.xx[...,0] + self.xLE
 
-        if side > 0:
-            rl = (t0-tu)/tl
-            yl_new = rl * np.array(yl_new)
+        if self.yy is not None:
+            xx = self.xx
+            yy = self.yy
+            y0 = self.yy[:,0] + self.yLE
         else:
-            ru = (t0-tl)/tu
-            yu_new = ru * np.array(yu_new)
+            xx = np.concatenate((np.flip(self.xx, axis=-1), self.xx[...,1:]), axis=-1)
+            yy = np.concatenate((np.flip(self.yl, axis=1), self.yu[:,1:]), axis=1)
+            y0 = 0.5*(self.yu[:,0]+self.yl[:,0]) + self.yLE
 
-        t0 = None
+        M = transform_matrix(scale=self.chord, rot=self.twist, x0=x0, y0=y0, dx=self.xLE, dy=self.yLE, proj=proj)
 
-    if n_order > 0:
-        # CST reverse
-        tail = yu[-1] - yl[-1]
-        cst_u, cst_l = cst_foil_fit(x, yu_new, x, yl_new, n_order=n_order)
-        _, yu_new, yl_new, _, _ = cst_foil(x.shape[0], cst_u, cst_l, x=x, t=t0, tail=tail)
-    else:
-        cst_u = None
-        cst_l = None
-    
-    if return_cst:
-        return yu_new, yl_new, cst_u, cst_l
-    else:
-        return yu_new, yl_new
+        self.x, self.y = apply_transform(M, xx, yy, dtype=dtype)
 
-def foil_tcc(x, yu, yl, info=True):
-    '''
-    Calculate thickness, curvature, camber distribution.
+        self.z = np.broadcast_to(self.zLE.astype(dtype)[:,None], self.x.shape).copy()
 
-    >>> thickness, curv_u, curv_l, camber = foil_tcc(x, yu, yl, info=True)
+    def _section_closed(self, nn: int, dtype):
+        '''
+        2D unit airfoils of Section.section()
+        '''
+        t = self.thick_set
+        xx, yu, yl, self.thick, self.RLE = cst_foil_batch(nn, self.cst_u, self.cst_l,
+                                                t=t, tail=self.tail, dtype=dtype)
 
-    ### Inputs:
-    ```text
-    x, yu, yl: current airfoil (ndarray)
-    ```
+        #* Refine the airfoil by incremental curves
+        yu_i = np.zeros((self.n_sec, nn), dtype=dtype)
+        yl_i = np.zeros((self.n_sec, nn), dtype=dtype)
 
-    ### Return: 
-    thickness, curv_u, curv_l, camber (ndarray)
-    '''
-    curv_u = curve_curvature(x, yu)
-    curv_l = curve_curvature(x, yl)
+        if self.refine_u is not None:
+            yu_i += cst_curve_batch(nn, self.refine_u, x=xx, dtype=dtype)[1]
 
-    thickness = yu-yl
-    camber = 0.5*(yu+yl)
-    for i in range(x.shape[0]):
-        if info and thickness[i]<0:
-            print('Unreasonable Airfoil: negative thickness')
+        if self.refine_l is not None:
+            yl_i += cst_curve_batch(nn, self.refine_l, x=xx, dtype=dtype)[1]
 
-    return thickness, curv_u, curv_l, camber
+        #* Add round tail with incremental curves
+        if self.cst_flip_u is not None:
+            yu_i += cst_curve_batch(nn, self.cst_flip_u, x=1.0-xx, dtype=dtype)[1]
 
-def check_valid(x, yu, yl, RLE=0.0, neg_tcri=0.0) -> list:
-    '''
-    Check if the airfoil is reasonable by rules
+        if self.cst_flip_l is not None:
+            yl_i += cst_curve_batch(nn, self.cst_flip_l, x=1.0-xx, dtype=dtype)[1]
 
-    >>> rule_invalid = check_valid(x, yu, yl, RLE=0.0)
+        #* Same as foil_increment_curve
+        tail = yu[:,-1] - yl[:,-1]
+        tail_ = np.where(tail > 0.0, tail, 0.0)[:,None]
+        yu = yu - 0.5*tail_*xx + yu_i
+        yl = yl + 0.5*tail_*xx + yl_i
 
-    ### Inputs:
-    ```text
-    x, yu, yl: current airfoil (ndarray)
-    RLE:       The leading edge radius of this airfoil
-    neg_tcri:  critical value for checking negative thickness
-               e.g., neg_tcri = -0.01, then only invalid when the thickness is smaller than -0.01
-    ```
+        thick = yu - yl
+        it = np.argmax(thick, axis=1)
+        t0 = thick[np.arange(self.n_sec), it]
+        r  = np.where(np.isnan(t), 1.0, (t-tail*xx[it])/t0)[:,None]
 
-    ### Rules:
-    ```text
-    1:  negative thickness
-    2:  maximum thickness point location
-    3:  extreme points of thickness
-    4:  maximum curvature
-    5:  maximum camber within x [0.2,0.7]
-    6:  RLE if provided
-    7:  convex LE
-    ```
+        self.xx = xx
+        self.yu = (yu*r + 0.5*tail_*xx).astype(dtype, copy=False)
+        self.yl = (yl*r - 0.5*tail_*xx).astype(dtype, copy=False)
+        self.yy = None
 
-    ### Return:
-    rule_invalid: list, 0 means valid
-    '''
-    thickness, curv_u, curv_l, camber = foil_tcc(x, yu, yl, info=False)
-    nn = x.shape[0]
+    def _section_open(self, nn: int, dtype):
+        '''
+        2D unit curves of OpenSection.section()
+        '''
+        xx, yy = cst_curve_batch(nn, self.cst, dtype=dtype)
 
-    n_rule = 10
-    rule_invalid = [0 for _ in range(n_rule)]
-
-    #* Rule 1: negative thickness
-    if np.min(thickness) < neg_tcri:
-        rule_invalid[0] = 1
-
-    #* Rule 2: maximum thickness point location
-    i_max = np.argmax(thickness)
-    t0    = thickness[i_max]
-    x_max = x[i_max]
-    if x_max<0.15 or x_max>0.75:
-        rule_invalid[1] = 1
-
-    #* Rule 3: extreme points of thickness
-    n_extreme = 0
-    for i in range(nn-2):
-        a1 = thickness[i+2]-thickness[i+1]
-        a2 = thickness[i]-thickness[i+1]
-        if a1*a2>=0.0:
-            n_extreme += 1
-    if n_extreme>2:
-        rule_invalid[2] = 1
-
-    #* Rule 4: maximum curvature
-    cur_max_u = 0.0
-    cur_max_l = 0.0
-    for i in range(nn):
-        if x[i]<0.1:
-            continue
-        cur_max_u = max(cur_max_u, abs(curv_u[i]))
-        cur_max_l = max(cur_max_l, abs(curv_l[i]))
-
-    if cur_max_u>5 or cur_max_l>5:
-        rule_invalid[3] = 1
-
-    #* Rule 5: Maximum camber within x [0.2,0.7]
-    cam_max = 0.0
-    for i in range(nn):
-        if x[i]<0.2 or x[i]>0.7:
-            continue
-        cam_max = max(cam_max, abs(camber[i]))
-
-    if cam_max>0.025:
-        rule_invalid[4] = 1
-    
-    #* Rule 6: RLE
-    if RLE>0.0 and RLE<0.005:
-        rule_invalid[5] = 1
+        #* Refine the geometry with an incremental curve
+        if self.refine is not None:
+            yy += cst_curve_batch(nn, self.refine, x=xx, dtype=dtype)[1]
 
-    if RLE>0.0 and RLE/t0<0.01:
-        rule_invalid[5] = 1
+        #* Add round tail with an incremental curve
+        if self.cst_flip is not None:
+            yy += cst_curve_batch(nn, self.cst_flip, x=1.0-xx, dtype=dtype)[1]
 
-    #* Rule 7: convex LE
-    ii = int(0.1*nn)+1
-    a0 = thickness[i_max]/x[i_max]
-    au = yu[ii]/x[ii]/a0
-    al = -yl[ii]/x[ii]/a0
+        #* Apply thickness
+        scaled = np.logical_not(np.isnan(self.thick_set))
+        thick = np.max(yy, axis=1)
+        yy[scaled] = yy[scaled]/thick[scaled,None]*self.thick_set[scaled,None]
 
-    if au<1.0 or al<1.0:
-        rule_invalid[6] = 1
-    
-    #if sum(rule_invalid)<=0:
-    #    np.set_printoptions(formatter={'float': '{: 0.6f}'.format}, linewidth=100)
-    #    print(np.array([x_max, n_extreme, cur_max_u, cur_max_l, cam_max, RLE/t0, au, al]))
+        self.xx = xx
+        self.yy = yy
+        self.thick = np.where(scaled, self.thick_set, thick)
 
-    return rule_invalid
+    def update_sections(self, secs: list):
+        '''
+        Write the results to the section objects, 
+        the arrays of each section are views of the rows of this SectionArray
 
-def foil_increment(x, yu, yl, coef_upp, coef_low, t=None):
-    '''
-    Add cst curve by incremental curves
+        >>> array.update_sections(secs)
+        '''
+        if len(secs) != self.n_sec:
+            raise Exception('Number of sections is different from the SectionArray')
 
-    >>> yu_, yl_ = foil_increment(x, yu, yl, coef_upp, coef_low, t=None)
+        for i, sec in enumerate(secs):
+            sec.xx = self.xx[i].copy() if self.xx.ndim == 2 else self.xx.copy()
+            sec.x = self.x[i]
+            sec.y = self.y[i]
+            sec.z = self.z[i]
 
-    ### Inputs:
-    ```text
-    x, yu, yl:  baseline airfoil (ndarray)
-    coef_upp:   CST coefficients of incremental upper curve (ndarray or None)
-    coef_low:   CST coefficients of incremental lower curve (ndarray or None)
-    t:          relative maximum thickness (optional)
-    ```
+            if self.yy is not None:
+                sec.yy = self.yy[i]
+            else:
+                sec.yu = self.yu[i]
+                sec.yl = self.yl[i]
 
-    ### Return: 
-    y_upp, y_low (ndarray)
-    '''
-    nn = len(x)
+            if self.kind != 'basic':
+                sec.thick = float(self.thick[i])
 
-    if coef_upp is not None:
-        _, yu_i = cst_curve(nn, coef_upp, x=x)
-    else:
-        yu_i = None
+            if self.kind == 'closed':
+                sec.RLE = float(self.RLE[i])
 
-    if coef_upp is not None:
-        _, yl_i = cst_curve(nn, coef_low, x=x)
-    else:
-        yl_i = None
+            sec.dirty = False
 
-    yu_, yl_ = foil_increment_curve(x, yu, yl, yu_i=yu_i, yl_i=yl_i, t=t)
+    def sections(self) -> list:
+        '''
+        New section objects of the current arrays, for compatibility with functions of sections
 
-    return yu_, yl_
+        >>> secs = array.sections()
+        '''
+        secs = []
+        for i in range(self.n_sec):
+
+            if self.kind == 'closed':
+                sec = Section(thick=None if np.isnan(self.thick_set[i]) else float(self.thick_set[i]),
+                              chord=float(self.chord[i]), twist=float(self.twist[i]), tail=float(self.tail[i]))
+                sec.cst_u = self.cst_u[i].copy()
+                sec.cst_l = self.cst_l[i].copy()
+                for name in ['refine_u', 'refine_l', 'cst_flip_u', 'cst_flip_l']:
+                    if getattr(self, name) is not None:
+                        setattr(sec, name, getattr(self, name)[i].copy())
+
+            elif self.kind == 'open':
+                sec = OpenSection(thick=None if np.isnan(self.thick_set[i]) else float(self.thick_set[i]),
+                              chord=float(self.chord[i]), twist=float(self.twist[i]))
+                sec.cst = self.cst[i].copy()
+                for name in ['refine', 'cst_flip']:
+                    if getattr(self, name) is not None:
+                        setattr(sec, name, getattr(self, name)[i].copy())
 
-def foil_increment_curve(x, yu, yl, yu_i=None, yl_i=None, t=None):
+            else:
+                sec = BasicSection(chord=float(self.chord[i]), twist=float(self.twist[i]))
+
+            sec.xLE = float(self.xLE[i])
+            sec.yLE = float(self.yLE[i])
+            sec.zLE = float(self.zLE[i])
+            secs.append(sec)
+
+        if self.xx is not None and self.x is not None:
+            self.update_sections(secs)
+
+        return secs
+
+
+class LRUCache():
     '''
-    Add cst curve by incremental curves
+    Least-recently-used cache of ndarrays with a memory cap.
+    Stored arrays are set to read-only, since they are shared by all callers.
 
-    >>> yu_, yl_ = foil_increment_curve(x, yu, yl, yu_i, yl_i, t=None)
+    >>> cache = LRUCache(max_bytes=64*1024**2)
 
     ### Inputs:
     ```text
-    x, yu, yl:  baseline airfoil (ndarray)
-    yu_i, yl_i: incremental curves (ndarray)
-    t:          relative maximum thickness (optional)
+    max_bytes:  memory cap (bytes) of the stored arrays, None means no limit
+    enabled:    if False, the cache always misses and stores nothing
     ```
 
-    ### Return: 
-    yu_, yl_ (ndarray)
+    ### Attributes:
+    ```text
+    hits, misses, evictions: statistics of the cache
+    hit_rate:   hits/(hits+misses)
+    nbytes:     memory (bytes) of the stored arrays
+    ```
     '''
-    nn = len(x)
+    def __init__(self, max_bytes=64*1024**2, enabled=True):
 
-    if not isinstance(yu_i, np.ndarray):
-        yu_i = np.zeros(nn)
+        self.max_bytes = max_bytes
+        self.enabled = enabled
 
-    if not isinstance(yl_i, np.ndarray):
-        yl_i = np.zeros(nn)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.nbytes = 0
 
-    x_   = x.copy()
-    yu_  = yu.copy()
-    yl_  = yl.copy()
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
 
-    # Remove tail
-    tail = yu_[-1] - yl_[-1]
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        '''
+        Get the value of key, None if not found
+
+        >>> value = cache.get(key)
+        '''
+        with self._lock:
+
+            if not self.enabled or key not in self._data:
+                self.misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return self._data[key][0]
+
+    def put(self, key, value, copy_arrays=False):
+        '''
+        Store the value of key. The ndarrays in value are set to read-only.
+        If copy_arrays, copies of the ndarrays are stored and set to read-only instead,
+        so that the arrays of the caller are not changed.
+        If the value is not stored (disabled cache, or larger than max_bytes),
+        the value is returned unchanged.
+
+        >>> value = cache.put(key, value, copy_arrays=False)
+        '''
+        nbytes = _nbytes(value)
+
+        with self._lock:
+
+            if not self.enabled:
+                return value
+
+            if self.max_bytes is not None and nbytes > self.max_bytes:
+                return value
+
+            if copy_arrays:
+                value = _copy_arrays(value)
+
+            _freeze(value)
+
+            if key in self._data:
+                self.nbytes -= self._data.pop(key)[1]
+
+            self._data[key] = (value, nbytes)
+            self.nbytes += nbytes
+            self._evict()
+
+        return value
+
+    def resize(self, max_bytes):
+        '''
+        Change the memory cap (bytes), None means no limit
+        '''
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def clear(self):
+        '''
+        Remove all stored values and reset the statistics
+        '''
+        with self._lock:
+            self._data.clear()
+            self.nbytes = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def info(self) -> dict:
+        '''
+        Statistics of the cache
+
+        >>> info = cache.info()
+
+        ### Return:
+        ```text
+        dict of hits, misses, hit_rate, evictions, size (number of entries), nbytes, max_bytes
+        ```
+        '''
+        return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hit_rate, 'evictions': self.evictions,
+                'size': len(self._data), 'nbytes': self.nbytes, 'max_bytes': self.max_bytes}
+
+    @property
+    def hit_rate(self) -> float:
+        '''
+        Fraction of get() calls that hit the cache
+        '''
+        n_call = self.hits + self.misses
+        return self.hits/n_call if n_call > 0 else 0.0
+
+    def _evict(self):
+        if self.max_bytes is None:
+            return
+
+        while self.nbytes > self.max_bytes and len(self._data) > 0:
+            _, (_, nbytes) = self._data.popitem(last=False)
+            self.nbytes -= nbytes
+            self.evictions += 1
+
+
+class StreamingCurveFit():
+    '''
+    Least square fitting of a CST curve by chunks of points.
+    It keeps a running QR factorization, so that the memory does not depend on the number of points.
+
+    >>> fit = StreamingCurveFit(start, end, n_order=7, xn1=0.5, xn2=1.0, twist=False)
+    >>> fit.add_points(x, y)
+    >>> coef = fit.coef()
+
+    ### Inputs:
+    ```text
+    start, end: [x, y], the first and last points of the curve, 
+                i.e., x[0], y[0] and x[-1], y[-1] in fit_curve
+    n_order:    number of CST parameters
+    xn1,2:      CST parameters
+    twist:      if True, normalize the curve by chord and twist (same as fit_curve_with_twist)
+    ```
+
+    ### Attributes:
+    ```text
+    n_point:    number of points added
+    chord:      distance between two ends of the curve
+    twist:      degree, +z axis (0 if the input twist is False)
+    thick:      maximum relative thickness of points added (twist=True)
+    residual:   residual norm of the least square problem
+    ```
+    '''
+    def __init__(self, start, end, n_order=7, xn1=0.5, xn2=1.0, twist=False):
+
+        self.n_order = n_order
+        self.xn1 = xn1
+        self.xn2 = xn2
+        self.with_twist = twist
+
+        self.n_point = 0
+        self.thick = 0.0
+        self.residual = 0.0
+
+        self.start = np.array(start, dtype=np.float64)
+        self.end   = np.array(end, dtype=np.float64)
+
+        if twist:
+            dx = self.end[0] - self.start[0]
+            dy = self.end[1] - self.start[1]
+            self.chord = np.sqrt(dx**2+dy**2)
+            self.twist = np.arctan(dy/dx)*180/np.pi
+        else:
+            self.chord = self.end[0] - self.start[0]
+            self.twist = 0.0
+
+        #* Ends of the curve after normalization
+        xe, ye = self._normalize(self.end[:1], self.end[1:])
+        self._L = xe[0]
+        self._tail = ye[0]
+
+        #* Upper triangular part of the augmented QR factorization [A, b]
+        self._R = np.zeros((0, n_order+1))
+
+    def _normalize(self, x, y):
+        '''
+        Normalize points in the same way as fit_curve or fit_curve_with_twist
+        '''
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+
+        if not self.with_twist:
+            return x - self.start[0], y
+
+        x_ = (x - self.start[0])/self.chord
+        y_ = (y - self.start[1])/self.chord
+        x_, y_, _ = rotate(x_, y_, None, angle=-self.twist, axis='Z')
+
+        return x_, y_
+
+    def add_points(self, x, y):
+        '''
+        Add a chunk of points to the least square problem
+
+        >>> fit.add_points(x, y)
+
+        ### Inputs:
+        ```text
+        x, y:   points of the curve (ndarray), in any order
+        ```
+        '''
+        x_, y_ = self._normalize(np.ravel(x), np.ravel(y))
+
+        if self.with_twist and x_.shape[0] > 0:
+            self.thick = max(self.thick, np.max(y_))
+
+        # Clip roundoff errors of the end points
+        x_ = np.clip(x_/self._L, 0.0, 1.0)
+        b  = y_ - x_*self._tail
+
+        A = cst_basis(x_, self.n_order, xn1=self.xn1, xn2=self.xn2, cache=False)
+
+        self._R = np.linalg.qr(np.vstack((self._R, np.column_stack((A, b)))), mode='r')
+        self.n_point += x_.shape[0]
+
+        n = self.n_order
+        self.residual = np.abs(self._R[n,n]) if self._R.shape[0] > n else 0.0
+
+    def coef(self) -> np.ndarray:
+        '''
+        CST coefficients of the points added so far
+
+        >>> coef = fit.coef()
+        '''
+        if self.n_point == 0:
+            raise Exception('No points have been added to the fitting')
+
+        n = self.n_order
+        R = self._R[:n,:n]
+        c = self._R[:n, n]
+
+        return lstsq(R, c, rcond=None)[0]
+
+    def result(self):
+        '''
+        Same returns as fit_curve_with_twist
+
+        >>> coef, chord, twist, thick = fit.result()
+        '''
+        return self.coef(), self.chord, self.twist, self.thick
+
+class CSTPrefilter():
+    '''
+    Cheap screening of candidate airfoils by their CST coefficients, before building the geometry.
+    It proves some rules of check_valid to pass or fail, and leaves the others to check_valid.
+
+    The candidates are the airfoils of cst_foil(nn, coef_upp, coef_low, x, tail=tail),
+    i.e., without the thickness constraint, checked by check_valid(x, yu, yl, RLE=R0, neg_tcri).
+
+    >>> prefilter = CSTPrefilter(nn=101, x=None, tail=0.0, neg_tcri=0.0)
+    >>> status = prefilter.check(coefs_upp, coefs_low)
+
+    ### Inputs:
+    ```text
+    nn:         total amount of points
+    x:          point x [0,1] (optional ndarray, size is nn)
+    tail:       relative tail thickness (float)
+    neg_tcri:   critical value for checking negative thickness (see check_valid)
+    check_RLE:  if True, rule 6 is checked with the leading edge radius of cst_foil_RLE
+    n_elevate:  number of degree elevations of the Bernstein coefficients
+    n_probe:    number of points where the surfaces are evaluated
+    ```
+
+    ### Rules:
+    ```text
+    1:  pass if all Bernstein coefficients of yu-yl (after degree elevation) are positive, 
+        fail if the thickness is below neg_tcri at a probe point
+    5:  pass if the bound of the camber by its Bernstein coefficients is small enough, 
+        fail if the camber is too large at a probe point in x [0.2,0.7]
+    6:  decided by the closed form of RLE, and bounds of the maximum thickness
+    7:  fail if yu/x or -yl/x at x[ii] is smaller than a lower bound of the maximum thickness
+    ```
+
+    ### Attributes:
+    ```text
+    n_checked:  number of candidates checked
+    n_rejected: number of candidates that are proved invalid
+    n_pass, n_fail: number of candidates that are proved to pass or fail each rule (ndarray [10])
+    ```
+    '''
+    n_rule = 10
+
+    # Maximum of the class function x^0.5*(1-x) in [0,1] and in [0.2,0.7], both at x=1/3
+    C_MAX = 2.0/3.0/np.sqrt(3.0)
+
+    def __init__(self, nn=101, x=None, tail=0.0, neg_tcri=0.0, check_RLE=True, n_elevate=10, n_probe=20):
+
+        if x is None:
+            x = default_distribution(nn)
+        elif x.shape[0] != nn:
+            raise Exception('Specified point distribution has different size %d as input nn %d'%(x.shape[0], nn))
+
+        self.x = np.asarray(x, dtype=np.float64)
+        self.tail = float(tail)
+        self.neg_tcri = float(neg_tcri)
+        self.check_RLE = check_RLE
+        self.n_elevate = n_elevate
+
+        # Margin of the proofs for the round-off errors of the geometry
+        self.tol = 1.0E-10
+
+        #* Probe points, including the point of rule 7
+        self.ii = int(0.1*nn)+1
+        probe = np.round(np.linspace(0, nn-1, n_probe)).astype(int)
+        self.probe = np.unique(np.append(probe, self.ii))
+        self.i_rule7 = int(np.flatnonzero(self.probe==self.ii)[0])
+
+        xp = self.x[self.probe]
+        self.probe_camb = np.logical_and(xp>=VALID_RULES['x_camber'][0], xp<=VALID_RULES['x_camber'][1])
+
+        self.reset()
+
+    def reset(self):
+        '''
+        Reset the counters
+        '''
+        self.n_checked = 0
+        self.n_rejected = 0
+        self.n_pass = np.zeros(self.n_rule, dtype=int)
+        self.n_fail = np.zeros(self.n_rule, dtype=int)
+
+    @property
+    def reject_rate(self) -> float:
+        '''
+        Ratio of candidates that are proved invalid
+        '''
+        return self.n_rejected/max(self.n_checked, 1)
+
+    def elevation(self, n_order: int) -> np.ndarray:
+        '''
+        Degree elevation matrix of Bernstein coefficients, 
+        from degree n_order-1 to n_order-1+n_elevate (see elevation_matrix).
+
+        >>> E = prefilter.elevation(n_order)   # ndarray [n_order+n_elevate, n_order]
+        '''
+        return elevation_matrix(n_order, n_order+self.n_elevate)
+
+    def check(self, coefs_upp, coefs_low) -> np.ndarray:
+        '''
+        Check candidates by their CST coefficients, and update the counters
+
+        >>> status = prefilter.check(coefs_upp, coefs_low)
+
+        ### Inputs:
+        ```text
+        coefs_upp, coefs_low: CST coefficients (ndarray [n_sample, n_order])
+        ```
+
+        ### Return:
+        ```text
+        status: ndarray [n_sample, 10] of int, 
+                1 means the rule is proved to fail, 0 means the rule is proved to pass,
+                -1 means undecided, which is left to check_valid.
+                Candidates with any rule of status 1 are invalid.
+        ```
+        '''
+        cu = np.atleast_2d(np.asarray(coefs_upp, dtype=np.float64))
+        cl = np.atleast_2d(np.asarray(coefs_low, dtype=np.float64))
+        ns, n_order = cu.shape
+        tol = self.tol
+        rules = VALID_RULES
+
+        status = np.full((ns, self.n_rule), -1, dtype=np.int8)
+        status[:,7:] = 0
+
+        #* Surfaces at the probe points
+        xp = self.x[self.probe]
+        A  = cst_basis(self.x, n_order)[self.probe]
+        yu = np.dot(cu, A.T) + 0.5*self.tail*xp
+        yl = np.dot(cl, A.T) - 0.5*self.tail*xp
+        yu[:,0] = 0.0
+        yl[:,0] = 0.0
+        thickness = yu - yl
+
+        # Bounds of the maximum thickness t0
+        E = self.elevation(n_order)
+        d = np.dot(cu-cl, E.T)
+        t_low = np.max(thickness, axis=1)
+        t_upp = self.C_MAX*np.maximum(np.max(d, axis=1), 0.0) + max(self.tail, 0.0)
+
+        #* Rule 1: negative thickness
+        proved_pass = np.min(d, axis=1) > tol
+        if self.tail < 0.0 or self.neg_tcri > 0.0:
+            proved_pass[:] = False
+        proved_fail = np.min(thickness, axis=1) < self.neg_tcri - tol
+        self._set(status, 0, proved_pass, proved_fail)
+
+        #* Rule 5: maximum camber within x [0.2,0.7]
+        s = np.dot(cu+cl, E.T)
+        proved_pass = 0.5*self.C_MAX*np.max(np.abs(s), axis=1) < rules['camber'] - tol
+        camber = 0.5*(yu+yl)[:,self.probe_camb]
+        proved_fail = np.max(np.abs(camber), axis=1, initial=0.0) > rules['camber'] + tol
+        self._set(status, 4, proved_pass, proved_fail)
+
+        #* Rule 6: RLE
+        if self.check_RLE:
+            RLE = cst_foil_RLE(cu, cl)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                proved_pass = np.logical_or(RLE<=0.0,
+                    np.logical_and(RLE>=rules['RLE']+tol, RLE>=(rules['RLE_t0']+tol)*t_upp))
+                proved_fail = np.logical_and(RLE>0.0,
+                    np.logical_or(RLE<rules['RLE']-tol, np.logical_and(t_low>0.0, RLE/t_low<rules['RLE_t0']-tol)))
+            self._set(status, 5, proved_pass, proved_fail)
+        else:
+            status[:,5] = 0
+
+        #* Rule 7: convex LE, a0 = t0/x_max >= t0 >= t_low
+        xi = self.x[self.ii]
+        au = yu[:,self.i_rule7]/xi
+        al = -yl[:,self.i_rule7]/xi
+        proved_fail = np.logical_and(t_low>tol, np.minimum(au, al)<rules['convex']*t_low-tol)
+        self._set(status, 6, np.zeros(ns, dtype=bool), proved_fail)
+
+        #* Counters
+        self.n_checked  += ns
+        self.n_rejected += int(np.count_nonzero(np.any(status==1, axis=1)))
+        self.n_pass += np.count_nonzero(status==0, axis=0)
+        self.n_fail += np.count_nonzero(status==1, axis=0)
+
+        return status
+
+    @staticmethod
+    def _set(status, i_rule: int, proved_pass, proved_fail):
+        status[proved_pass, i_rule] = 0
+        status[proved_fail, i_rule] = 1
+
+    def summary(self) -> str:
+        '''
+        Summary of the counters
+
+        >>> print(prefilter.summary())
+        '''
+        lines = ['Prefilter: %d checked, %d rejected (%.1f%%)'%(
+                    self.n_checked, self.n_rejected, 100*self.reject_rate)]
+        for i in [0, 4, 5, 6]:
+            lines.append('  Rule %d: %d pass, %d fail, %d undecided'%(i+1,
+                    self.n_pass[i], self.n_fail[i], self.n_checked-self.n_pass[i]-self.n_fail[i]))
+
+        return '\n'.join(lines)
+
+
+#* Process-wide cache of CST basis matrices, see cst_basis()
+BASIS_CACHE = LRUCache(max_bytes=64*1024**2)
+
+#* Process-wide cache of naca_to_cst results, and the optional cache directory on disk
+NACA_CACHE = LRUCache(max_bytes=16*1024**2)
+
+#* Process-wide cache of Section.section results, it is opt-in (SECTION_CACHE.enabled = True)
+SECTION_CACHE = LRUCache(max_bytes=256*1024**2, enabled=False)
+_NACA_CACHE_DIR = None
+
+#* Library-wide floating-point precision of generated geometry, see set_dtype()
+_DTYPE = np.float64
+
+
+#* ===========================================
+#* Static functions
+#* ===========================================
+
+def cst_foil(nn, coef_upp, coef_low, x=None, t=None, tail=0.0, legacy_RLE=False, dtype=None):
+    '''
+    Constructing upper and lower curves of an airfoil based on CST method
+
+    CST:    class shape transfermation method (Kulfan, 2008)
+
+    >>> x_, yu, yl, t0, R0 = cst_foil()
+
+    ### Inputs:
+    ```text
+    nn:         total amount of points
+    coef_upp:   CST coefficients of upper surface (ndarray)
+    coef_low:   CST coefficients of lower surface (ndarray)
+    x:          point x [0,1] (optional ndarray, size is nn)
+    t:          relative maximum thickness (optional)
+    tail:       relative tail thickness (optional)
+    legacy_RLE: if True, the leading edge radius is estimated by the circle passing 
+                the leading edge and the upper/lower points at x=0.005.
+                Otherwise, it is calculated by the first CST coefficients (see cst_foil_RLE)
+    dtype:      floating-point precision of x, yu, yl, None means get_dtype()
+    ```
+
+    ### Return
+    x (ndarray), y_upp (ndarray), y_low (ndarray), t0, R0
+    '''
+    dtype  = get_dtype(dtype)
+    x_, yu = cst_curve(nn, coef_upp, x=x, dtype=dtype)
+    x_, yl = cst_curve(nn, coef_low, x=x, dtype=dtype)
+    
+    thick = yu-yl
+    it = np.argmax(thick)
+    t0 = thick[it]
+    r  = 1.0
+
+    # Apply thickness constraint
+    if t is not None:
+        r  = (t-tail*x_[it])/t0
+        t0 = t
+        yu = yu * r
+        yl = yl * r
+
+    # Add tail
+    yu = (yu + 0.5*tail*x_).astype(dtype, copy=False)
+    yl = (yl - 0.5*tail*x_).astype(dtype, copy=False)
+
+    # Calculate leading edge radius
+    if legacy_RLE:
+        x_RLE = 0.005
+        yu_RLE = interplot_from_curve(x_RLE, x_, yu)
+        yl_RLE = interplot_from_curve(x_RLE, x_, yl)
+        R0, _ = find_circle_3p([0.0,0.0], [x_RLE,yu_RLE], [x_RLE,yl_RLE])
+    else:
+        R0 = cst_foil_RLE(coef_upp, coef_low, r=r)
+
+    return x_, yu, yl, t0, R0
+
+def cst_foil_batch(nn, coef_upp, coef_low, x=None, t=None, tail=0.0, legacy_RLE=False, dtype=None):
+    '''
+    Constructing a batch of airfoils based on CST method, 
+    each surface is computed by one matrix product.
+
+    >>> x_, yu, yl, t0, R0 = cst_foil_batch(nn, coef_upp, coef_low, x, t, tail)
+
+    ### Inputs:
+    ```text
+    nn:         total amount of points
+    coef_upp:   CST coefficients of upper surfaces (ndarray [n_sample, n_order])
+    coef_low:   CST coefficients of lower surfaces (ndarray [n_sample, n_order])
+    x:          point x [0,1] (optional ndarray, size is nn)
+    t:          relative maximum thickness (optional), float or ndarray [n_sample].
+                NaN in the ndarray means the thickness of that sample is not constrained.
+    tail:       relative tail thickness (optional), float or ndarray [n_sample]
+    legacy_RLE: if True, the leading edge radius is estimated by three points (see cst_foil)
+    dtype:      floating-point precision of x, yu, yl, None means get_dtype()
+    ```
+
+    ### Return
+    x (ndarray [nn]), y_upp, y_low (ndarray [n_sample, nn]), t0, R0 (ndarray [n_sample])
+    '''
+    dtype  = get_dtype(dtype)
+    x_, yu = cst_curve_batch(nn, coef_upp, x=x, dtype=dtype)
+    x_, yl = cst_curve_batch(nn, coef_low, x=x, dtype=dtype)
+
+    ns   = yu.shape[0]
+    tail = np.broadcast_to(np.asarray(tail, dtype=float), (ns,))[:,None]
+
+    thick = yu-yl
+    it = np.argmax(thick, axis=1)
+    t0 = thick[np.arange(ns), it]
+    r  = np.ones(ns)
+
+    # Apply thickness constraint
+    if t is not None:
+        t  = np.broadcast_to(np.asarray(t, dtype=float), (ns,))
+        r  = (t-tail[:,0]*x_[it])/t0
+        r  = np.where(np.isnan(t), 1.0, r)
+        t0 = np.where(np.isnan(t), t0, t)
+        yu = yu * r[:,None]
+        yl = yl * r[:,None]
+
+    # Add tail
+    yu = (yu + 0.5*tail*x_).astype(dtype, copy=False)
+    yl = (yl - 0.5*tail*x_).astype(dtype, copy=False)
+
+    # Calculate leading edge radius
+    if not legacy_RLE:
+        R0 = cst_foil_RLE(np.atleast_2d(coef_upp), np.atleast_2d(coef_low), r=r)
+        return x_, yu, yl, t0, R0
+
+    x_RLE = 0.005
+    w_RLE = interplot_weights(x_RLE, x_)
+    yu_RLE = np.dot(yu, w_RLE)
+    yl_RLE = np.dot(yl, w_RLE)
+
+    # Circle passing (0,0), (x_RLE,yu_RLE), (x_RLE,yl_RLE)
+    xc = 0.5*(x_RLE - yu_RLE*yl_RLE/x_RLE)
+    yc = 0.5*(yu_RLE + yl_RLE)
+    R0 = np.sqrt(xc**2 + yc**2)
+
+    return x_, yu, yl, t0, R0
+
+def cst_foil_RLE(coef_upp, coef_low, r=1.0):
+    '''
+    Leading edge radius of a CST airfoil with the default class function (xn1=0.5, xn2=1.0)
+
+    >>> R0 = cst_foil_RLE(coef_upp, coef_low, r=1.0)
+
+    ### Inputs:
+    ```text
+    coef_upp:   CST coefficients of upper surface (ndarray [n_order] or [n_sample, n_order])
+    coef_low:   CST coefficients of lower surface (ndarray [n_order] or [n_sample, n_order])
+    r:          scale factor of the airfoil, e.g., by the thickness constraint (float or ndarray [n_sample])
+    ```
+
+    ### Note:
+    ```text
+    Near the leading edge, yu ~ r*Au*sqrt(x), yl ~ r*Al*sqrt(x),
+    where Au and Al are the first CST coefficients.
+    The circle passing (0,0), (x, yu) and (x, yl) converges to R0 = 0.5*r^2*|Au*Al|
+    when x goes to 0. For a symmetric airfoil, it is the exact radius r^2*Au^2/2.
+    The tail does not change the leading edge radius.
+    ```
+    '''
+    Au = np.asarray(coef_upp)[...,0]
+    Al = np.asarray(coef_low)[...,0]
+
+    return 0.5*np.power(r,2)*np.abs(Au*Al)
+
+def cst_foil_fit(xu, yu, xl, yl, n_order=7, cache=False):
+    '''
+    Using CST method to fit an airfoil
+
+    This function allows the airfoil has non-zero tail thickness.
+    Also allows the airfoil chord length not equals to one.
+
+    >>> cst_u, cst_l = cst_foil_fit(xu, yu, xl, yl, n_order=7, cache=False)
+
+    ### Inputs:
+    ```text
+    xu, yu:  upper surface points (ndarray)
+    xl, yl:  lower surface points (ndarray)
+    n_order: number of CST parameters
+    cache:   if True, the least square operator is stored in (and taken from) BASIS_CACHE,
+             which pays off when airfoils on the same points are fitted again
+    ```
+
+    ### Return: 
+    cst_u, cst_l (ndarray)
+
+    ### Note:
+    ```text
+    If xu and xl are the same, both surfaces are fitted in one call of fit_curves_batch.
+    ```
+    '''
+    if np.shape(xu) == np.shape(xl) and np.array_equal(xu, xl):
+        coefs = fit_curves_batch(xu, np.vstack((yu, yl)), n_order=n_order, cache=cache)
+        return coefs[0], coefs[1]
+
+    cst_u = fit_curve(xu, yu, n_order=n_order, cache=cache)
+    cst_l = fit_curve(xl, yl, n_order=n_order, cache=cache)
+    return cst_u, cst_l
+
+def cst_foil_fit_auto_order(xu, yu, xl, yl, tol=1e-5, max_order=20, min_order=1):
+    '''
+    Using CST method to fit an airfoil, 
+    with the lowest number of CST parameters that meets the target residual on both surfaces.
+
+    >>> cst_u, cst_l, n_order, history = cst_foil_fit_auto_order(xu, yu, xl, yl, tol, max_order)
+
+    ### Inputs:
+    ```text
+    xu, yu:     upper surface points (ndarray)
+    xl, yl:     lower surface points (ndarray)
+    tol:        target root mean square error of the fitting
+    max_order:  maximum number of CST parameters
+    min_order:  minimum number of CST parameters
+    ```
+
+    ### Return: 
+    ```text
+    cst_u, cst_l:   CST coefficients (ndarray)
+    n_order:        number of CST parameters chosen
+    history:        root mean square errors of the upper and lower surfaces (ndarray [n_order-min_order+1, 2]),
+                    history[i] is the error with min_order+i CST parameters
+    ```
+
+    ### Note:
+    ```text
+    The orders are checked by a nested factorization (see _NestedCurveFit),
+    then only the chosen order is fitted by cst_foil_fit.
+    ```
+    '''
+    if np.shape(xu) == np.shape(xl) and np.array_equal(xu, xl):
+        fits = [_NestedCurveFit(xu, np.vstack((yu, yl)), n_order=min_order)]
+    else:
+        fits = [_NestedCurveFit(xu, yu, n_order=min_order), _NestedCurveFit(xl, yl, n_order=min_order)]
+
+    history = [np.concatenate([fit.rms() for fit in fits])]
+    for n_order in range(min_order+1, max_order+1):
+        if np.max(history[-1]) <= tol:
+            break
+        history.append(np.concatenate([fit.add_order() for fit in fits]))
+
+    n_order = min_order + len(history) - 1
+    cst_u, cst_l = cst_foil_fit(xu, yu, xl, yl, n_order=n_order)
+
+    return cst_u, cst_l, n_order, np.array(history)
+
+def foil_bump_modify(x: np.array, yu: np.array, yl: np.array,
+            xc: float, h: float, s: float, side=1, n_order=0,
+            return_cst=False, keep_tmax=True):
+    '''
+    Add bumps on the airfoil
+
+    >>> yu_new, yl_new (, cst_u, cst_l) = foil_bump_modify(
+    >>>         x: np.array, yu: np.array, yl: np.array, 
+    >>>         xc: float, h: float, s: float, side=1,
+    >>>         n_order=0, return_cst=False, keep_tmax=True)
+
+    ### Inputs:
+    ```text
+    x, yu, yl:  current airfoil (ndarray)
+    xc:         x of the bump center
+    h:          relative height of the bump (to maximum thickness)
+    s:          span of the bump
+    side:       +1/-1 upper/lower side of the airfoil
+    n_order:    if specified (>0), then use CST to fit the new foil
+    return_cst: if True, also return cst_u, cst_l when n_order > 0
+    keep_tmax:  if True, keep the maximum thickness unchanged
+    ```
+
+    ### Return:
+    yu_new, yl_new (ndarray)
+    '''
+    yu_new = yu.copy()
+    yl_new = yl.copy()
+    t0 = np.max(yu_new-yl_new)
+
+    yu_ = yu.copy()
+    yl_ = yl.copy()
+
+    if xc<0.1 or xc>0.9:
+        kind = 'H'
+    else:
+        kind = 'G'
+
+    if side > 0:
+        yu_new = add_bump(x, yu_new, xc, h*t0, s, kind=kind)
+    else:
+        yl_new = add_bump(x, yl_new, xc, h*t0, s, kind=kind)
+
+    if keep_tmax:
+
+        it = np.argmax(yu_new-yl_new)
+        tu = np.abs(yu_new[it])
+        tl = np.abs(yl_new[it])
+
+        if side > 0:
+            rl = (t0-tu)/tl
+            yl_new = rl * np.array(yl_new)
+        else:
+            ru = (t0-tl)/tu
+            yu_new = ru * np.array(yu_new)
+
+        t0 = None
+
+    if n_order > 0:
+        # CST reverse
+        tail = yu[-1] - yl[-1]
+        cst_u, cst_l = cst_foil_fit(x, yu_new, x, yl_new, n_order=n_order)
+        _, yu_new, yl_new, _, _ = cst_foil(x.shape[0], cst_u, cst_l, x=x, t=t0, tail=tail)
+    else:
+        cst_u = None
+        cst_l = None
+    
+    if return_cst:
+        return yu_new, yl_new, cst_u, cst_l
+    else:
+        return yu_new, yl_new
+
+def foil_tcc(x, yu, yl, info=True, coef_upp=None, coef_low=None):
+    '''
+    Calculate thickness, curvature, camber distribution.
+
+    >>> thickness, curv_u, curv_l, camber = foil_tcc(x, yu, yl, info=True)
+
+    ### Inputs:
+    ```text
+    x, yu, yl:  current airfoil (ndarray)
+    coef_upp:   CST coefficients of upper surface (optional ndarray)
+    coef_low:   CST coefficients of lower surface (optional ndarray)
+    ```
+
+    ### Note:
+    ```text
+    If coef_upp and coef_low are provided, the curvature is calculated analytically
+    by cst_curve_derivatives, instead of fitting circles through discrete points.
+    The coefficients must reproduce yu and yl without the tail, i.e., 
+    they are already scaled to the thickness (see scale_cst).
+    The tail is taken from yu[-1]-yl[-1].
+    ```
+
+    ### Return: 
+    thickness, curv_u, curv_l, camber (ndarray)
+    '''
+    if coef_upp is not None and coef_low is not None:
+        tail = yu[-1] - yl[-1]
+        curv_u = cst_curve_curvature(coef_upp, x, slope=0.5*tail)
+        curv_l = cst_curve_curvature(coef_low, x, slope=-0.5*tail)
+    else:
+        curv_u = curve_curvature(x, yu)
+        curv_l = curve_curvature(x, yl)
+
+    thickness = yu-yl
+    camber = 0.5*(yu+yl)
+    for i in range(x.shape[0]):
+        if info and thickness[i]<0:
+            print('Unreasonable Airfoil: negative thickness')
+
+    return thickness, curv_u, curv_l, camber
+
+#* Thresholds of the rules of check_valid
+VALID_RULES = {
+    'x_max':        (0.15, 0.75),   # rule 2, range of the maximum thickness location
+    'n_extreme':    2,              # rule 3, maximum number of extreme points of thickness
+    'curvature':    5.0,            # rule 4, maximum curvature (x>=0.1)
+    'x_curvature':  0.1,
+    'camber':       0.025,          # rule 5, maximum camber within x_camber
+    'x_camber':     (0.2, 0.7),
+    'RLE':          0.005,          # rule 6, minimum RLE
+    'RLE_t0':       0.01,           # rule 6, minimum RLE/t0
+    'convex':       1.0,            # rule 7, minimum LE slope (yu/x at x[ii]) relative to t0/x_max
+}
+
+def check_valid(x, yu, yl, RLE=0.0, neg_tcri=0.0, coef_upp=None, coef_low=None) -> list:
+    '''
+    Check if the airfoil is reasonable by rules
+
+    >>> rule_invalid = check_valid(x, yu, yl, RLE=0.0)
+
+    ### Inputs:
+    ```text
+    x, yu, yl: current airfoil (ndarray)
+    RLE:       The leading edge radius of this airfoil
+    neg_tcri:  critical value for checking negative thickness
+               e.g., neg_tcri = -0.01, then only invalid when the thickness is smaller than -0.01
+    coef_upp, coef_low: optional CST coefficients for analytic curvature (see foil_tcc)
+    ```
+
+    ### Rules:
+    ```text
+    1:  negative thickness
+    2:  maximum thickness point location
+    3:  extreme points of thickness
+    4:  maximum curvature
+    5:  maximum camber within x [0.2,0.7]
+    6:  RLE if provided
+    7:  convex LE
+    ```
+
+    ### Return:
+    rule_invalid: list, 0 means valid
+
+    ### Note:
+    ```text
+    The rules are checked by check_valid_batch, with the thresholds in VALID_RULES.
+    ```
+    '''
+    if coef_upp is None or coef_low is None:
+        coef_upp, coef_low = None, None
+
+    rule_invalid = check_valid_batch(x, yu, yl, RLE=RLE, neg_tcri=neg_tcri, coefs_upp=coef_upp, coefs_low=coef_low)
+
+    return [int(flag) for flag in rule_invalid[0]]
+
+def check_valid_batch(x, YU, YL, RLE=0.0, neg_tcri=0.0, coefs_upp=None, coefs_low=None, n_chunk=10000) -> np.ndarray:
+    '''
+    Check a batch of airfoils by the rules of check_valid, e.g., candidates of an optimization
+
+    >>> rule_invalid = check_valid_batch(x, YU, YL, RLE=0.0)
+
+    ### Inputs:
+    ```text
+    x:          points x of all airfoils (ndarray [nn])
+    YU, YL:     upper and lower surfaces (ndarray [n_sample, nn])
+    RLE:        leading edge radius of the airfoils (float or ndarray [n_sample])
+    neg_tcri:   critical value for checking negative thickness (see check_valid)
+    coefs_upp, coefs_low: optional CST coefficients (ndarray [n_sample, n_cst]) for analytic curvature
+    n_chunk:    number of airfoils checked at a time, which limits the memory usage
+    ```
+
+    ### Return:
+    rule_invalid: ndarray [n_sample, 10] of bool, True means the rule is violated
+    '''
+    x  = np.asarray(x, dtype=np.float64)
+    YU = np.atleast_2d(np.asarray(YU, dtype=np.float64))
+    YL = np.atleast_2d(np.asarray(YL, dtype=np.float64))
+    ns = YU.shape[0]
+    nn = x.shape[0]
+
+    RLE = np.broadcast_to(np.asarray(RLE, dtype=np.float64), (ns,))
+
+    if coefs_upp is not None and coefs_low is not None:
+        coefs_upp = np.atleast_2d(coefs_upp)
+        coefs_low = np.atleast_2d(coefs_low)
+
+    n_rule = 10
+    rule_invalid = np.zeros((ns, n_rule), dtype=bool)
+
+    rules = VALID_RULES
+    i_curv = x>=rules['x_curvature']
+    i_camb = np.logical_and(x>=rules['x_camber'][0], x<=rules['x_camber'][1])
+    ii = int(0.1*nn)+1
+
+    for i0 in range(0, ns, n_chunk):
+
+        i1 = min(i0+n_chunk, ns)
+        yu = YU[i0:i1]
+        yl = YL[i0:i1]
+        rr = rule_invalid[i0:i1]
+
+        if coefs_upp is not None and coefs_low is not None:
+            tail = yu[:,-1:] - yl[:,-1:]
+            curv_u = _cst_curve_curvature_batch(coefs_upp[i0:i1], x, slope= 0.5*tail)
+            curv_l = _cst_curve_curvature_batch(coefs_low[i0:i1], x, slope=-0.5*tail)
+        else:
+            curv_u = get_kernel('curve_curvature_batch')(x, yu)
+            curv_l = get_kernel('curve_curvature_batch')(x, yl)
+
+        thickness = yu - yl
+        camber = 0.5*(yu+yl)
+
+        #* Rule 1: negative thickness
+        rr[:,0] = np.min(thickness, axis=1) < neg_tcri
+
+        #* Rule 2: maximum thickness point location
+        i_max = np.argmax(thickness, axis=1)
+        t0    = np.take_along_axis(thickness, i_max[:,None], axis=1)[:,0]
+        x_max = x[i_max]
+        rr[:,1] = np.logical_or(x_max<rules['x_max'][0], x_max>rules['x_max'][1])
+
+        #* Rule 3: extreme points of thickness
+        a1 = thickness[:,2:]-thickness[:,1:-1]
+        a2 = thickness[:,:-2]-thickness[:,1:-1]
+        rr[:,2] = np.count_nonzero(a1*a2>=0.0, axis=1) > rules['n_extreme']
+
+        #* Rule 4: maximum curvature
+        cur_max_u = np.max(np.abs(curv_u), axis=1, initial=0.0, where=i_curv)
+        cur_max_l = np.max(np.abs(curv_l), axis=1, initial=0.0, where=i_curv)
+        rr[:,3] = np.logical_or(cur_max_u>rules['curvature'], cur_max_l>rules['curvature'])
+
+        #* Rule 5: Maximum camber within x [0.2,0.7]
+        rr[:,4] = np.max(np.abs(camber), axis=1, initial=0.0, where=i_camb) > rules['camber']
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+
+            #* Rule 6: RLE
+            rle = RLE[i0:i1]
+            rr[:,5] = np.logical_and(rle>0.0, np.logical_or(rle<rules['RLE'], rle/t0<rules['RLE_t0']))
+
+            #* Rule 7: convex LE
+            a0 = t0/x_max
+            au = yu[:,ii]/x[ii]/a0
+            al = -yl[:,ii]/x[ii]/a0
+            rr[:,6] = np.logical_or(au<rules['convex'], al<rules['convex'])
+
+    return rule_invalid
+
+def _cst_curve_curvature_batch(coefs, x, slope=0.0, xn1=0.5, xn2=1.0):
+    '''
+    Analytic curvature of a batch of CST curves (see cst_curve_curvature), 
+    coefs [n_sample, n_cst], slope [n_sample, 1] or float, returns [n_sample, nn]
+    '''
+    A1, A2 = cst_basis_derivatives(x, coefs.shape[1], xn1=xn1, xn2=xn2, order=2)
+    dy  = np.dot(coefs, A1.T) + slope
+    d2y = np.dot(coefs, A2.T)
+
+    curv = d2y/np.power(1+dy**2, 1.5)
+    curv[:,0] = curv[:,1]
+    curv[:,-1] = curv[:,-2]
+
+    return curv
+
+def foil_increment(x, yu, yl, coef_upp, coef_low, t=None):
+    '''
+    Add cst curve by incremental curves
+
+    >>> yu_, yl_ = foil_increment(x, yu, yl, coef_upp, coef_low, t=None)
+
+    ### Inputs:
+    ```text
+    x, yu, yl:  baseline airfoil (ndarray)
+    coef_upp:   CST coefficients of incremental upper curve (ndarray or None)
+    coef_low:   CST coefficients of incremental lower curve (ndarray or None)
+    t:          relative maximum thickness (optional)
+    ```
+
+    ### Return: 
+    y_upp, y_low (ndarray)
+    '''
+    nn = len(x)
+
+    if coef_upp is not None:
+        _, yu_i = cst_curve(nn, coef_upp, x=x)
+    else:
+        yu_i = None
+
+    if coef_upp is not None:
+        _, yl_i = cst_curve(nn, coef_low, x=x)
+    else:
+        yl_i = None
+
+    yu_, yl_ = foil_increment_curve(x, yu, yl, yu_i=yu_i, yl_i=yl_i, t=t)
+
+    return yu_, yl_
+
+def foil_increment_curve(x, yu, yl, yu_i=None, yl_i=None, t=None):
+    '''
+    Add cst curve by incremental curves
+
+    >>> yu_, yl_ = foil_increment_curve(x, yu, yl, yu_i, yl_i, t=None)
+
+    ### Inputs:
+    ```text
+    x, yu, yl:  baseline airfoil (ndarray)
+    yu_i, yl_i: incremental curves (ndarray)
+    t:          relative maximum thickness (optional)
+    ```
+
+    ### Return: 
+    yu_, yl_ (ndarray)
+    '''
+    nn = len(x)
+
+    if not isinstance(yu_i, np.ndarray):
+        yu_i = np.zeros(nn, dtype=yu.dtype)
+
+    if not isinstance(yl_i, np.ndarray):
+        yl_i = np.zeros(nn, dtype=yl.dtype)
+
+    x_   = x.copy()
+    yu_  = yu.copy()
+    yl_  = yl.copy()
+
+    # Remove tail
+    tail = yu_[-1] - yl_[-1]
     if tail > 0.0:
         yu_ = yu_ - 0.5*tail*x_
         yl_ = yl_ + 0.5*tail*x_
@@ -764,7 +1883,7 @@ def foil_increment_curve(x, yu, yl, yu_i=None, yl_i=None, t=None):
 
     return yu_, yl_
 
-def naca_to_cst(NACA_series: str, n_order=7, nn=101):
+def naca_to_cst(NACA_series: str, n_order=7, nn=101, cache=True):
     '''
     Get CST parameters of a NACA series airfoil
 
@@ -775,28 +1894,239 @@ def naca_to_cst(NACA_series: str, n_order=7, nn=101):
     NACA_series:    4 or 5 digit NACA number string
     n_order:        number of CST parameters
     nn:             total amount of points
+    cache:          if True, the results are memoized by (NACA_series, n_order, nn) 
+                    in NACA_CACHE, and in the cache directory (see set_naca_cache_dir)
     ```
 
     ### Return: 
     cst_u, cst_l (ndarray)
+
+    ### Note:
+    ```text
+    The airfoil is split at the point of minimum x, which is the leading edge of cambered airfoils,
+    then translated to put it at the origin and scaled to unit chord.
+    ```
+    '''
+    if not cache:
+        return _naca_to_cst(NACA_series, n_order=n_order, nn=nn)
+
+    coefs = _naca_cache_get(NACA_series, n_order, nn)
+
+    if coefs is None:
+        coefs = _naca_cache_put(NACA_series, n_order, nn, np.array(_naca_to_cst(NACA_series, n_order=n_order, nn=nn)))
+
+    return coefs[0].copy(), coefs[1].copy()
+
+def _naca_cache_get(NACA_series: str, n_order: int, nn: int):
+    '''
+    Get the CST parameters [2, n_order] from NACA_CACHE or the cache directory, None if not found
+    '''
+    key = ('naca', NACA_series, n_order, nn)
+    coefs = NACA_CACHE.get(key)
+
+    if coefs is None and _NACA_CACHE_DIR is not None:
+        fname = _naca_cache_file(NACA_series, n_order, nn)
+        if os.path.exists(fname):
+            coefs = NACA_CACHE.put(key, np.load(fname))
+
+    return coefs
+
+def _naca_cache_put(NACA_series: str, n_order: int, nn: int, coefs):
+    '''
+    Store the CST parameters [2, n_order] in NACA_CACHE and the cache directory
+    '''
+    coefs = NACA_CACHE.put(('naca', NACA_series, n_order, nn), coefs)
+
+    if _NACA_CACHE_DIR is not None:
+        fname = _naca_cache_file(NACA_series, n_order, nn)
+        with open(fname+'.tmp', 'wb') as f:
+            np.save(f, coefs)
+        os.replace(fname+'.tmp', fname)
+
+    return coefs
+
+def naca_to_cst_batch(NACA_series: list, n_order=7, nn=101, cache=True) -> list:
+    '''
+    Get CST parameters of a list of NACA series airfoils.
+    The airfoils that are not memoized are generated in one call of naca_batch,
+    and the airfoils on the same points share the least square operator in BASIS_CACHE.
+
+    >>> coefs = naca_to_cst_batch(NACA_series, n_order, nn)
+
+    ### Inputs:
+    ```text
+    NACA_series:    list of 4 or 5 digit NACA number strings
+    n_order:        number of CST parameters
+    nn:             total amount of points
+    cache:          if True, use and update the memoization (see naca_to_cst)
+    ```
+
+    ### Return: 
+    coefs: list of (cst_u, cst_l)
+    '''
+    #* Memoized airfoils, each series is looked up once
+    coefs = {}
+    if cache:
+        for series in NACA_series:
+            if series not in coefs:
+                coefs[series] = _naca_cache_get(series, n_order, nn)
+
+    missing = [series for series in dict.fromkeys(NACA_series) if coefs.get(series) is None]
+
+    if len(missing) > 0:
+        X, Y = naca_batch(missing, nn-1, finite_TE=False, half_cosine_spacing=True)
+        for i, series in enumerate(missing):
+            coefs[series] = np.array(_naca_points_to_cst(X[i], Y[i], n_order=n_order, cache=True))
+
+            if cache:
+                coefs[series] = _naca_cache_put(series, n_order, nn, coefs[series])
+
+    return [(coefs[series][0].copy(), coefs[series][1].copy()) for series in NACA_series]
+
+def _naca_to_cst(NACA_series: str, n_order=7, nn=101):
+    '''
+    Fit the NACA series airfoil by CST, without memoization
+    '''
+    xx, yy = naca(NACA_series, nn-1, finite_TE=False, half_cosine_spacing=True)
+
+    return _naca_points_to_cst(xx, yy, n_order=n_order)
+
+def _naca_points_to_cst(xx, yy, n_order=7, cache=False):
+    '''
+    Fit the NACA airfoil points [2*nn-1] by CST, the least square operator is cached if cache is True
+    '''
+    # Points are from the trailing edge, over the upper surface to the leading edge,
+    # and back along the lower surface
+    iLE = np.argmin(xx)
+    x0  = xx[iLE]
+    y0  = yy[iLE]
+    xx  = (xx-x0)/(1.0-x0)
+    yy  = (yy-y0)/(1.0-x0)
+
+    xu = np.flip(xx[:iLE+1])
+    yu = np.flip(yy[:iLE+1])
+    xl = xx[iLE:]
+    yl = yy[iLE:]
+
+    cst_u, cst_l = cst_foil_fit(xu, yu, xl, yl, n_order=n_order, cache=cache)
+
+    return cst_u, cst_l
+
+def _naca_cache_file(NACA_series: str, n_order: int, nn: int) -> str:
+    return os.path.join(_NACA_CACHE_DIR, 'naca%s-n%d-nn%d.npy'%(NACA_series, n_order, nn))
+
+def set_naca_cache_dir(path=None):
+    '''
+    Set the directory of the on-disk cache of naca_to_cst results.
+
+    >>> set_naca_cache_dir(path)
+
+    ### Inputs:
+    ```text
+    path:   directory name, it is created if it does not exist.
+            None means no on-disk cache (default).
+    ```
+    '''
+    global _NACA_CACHE_DIR
+
+    if path is not None and not os.path.exists(path):
+        os.makedirs(path)
+
+    _NACA_CACHE_DIR = path
+
+def naca_series_list(thick_4digit=range(1, 41), thick_5digit=(6, 8, 9, 10, 12, 15, 18, 21, 24)) -> list:
+    '''
+    List of NACA series strings: all 4-digit series, and common 5-digit series.
+
+    >>> series = naca_series_list(thick_4digit, thick_5digit)
+
+    ### Inputs:
+    ```text
+    thick_4digit:   maximum thickness (percent of chord) of 4-digit series
+    thick_5digit:   maximum thickness (percent of chord) of 5-digit series
+    ```
+
+    ### Note:
+    ```text
+    4-digit series: 00xx, and mpxx with m, p in 1~9
+    5-digit series: 210xx ~ 250xx (standard camber lines, naca5_batch has no reflexed camber line)
+    ```
+    '''
+    series = []
+
+    for t in thick_4digit:
+        series.append('00%02d'%(t))
+        for m in range(1, 10):
+            for p in range(1, 10):
+                series.append('%d%d%02d'%(m, p, t))
+
+    for t in thick_5digit:
+        for mean_line in ['210', '220', '230', '240', '250']:
+            series.append('%s%02d'%(mean_line, t))
+
+    return series
+
+def naca_cst_table(n_order=7, nn=101, series=None, fname=None, info=False) -> dict:
+    '''
+    Build the table of CST parameters of NACA series airfoils,
+    the results are stored in NACA_CACHE (and the cache directory).
+
+    >>> table = naca_cst_table(n_order, nn, series, fname)
+
+    ### Inputs:
+    ```text
+    n_order:    number of CST parameters
+    nn:         total amount of points
+    series:     list of NACA series strings, None means naca_series_list()
+    fname:      if provided, write the table to a numpy archive (.npz), see load_naca_cst_table
+    info:       if True, print the progress
+    ```
+
+    ### Return:
+    ```text
+    table:      dict, {NACA_series: (cst_u, cst_l)}
+    ```
+    '''
+    if series is None:
+        series = naca_series_list()
+
+    table = {}
+    for i0 in range(0, len(series), 500):
+        batch = series[i0:i0+500]
+        for NACA_series, coefs in zip(batch, naca_to_cst_batch(batch, n_order=n_order, nn=nn)):
+            table[NACA_series] = coefs
+
+        if info:
+            print('  NACA table: %d/%d'%(i0+len(batch), len(series)))
+
+    if fname is not None:
+        np.savez_compressed(fname, series=np.array(series, dtype=str),
+            cst_u=np.array([table[s][0] for s in series]).reshape(-1, n_order),
+            cst_l=np.array([table[s][1] for s in series]).reshape(-1, n_order),
+            n_order=np.array(n_order), nn=np.array(nn))
+
+    return table
+
+def load_naca_cst_table(fname: str) -> dict:
+    '''
+    Read the table written by naca_cst_table, and store the results in NACA_CACHE
+
+    >>> table = load_naca_cst_table(fname)
     '''
-    xx, yy = naca(NACA_series, nn-1, finite_TE=False, half_cosine_spacing=True)
+    if not os.path.exists(fname):
+        raise Exception(fname+' does not exist for NACA CST table')
 
-    xu = np.zeros(nn)
-    xl = np.zeros(nn)
-    yu = np.zeros(nn)
-    yl = np.zeros(nn)
+    table = {}
+    with np.load(fname, allow_pickle=False) as data:
 
-    n0 = 2*nn-1
-    for i in range(nn):
-        xu[i] = xx[n0-i-nn]
-        yu[i] = yy[n0-i-nn]
-        xl[i] = xx[nn+i-1]
-        yl[i] = yy[nn+i-1]
+        n_order = int(data['n_order'])
+        nn = int(data['nn'])
 
-    cst_u, cst_l = cst_foil_fit(xu, yu, xl, yl, n_order=n_order)
+        for NACA_series, cst_u, cst_l in zip(data['series'].tolist(), data['cst_u'], data['cst_l']):
+            NACA_CACHE.put(('naca', NACA_series, n_order, nn), np.array([cst_u, cst_l]))
+            table[NACA_series] = (cst_u.copy(), cst_l.copy())
 
-    return cst_u, cst_l
+    return table
 
 def scale_cst(x, yu, yl, cst_u, cst_l, t: float, tail=0.0):
     '''
@@ -839,158 +2169,637 @@ def fromCylinder(x, y, z, flip=True, origin=None):
     ### Return:
     X, Y, Z:    ndarray, point coordinates of curves bent to 2D X-Y planes
 
-    ### Note:
-    ```text
-    Cylinder: origin (0,0,0), axis is z-axis
-    x and y must not be 0 at the same time
+    ### Note:
+    ```text
+    Cylinder: origin (0,0,0), axis is z-axis
+    x and y must not be 0 at the same time
+
+    The origin of cylinder and plane curves is the same (0,0,0).
+    
+        Cylinder: x, y, z ~~ r, theta, z
+        Plane:    X, Y, Z
+
+        theta = arctan(y/x)
+        r = sqrt(x^2+y^2)
+        z = z
+
+        X = r*theta
+        Y = z
+        Z = r
+    ```
+    '''
+    coef = -1.0 if flip else 1.0
+
+    if origin is not None:
+        x = x - origin[0]
+        y = y - origin[1]
+
+    rr = np.sqrt(x*x+y*y)
+    tt = np.arctan2(y, x) * coef
+
+    X = rr*tt
+    Y = z.copy()
+    Z = rr
+
+    return X, Y, Z
+
+def toCylinder(X, Y, Z, flip=True, origin=None):
+    '''
+    Bend the plane sections to curves on a cylinder.
+
+    ### Inputs:
+    ```text
+    X, Y, Z:    ndarray, point coordinates of curves on 2D X-Y planes
+                Z must not be 0
+    flip:       if True, flip the X of plane curve
+    origin:     default None.
+                if provided a list [x0, y0], then the cylinder origin is [x0, y0]
+    ```
+
+    ### Return:
+    x, y ,z:    ndarray, point coordinate of curves bent to a cylinder
+
+    ### Note:
+    ```text
+    The origin of cylinder and plane curves is the same (0,0,0).
+    
+        Plane:    X, Y, Z
+        Cylinder: x, y, z ~~ r, theta, z
+        
+        theta = arctan(y/x)
+        r = sqrt(x^2+y^2)
+        z = z
+
+        X = r*theta
+        Y = z
+        Z = r
+    ```
+    '''
+    coef = -1.0 if flip else 1.0
+
+    x, y = get_kernel('to_cylinder')(X, Z, coef)
+    z = Y.copy()
+
+    if origin is not None:
+        x = x + origin[0]
+        y = y + origin[1]
+
+    return x, y, z
+
+@register_kernel('to_cylinder')
+def _to_cylinder_numpy(X, Z, coef: float):
+    theta = X/Z * coef
+    return Z*np.cos(theta), Z*np.sin(theta)
+
+#* ===========================================
+#* Supportive functions
+#* ===========================================
+
+class _SharedArray(np.ndarray):
+    '''
+    Read-only view of an ndarray shared by copy-on-write clones (see share_array).
+    In-place operators return a writable copy, 
+    so that `sec.y += dy` of a clone rebinds sec.y to a new array.
+    '''
+    def __array_wrap__(self, obj, *args, **kwargs):
+        # Results of ufuncs are plain ndarrays
+        obj = super().__array_wrap__(obj, *args, **kwargs)
+        return obj.view(np.ndarray) if isinstance(obj, np.ndarray) else obj
+
+def _copy_on_write(name: str):
+    operator = getattr(np.ndarray, name)
+
+    def inplace(self, other):
+        if self.flags.writeable:
+            return operator(self, other)
+        return operator(np.array(self), other)
+
+    return inplace
+
+for _name in ['__iadd__', '__isub__', '__imul__', '__itruediv__', '__ifloordiv__', '__imod__', '__ipow__',
+              '__imatmul__', '__ilshift__', '__irshift__', '__iand__', '__ior__', '__ixor__']:
+    setattr(_SharedArray, _name, _copy_on_write(_name))
+
+def share_array(a):
+    '''
+    Share an ndarray with a copy-on-write clone, by a read-only view of it.
+    The array itself is not changed. Other objects are returned as they are.
+
+    >>> a_clone = share_array(a)
+
+    ### Note:
+    ```text
+    In-place operators on the view make a copy, e.g., `sec.y += dy` works on clones, 
+    but item assignment (e.g., sec.y[0] = 0.0) raises an error.
+    Writing the original array in place is seen by the view, 
+    so clones rebind the attributes of the source to the views as well (see BasicSection.clone).
+    ```
+    '''
+    if not isinstance(a, np.ndarray):
+        return a
+
+    if isinstance(a, _SharedArray) and not a.flags.writeable:
+        return a
+
+    view = a.view(_SharedArray)
+    view.flags.writeable = False
+    return view
+
+def writable_array(a):
+    '''
+    Copy a read-only ndarray (e.g., shared by share_array) before writing it in place,
+    other objects are returned as they are
+
+    >>> a = writable_array(a)
+    '''
+    if isinstance(a, np.ndarray) and not a.flags.writeable:
+        return np.array(a)
+
+    return a
+
+def same_array(a, b) -> bool:
+    '''
+    True if a and b are the same array, or views of the same memory with the same layout,
+    e.g., an array and its shared views (see share_array)
+    '''
+    if a is b:
+        return True
+
+    if not isinstance(a, np.ndarray) or not isinstance(b, np.ndarray):
+        return False
+
+    return a.dtype == b.dtype and a.shape == b.shape and a.strides == b.strides \
+            and a.__array_interface__['data'][0] == b.__array_interface__['data'][0]
+
+def set_dtype(dtype):
+    '''
+    Set the library-wide floating-point precision of generated curves and surfaces.
+    CST fitting is always done in float64.
+
+    >>> set_dtype(np.float32)
+
+    ### Inputs:
+    ```text
+    dtype:  np.float64 (default) or np.float32
+    ```
+    '''
+    global _DTYPE
+
+    if np.dtype(dtype) not in (np.dtype(np.float32), np.dtype(np.float64)):
+        raise Exception('dtype must be float32 or float64, not %s'%(str(dtype)))
+
+    _DTYPE = np.dtype(dtype).type
+
+def get_dtype(dtype=None):
+    '''
+    Floating-point precision of generated curves and surfaces
+
+    >>> dtype = get_dtype(dtype=None)
+
+    ### Inputs:
+    ```text
+    dtype:  if None, return the library-wide setting, otherwise return dtype
+    ```
+    '''
+    if dtype is None:
+        return _DTYPE
+
+    return np.dtype(dtype).type
+
+def clustcos(i, nn: int, a0=0.0079, a1=0.96, beta=1.0):
+    '''
+    Point distribution on x-axis [0, 1]. (More points at both ends)
+
+    >>> c = clustcos(i, n, a0, a1, beta)
+
+    ### Inputs:
+    ```text
+    i:      index of current point (start from 0), int or ndarray of indices
+    nn:     total amount of points
+    a0:     parameter for distributing points near x=0
+    a1:     parameter for distributing points near x=1
+    beta:   parameter for distribution points 
+    ```
+
+    ### Return:
+    c (float, or ndarray when i is ndarray)
+    '''
+    aa = np.power((1-np.cos(a0*np.pi))/2.0, beta)
+    dd = np.power((1-np.cos(a1*np.pi))/2.0, beta) - aa
+    yt = i/(nn-1.0)
+    a  = np.pi*(a0*(1-yt)+a1*yt)
+    c  = (np.power((1-np.cos(a))/2.0,beta)-aa)/dd
+
+    return c
+
+@functools.lru_cache(maxsize=64)
+def default_distribution(nn: int, a0=0.0079, a1=0.96, beta=1.0) -> np.ndarray:
+    '''
+    Default point distribution (clustcos) on x-axis [0, 1].
+    The result is memoized and read-only, i.e., it is shared by all callers.
+    Make a copy before modifying it.
+
+    >>> x = default_distribution(nn, a0, a1, beta)
+    '''
+    x = clustcos(np.arange(nn), nn, a0=a0, a1=a1, beta=beta)
+    x.flags.writeable = False
+
+    return x
+
+def cst_basis(x, n_order: int, xn1=0.5, xn2=1.0, cache=True, dtype=np.float64) -> np.ndarray:
+    '''
+    Matrix of CST basis functions, i.e., Bernstein polynomials multiplied by the class function.
+
+    >>> A = cst_basis(x, n_order, xn1, xn2, cache, dtype)
+
+    ### Inputs:
+    ```text
+    x:          points x [0,1] (ndarray)
+    n_order:    number of CST parameters
+    xn1,2:      CST parameters
+    cache:      if True, the matrix is stored in (and taken from) BASIS_CACHE,
+                keyed by (fingerprint of x, n_order, xn1, xn2, dtype).
+                The cached matrix is read-only.
+    dtype:      floating-point precision of the matrix, it is always built in float64
+    ```
+
+    ### Return:
+    A (ndarray [nn, n_order]), the CST curve is y = A @ coef
+    '''
+    if cache:
+        key = (distribution_fingerprint(x), n_order, xn1, xn2, np.dtype(dtype).str)
+        A = BASIS_CACHE.get(key)
+        if A is None:
+            A = BASIS_CACHE.put(key, cst_basis(x, n_order, xn1=xn1, xn2=xn2, cache=False, dtype=dtype))
+        return A
+
+    x = np.asarray(x, dtype=np.float64)[:,None]
+    C_n1n2 = np.power(x,xn1) * np.power(1-x,xn2)
+
+    return (bernstein(x[:,0], n_order-1) * C_n1n2).astype(dtype, copy=False)
+
+def cst_basis_derivatives(x, n_order: int, xn1=0.5, xn2=1.0, order=2, cache=True):
+    '''
+    Derivatives (dA/dx, d2A/dx2) of the CST basis matrix.
+
+    >>> A1, A2 = cst_basis_derivatives(x, n_order, xn1, xn2, order=2)
+
+    ### Inputs:
+    ```text
+    x:          points x [0,1] (ndarray)
+    n_order:    number of CST parameters
+    xn1,2:      CST parameters
+    order:      1 or 2, the highest order of derivatives
+    cache:      if True, the matrices are stored in (and taken from) BASIS_CACHE
+    ```
+
+    ### Return:
+    A1, A2 (ndarray [nn, n_order]), A2 is None when order=1
+
+    ### Note:
+    ```text
+    The derivatives are not finite at x=0 when xn1<order, or x=1 when xn2<order
+    ```
+    '''
+    if cache:
+        key = ('derivatives', distribution_fingerprint(x), n_order, xn1, xn2, order)
+        As = BASIS_CACHE.get(key)
+        if As is None:
+            As = BASIS_CACHE.put(key, cst_basis_derivatives(x, n_order, xn1=xn1, xn2=xn2, order=order, cache=False))
+        return As
+
+    x = np.asarray(x, dtype=float)
+    n = n_order-1
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+
+        #* Class function and its derivatives
+        C  = np.power(x,xn1) * np.power(1-x,xn2)
+        C1 = _power_term(xn1, x, xn1-1, xn2) - _power_term(xn2, x, xn1, xn2-1)
+
+        #* Bernstein polynomials and their derivatives
+        B  = bernstein(x, n)
+        B1 = n*_bernstein_difference(bernstein(x, n-1), n_order) if n>0 else np.zeros_like(B)
+
+        A1 = C1[:,None]*B + C[:,None]*B1
+
+        if order < 2:
+            return A1, None
+
+        C2 = _power_term(xn1*(xn1-1), x, xn1-2, xn2) \
+            - _power_term(2*xn1*xn2, x, xn1-1, xn2-1) \
+            + _power_term(xn2*(xn2-1), x, xn1, xn2-2)
+
+        if n>1:
+            B2 = n*(n-1)*_bernstein_difference(_bernstein_difference(bernstein(x, n-2), n_order-1), n_order)
+        else:
+            B2 = np.zeros_like(B)
+
+        A2 = C2[:,None]*B + 2*C1[:,None]*B1 + C[:,None]*B2
+
+    return A1, A2
+
+def bernstein(x, n: int) -> np.ndarray:
+    '''
+    Bernstein polynomials of degree n
+
+    >>> B = bernstein(x, n)
+
+    ### Return:
+    B (ndarray [nn, n+1])
+
+    ### Note:
+    ```text
+    The binomial coefficients are exact integers rounded to float, instead of ratios of factorials,
+    which overflow when n>170. For n>1000, the binomial coefficients overflow as well,
+    then the polynomials are evaluated in log space (see log_bernstein).
+    ```
+    '''
+    if n > 1000:
+        return np.exp(log_bernstein(x, n))
+
+    x  = np.asarray(x, dtype=float)[:,None]
+    ii = np.arange(n+1)
+
+    binom = np.array([math.comb(n, i) for i in range(n+1)], dtype=float)
+
+    return binom * np.power(x,ii) * np.power(1-x,n-ii)
+
+def log_bernstein(x, n: int) -> np.ndarray:
+    '''
+    Logarithm of Bernstein polynomials of degree n.
+    
+    The binomial coefficients are evaluated by log-gamma functions, 
+    so that high-order polynomials neither overflow nor lose precision by the factorials.
+
+    >>> log_B = log_bernstein(x, n)
+
+    ### Return:
+    log_B (ndarray [nn, n+1]), -inf where the polynomial is zero, e.g., at x=0 or x=1
+    '''
+    x  = np.asarray(x, dtype=float)[:,None]
+    ii = np.arange(n+1)
+
+    log_binom = gammaln(n+1) - gammaln(ii+1) - gammaln(n-ii+1)
+
+    return log_binom + xlogy(ii, x) + xlog1py(n-ii, -x)
+
+def elevate_cst(coef, n_order: int) -> np.ndarray:
+    '''
+    Degree elevation of CST coefficients, i.e., the same curve by more CST parameters
+
+    >>> coef_new = elevate_cst(coef, n_order)
+
+    ### Inputs:
+    ```text
+    coef:       CST coefficients (ndarray [n] or [n_sample, n])
+    n_order:    number of new CST parameters, n_order >= n
+    ```
+
+    ### Return:
+    coef_new (ndarray [n_order] or [n_sample, n_order])
+    '''
+    coef = np.asarray(coef, dtype=np.float64)
+    if n_order < coef.shape[-1]:
+        raise Exception('Degree elevation can not reduce the CST parameters from %d to %d'%(coef.shape[-1], n_order))
+
+    return np.dot(coef, elevation_matrix(coef.shape[-1], n_order).T)
+
+@functools.lru_cache(maxsize=64)
+def elevation_matrix(n_from: int, n_to: int) -> np.ndarray:
+    '''
+    Degree elevation matrix of Bernstein coefficients, from n_from to n_to coefficients.
+    The result is memoized and read-only.
+
+    >>> E = elevation_matrix(n_from, n_to)  # ndarray [n_to, n_from]
+    '''
+    n = n_from-1
+    r = n_to-n_from
+    E = np.zeros((n_to, n_from))
+    for j in range(n_to):
+        for i in range(max(0, j-r), min(n, j)+1):
+            E[j,i] = math.comb(n, i)*math.comb(r, j-i)/math.comb(n+r, j)
+
+    E.flags.writeable = False
+
+    return E
+
+def _bernstein_difference(B, n_col: int) -> np.ndarray:
+    '''
+    D[:,i] = B[:,i-1] - B[:,i], where B[:,-1] = B[:,n_col-1] = 0
+    '''
+    D = np.zeros((B.shape[0], n_col))
+    D[:,1:]  += B
+    D[:,:-1] -= B
+    return D
+
+def _power_term(c: float, x, p1: float, p2: float):
+    '''
+    c * x^p1 * (1-x)^p2, which is zero when c is zero
+    '''
+    if c == 0.0:
+        return np.zeros_like(x)
+    return c * np.power(x,p1) * np.power(1-x,p2)
+
+def distribution_fingerprint(x) -> tuple:
+    '''
+    Fingerprint of a point distribution, used as the key of cached arrays.
+
+    >>> key = distribution_fingerprint(x)
+    '''
+    x = np.ascontiguousarray(x)
+    return (x.shape, x.dtype.str, hashlib.blake2b(x.tobytes(), digest_size=16).digest())
+
+def parameter_fingerprint(*values) -> bytes:
+    '''
+    Fingerprint of parameters (ndarray, float, int, bool, str or None), used as the key of cached results.
+
+    >>> key = parameter_fingerprint(cst_u, cst_l, tail, nn)
+    '''
+    h = hashlib.blake2b(digest_size=16)
+
+    for value in values:
+
+        if isinstance(value, np.ndarray):
+            value = np.ascontiguousarray(value)
+            h.update(('%s%s'%(value.dtype.str, value.shape)).encode())
+            h.update(value.tobytes())
+        else:
+            if isinstance(value, np.generic):
+                value = value.item()
+            h.update(repr(value).encode())
+
+        h.update(b'|')
+
+    return h.digest()
+
+def _copy_arrays(value):
+    '''
+    Copy the ndarrays in value (ndarray, tuple, list or dict)
+    '''
+    if isinstance(value, np.ndarray):
+        return np.array(value)
+
+    if isinstance(value, dict):
+        return {k: _copy_arrays(v) for k, v in value.items()}
 
-    The origin of cylinder and plane curves is the same (0,0,0).
-    
-        Cylinder: x, y, z ~~ r, theta, z
-        Plane:    X, Y, Z
+    if isinstance(value, (tuple, list)):
+        return type(value)([_copy_arrays(v) for v in value])
 
-        theta = arctan(y/x)
-        r = sqrt(x^2+y^2)
-        z = z
+    return value
 
-        X = r*theta
-        Y = z
-        Z = r
-    ```
+def _freeze(value):
     '''
-    coef = -1.0 if flip else 1.0
+    Set ndarrays in value (ndarray, tuple, list or dict) to read-only
+    '''
+    if isinstance(value, np.ndarray):
+        value.flags.writeable = False
 
-    if origin is not None:
-        x = x - origin[0]
-        y = y - origin[1]
+    elif isinstance(value, dict):
+        for v in value.values():
+            _freeze(v)
 
-    rr = np.sqrt(x*x+y*y)
-    tt = np.arctan2(y, x) * coef
+    elif isinstance(value, (tuple, list)):
+        for v in value:
+            _freeze(v)
 
-    X = rr*tt
-    Y = z.copy()
-    Z = rr
+def _nbytes(value) -> int:
+    '''
+    Memory (bytes) of ndarrays in value (ndarray, tuple, list or dict)
+    '''
+    if isinstance(value, np.ndarray):
+        return value.nbytes
 
-    return X, Y, Z
+    if isinstance(value, dict):
+        value = list(value.values())
 
-def toCylinder(X, Y, Z, flip=True, origin=None):
+    if isinstance(value, (tuple, list)):
+        return sum([_nbytes(v) for v in value])
+
+    return 0
+
+def cst_curve(nn: int, coef, x=None, xn1=0.5, xn2=1.0, dtype=None):
     '''
-    Bend the plane sections to curves on a cylinder.
+    Generating single curve based on CST method.
+
+    CST:    class shape transfermation method (Kulfan, 2008)
+
+    >>> x, y = cst_curve(nn, coef, x, xn1, xn2, dtype)
 
     ### Inputs:
     ```text
-    X, Y, Z:    ndarray, point coordinates of curves on 2D X-Y planes
-                Z must not be 0
-    flip:       if True, flip the X of plane curve
-    origin:     default None.
-                if provided a list [x0, y0], then the cylinder origin is [x0, y0]
+    nn:     total amount of points
+    coef:   CST coefficients (ndarray)
+    x:      points x [0,1] (optional ndarray, size= nn)
+            if None, x is default_distribution(nn)
+    xn1,2:  CST parameters
+    dtype:  floating-point precision of x and y, None means get_dtype()
     ```
-
     ### Return:
-    x, y ,z:    ndarray, point coordinate of curves bent to a cylinder
+    x, y (ndarray)
+    '''
+    dtype = get_dtype(dtype)
 
-    ### Note:
-    ```text
-    The origin of cylinder and plane curves is the same (0,0,0).
-    
-        Plane:    X, Y, Z
-        Cylinder: x, y, z ~~ r, theta, z
-        
-        theta = arctan(y/x)
-        r = sqrt(x^2+y^2)
-        z = z
+    if x is None:
+        x = default_distribution(nn)
+    elif x.shape[0] != nn:
+        raise Exception('Specified point distribution has different size %d as input nn %d'%(x.shape[0], nn))
 
-        X = r*theta
-        Y = z
-        Z = r
-    ```
+    y = get_kernel('cst_curve')(x, coef, xn1, xn2, dtype)
+
+    y[0] = 0.0
+    y[-1] = 0.0
+
+    # The memoized default distribution is read-only, callers get a writable copy
+    return x.astype(dtype, copy=not x.flags.writeable), y
+
+@register_kernel('cst_curve')
+def _cst_curve_numpy(x, coef, xn1: float, xn2: float, dtype):
+    A = cst_basis(x, coef.shape[0], xn1=xn1, xn2=xn2, dtype=dtype)
+    return np.dot(A, np.asarray(coef, dtype=dtype))
+
+def cst_curve_derivatives(coef, x, order=2, xn1=0.5, xn2=1.0):
     '''
-    coef = -1.0 if flip else 1.0
+    Analytic derivatives of a CST curve.
 
-    nn = X.shape[0]
-    x = np.zeros(nn)
-    y = np.zeros(nn)
-    z = Y.copy()
+    >>> dy, d2y = cst_curve_derivatives(coef, x, order=2, xn1, xn2)
 
-    for i in range(nn):
-        r = Z[i]
-        theta = X[i]/r * coef
-        x[i] = r*np.cos(theta)
-        y[i] = r*np.sin(theta)
+    ### Inputs:
+    ```text
+    coef:   CST coefficients (ndarray)
+    x:      points x [0,1] (ndarray)
+    order:  1 or 2, the highest order of derivatives
+    xn1,2:  CST parameters
+    ```
 
-    if origin is not None:
-        x = x + origin[0]
-        y = y + origin[1]
+    ### Return:
+    dy/dx, d2y/dx2 (ndarray), only dy/dx is returned when order=1
+    '''
+    A1, A2 = cst_basis_derivatives(x, coef.shape[0], xn1=xn1, xn2=xn2, order=order)
 
-    return x, y, z
+    if order < 2:
+        return np.dot(A1, coef)
 
-#* ===========================================
-#* Supportive functions
-#* ===========================================
+    return np.dot(A1, coef), np.dot(A2, coef)
 
-def clustcos(i: int, nn: int, a0=0.0079, a1=0.96, beta=1.0) -> float:
+def cst_curve_curvature(coef, x, slope=0.0, xn1=0.5, xn2=1.0):
     '''
-    Point distribution on x-axis [0, 1]. (More points at both ends)
+    Analytic curvature of a CST curve, the sign is the same as curve_curvature
 
-    >>> c = clustcos(i, n, a0, a1, beta)
+    >>> curv = cst_curve_curvature(coef, x, slope, xn1, xn2)
 
     ### Inputs:
     ```text
-    i:      index of current point (start from 0)
-    nn:     total amount of points
-    a0:     parameter for distributing points near x=0
-    a1:     parameter for distributing points near x=1
-    beta:   parameter for distribution points 
+    coef:   CST coefficients (ndarray)
+    x:      points x [0,1] (ndarray)
+    slope:  slope of a linear function added to the curve, e.g., the tail
+    xn1,2:  CST parameters
     ```
+
+    ### Return:
+    curv (ndarray), the values at both ends are copied from their neighbors
     '''
-    aa = np.power((1-np.cos(a0*np.pi))/2.0, beta)
-    dd = np.power((1-np.cos(a1*np.pi))/2.0, beta) - aa
-    yt = i/(nn-1.0)
-    a  = np.pi*(a0*(1-yt)+a1*yt)
-    c  = (np.power((1-np.cos(a))/2.0,beta)-aa)/dd
+    dy, d2y = cst_curve_derivatives(coef, x, order=2, xn1=xn1, xn2=xn2)
+    dy = dy + slope
 
-    return c
+    curv = d2y/np.power(1+dy**2, 1.5)
+    curv[0] = curv[1]
+    curv[-1] = curv[-2]
 
-def cst_curve(nn: int, coef, x=None, xn1=0.5, xn2=1.0):
-    '''
-    Generating single curve based on CST method.
+    return curv
 
-    CST:    class shape transfermation method (Kulfan, 2008)
+def cst_curve_batch(nn: int, coefs, x=None, xn1=0.5, xn2=1.0, dtype=None):
+    '''
+    Generating a batch of curves based on CST method, by one matrix product.
 
-    >>> x, y = cst_curve(nn, coef, x, xn1, xn2)
+    >>> x, y = cst_curve_batch(nn, coefs, x, xn1, xn2, dtype)
 
     ### Inputs:
     ```text
     nn:     total amount of points
-    coef:   CST coefficients (ndarray)
+    coefs:  CST coefficients (ndarray [n_sample, n_order])
     x:      points x [0,1] (optional ndarray, size= nn)
     xn1,2:  CST parameters
+    dtype:  floating-point precision of x and y, None means get_dtype()
     ```
     ### Return:
-    x, y (ndarray)
+    x (ndarray [nn]), y (ndarray [n_sample, nn])
     '''
+    dtype = get_dtype(dtype)
+
     if x is None:
-        x = np.zeros(nn)
-        for i in range(nn):
-            x[i] = clustcos(i, nn)
+        x = default_distribution(nn)
     elif x.shape[0] != nn:
         raise Exception('Specified point distribution has different size %d as input nn %d'%(x.shape[0], nn))
-    
-    n_order = coef.shape[0]
-    y = np.zeros(nn)
-    for ip in range(nn):
-        s_psi = 0.0
-        for i in range(n_order):
-            xk_i_n = factorial(n_order-1)/factorial(i)/factorial(n_order-1-i)
-            s_psi += coef[i]*xk_i_n * np.power(x[ip],i) * np.power(1-x[ip],n_order-1-i)
 
-        C_n1n2 = np.power(x[ip],xn1) * np.power(1-x[ip],xn2)
-        y[ip] = C_n1n2*s_psi
+    coefs = np.atleast_2d(np.asarray(coefs, dtype=dtype))
+    y = np.dot(coefs, cst_basis(x, coefs.shape[1], xn1=xn1, xn2=xn2, dtype=dtype).T)
 
-    y[0] = 0.0
-    y[-1] = 0.0
+    y[:,0] = 0.0
+    y[:,-1] = 0.0
 
-    return x, y
+    # The memoized default distribution is read-only, callers get a writable copy
+    return x.astype(dtype, copy=not x.flags.writeable), y
 
 def find_circle_3p(p1, p2, p3):
     '''
@@ -1060,39 +2869,49 @@ def curve_curvature(x, y):
     nn = x.shape[0]
     if nn<3:
         raise Exception('curvature needs at least 3 points')
-    
-    curv = np.zeros(nn)
-    for i in range(1, nn-1):
-        X1 = np.array([x[i-1], y[i-1]])
-        X2 = np.array([x[i  ], y[i  ]])
-        X3 = np.array([x[i+1], y[i+1]])
-
-        a = np.linalg.norm(X1-X2)
-        b = np.linalg.norm(X2-X3)
-        c = np.linalg.norm(X3-X1)
-        p = 0.5*(a+b+c)
-        t = p*(p-a)*(p-b)*(p-c)
-        R = a*b*c
-        if R <= 1.0E-12:
-            curv_ = 0.0
-        else:
-            curv_ = 4.0*np.sqrt(t)/R
 
-        a1 = X2[0] - X1[0]
-        a2 = X2[1] - X1[1]
-        b1 = X3[0] - X1[0]
-        b2 = X3[1] - X1[1]
-        if a1*b2 < a2*b1:
-            curv_ = -curv_
+    return get_kernel('curve_curvature')(x, y)
 
-        curv[i] = curv_
-
-    curv[0] = curv[1]
-    curv[-1] = curv[-2]
+@register_kernel('curve_curvature')
+def _curve_curvature_numpy(x, y):
+    '''
+    Curvature of the circle through each three neighbouring points (Heron's formula).
+    The points are in the last axis, i.e., y can be a batch of curves [..., nn] on the same x [nn].
+    '''
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    a = np.hypot(x[...,:-2]-x[...,1:-1], y[...,:-2]-y[...,1:-1])
+    b = np.hypot(x[...,1:-1]-x[...,2:],  y[...,1:-1]-y[...,2:])
+    c = np.hypot(x[...,2:]-x[...,:-2],   y[...,2:]-y[...,:-2])
+    p = 0.5*(a+b+c)
+    t = np.maximum(p*(p-a)*(p-b)*(p-c), 0.0)
+    R = a*b*c
+
+    curv_ = np.zeros_like(R)
+    np.divide(4.0*np.sqrt(t), R, out=curv_, where=R>1.0E-12)
+
+    a1 = x[...,1:-1] - x[...,:-2]
+    a2 = y[...,1:-1] - y[...,:-2]
+    b1 = x[...,2:] - x[...,:-2]
+    b2 = y[...,2:] - y[...,:-2]
+    curv_[a1*b2 < a2*b1] *= -1.0
+
+    curv = np.zeros(curv_.shape[:-1]+(curv_.shape[-1]+2,))
+    curv[...,1:-1] = curv_
+    curv[...,0] = curv[...,1]
+    curv[...,-1] = curv[...,-2]
 
     return curv
 
-def transform(xu, xl, yu, yl, scale=1.0, rot=None, x0=None, y0=None, dx=0.0, dy=0.0, proj=False):
+@register_kernel('curve_curvature_batch')
+def _curve_curvature_batch_numpy(x, Y):
+    '''
+    Curvature of a batch of curves Y [n_sample, nn] on the same x [nn] (see _curve_curvature_numpy)
+    '''
+    return _curve_curvature_numpy(x, Y)
+
+def transform(xu, xl, yu, yl, scale=1.0, rot=None, x0=None, y0=None, dx=0.0, dy=0.0, proj=False, dtype=None):
     '''
     Apply chord length, twist angle(deg) and leading edge position to unit airfoil
 
@@ -1108,6 +2927,7 @@ def transform(xu, xl, yu, yl, scale=1.0, rot=None, x0=None, y0=None, dx=0.0, dy=
     dx, dy:     translation, e.g., leading edge location
     proj:       if True, for unit airfoil, the rotation keeps 
                 the projection length the same
+    dtype:      floating-point precision of the results, None means the same as inputs
     ```
 
     ### Return: 
@@ -1115,37 +2935,100 @@ def transform(xu, xl, yu, yl, scale=1.0, rot=None, x0=None, y0=None, dx=0.0, dy=
     xu_new, xl_new, yu_new, yl_new (ndarray)
     ```
     '''
-    #* Translation
-    xu_new = dx + xu
-    xl_new = dx + xl
-    yu_new = dy + yu
-    yl_new = dy + yl
+    if dtype is None:
+        dtype = np.result_type(xu, xl, yu, yl)
 
     #* Rotation center
     if x0 is None:
-        x0 = xu_new[0]
+        x0 = xu[0] + dx
     if y0 is None:
-        y0 = 0.5*(yu_new[0]+yl_new[0])
-    
+        y0 = 0.5*(yu[0]+yl[0]) + dy
+
+    M = transform_matrix(scale=scale, rot=rot, x0=x0, y0=y0, dx=dx, dy=dy, proj=proj)
+
+    xu_new, yu_new = apply_transform(M, xu, yu, dtype=dtype)
+    xl_new, yl_new = apply_transform(M, xl, yl, dtype=dtype)
+
+    return xu_new, xl_new, yu_new, yl_new
+
+def transform_matrix(scale=1.0, rot=None, x0=0.0, y0=0.0, dx=0.0, dy=0.0, proj=False) -> np.ndarray:
+    '''
+    Affine matrix of transform(), i.e., translation, scale and rotation in one step
+
+    >>> M = transform_matrix(scale, rot, x0, y0, dx, dy, proj)
+
+    ### Inputs:
+    ```text
+    scale, rot, dx, dy, proj: same as transform() (float or ndarray [ns])
+    x0, y0:     rotation and scale center after the translation (float or ndarray [ns])
+    ```
+
+    ### Return:
+    ```text
+    M:  ndarray [2,3] (or [ns,2,3]), [x_new, y_new] = M[:,:2] @ [x, y] + M[:,2]
+    ```
+    '''
+    scale, x0, y0, dx, dy = [np.asarray(v, dtype=np.float64) for v in [scale, x0, y0, dx, dy]]
+
+    angle = 0.0 if rot is None else np.asarray(rot, dtype=np.float64)/180.0*np.pi
+    cc = np.cos(angle)
+    ss = np.sin(angle)
+
     #* Scale (keeps the same projection length)
-    rr = 1.0
     if proj and not rot is None:
-        angle = rot/180.0*np.pi  # rad
-        rr = np.cos(angle)
+        scale = scale/cc
 
-    xu_new = x0 + (xu_new-x0)*scale/rr
-    xl_new = x0 + (xl_new-x0)*scale/rr
-    yu_new = y0 + (yu_new-y0)*scale/rr
-    yl_new = y0 + (yl_new-y0)*scale/rr
+    a = scale*cc
+    b = scale*ss
 
-    #* Rotation
-    if not rot is None:
-        xu_new, yu_new, _ = rotate(xu_new, yu_new, None, angle=rot, origin=[x0, y0, 0.0], axis='Z')
-        xl_new, yl_new, _ = rotate(xl_new, yl_new, None, angle=rot, origin=[x0, y0, 0.0], axis='Z')
+    shape = np.broadcast(scale, angle, x0, y0, dx, dy).shape
+    M = np.empty(shape+(2,3))
+    M[...,0,0] = a
+    M[...,0,1] = -b
+    M[...,0,2] = x0 + a*(dx-x0) - b*(dy-y0)
+    M[...,1,0] = b
+    M[...,1,1] = a
+    M[...,1,2] = y0 + b*(dx-x0) + a*(dy-y0)
 
-    return xu_new, xl_new, yu_new, yl_new
+    return M
+
+def apply_transform(M, x, y, dtype=None):
+    '''
+    Apply affine matrices of transform_matrix() to curves
+
+    >>> x_new, y_new = apply_transform(M, x, y, dtype)
+
+    ### Inputs:
+    ```text
+    M:      affine matrix, ndarray [2,3] or [ns,2,3]
+    x, y:   curves, ndarray [nn] or [ns,nn]
+    dtype:  floating-point precision of the results, None means the same as inputs
+    ```
+
+    ### Return:
+    ```text
+    x_new, y_new (ndarray [nn] or [ns,nn])
+    ```
+    '''
+    if dtype is None:
+        dtype = np.result_type(x, y)
 
-def rotate(x, y, z, angle=0.0, origin=[0.0, 0.0, 0.0], axis='X'):
+    # The matrix is in the precision of the results, so that it does not promote float32 curves
+    M = np.asarray(M).astype(dtype, copy=False)[...,None]
+
+    x_new = np.multiply(x, M[...,0,0,:], dtype=dtype)
+    x_new += M[...,0,2,:]
+    tmp = np.multiply(y, M[...,0,1,:], dtype=dtype)
+    x_new += tmp
+
+    y_new = np.multiply(x, M[...,1,0,:], dtype=dtype)
+    y_new += M[...,1,2,:]
+    np.multiply(y, M[...,1,1,:], out=tmp)
+    y_new += tmp
+
+    return x_new, y_new
+
+def rotate(x, y, z, angle=0.0, origin=[0.0, 0.0, 0.0], axis='X', dtype=None):
     '''
     Rotate the 3D curve according to origin
 
@@ -1157,16 +3040,26 @@ def rotate(x, y, z, angle=0.0, origin=[0.0, 0.0, 0.0], axis='X'):
     angle:  rotation angle (deg)
     origin: rotation origin
     axis:   rotation axis (use positive direction to define angle)
+    dtype:  floating-point precision of the results, None means the same as inputs
     ```
 
     ### Return:
     x_, y_, z_ (ndarray)
     '''
-    cc = np.cos( angle/180.0*np.pi )
-    ss = np.sin( angle/180.0*np.pi )
-    x_ = copy.deepcopy(x)
-    y_ = copy.deepcopy(y)
-    z_ = copy.deepcopy(z)
+    if dtype is not None:
+        x = None if x is None else np.asarray(x, dtype=dtype)
+        y = None if y is None else np.asarray(y, dtype=dtype)
+        z = None if z is None else np.asarray(z, dtype=dtype)
+
+    # The parameters are cast to the precision of the curve, so that they do not promote float32 arrays,
+    # and they can be arrays as well, e.g., one angle for each point
+    dtype_ = np.result_type(np.float32, *[np.asarray(a) for a in [x, y, z] if a is not None])
+    origin = [np.asarray(o, dtype=dtype_) for o in origin]
+
+    angle = np.asarray(angle, dtype=np.float64)/180.0*np.pi
+    cc = np.cos(angle).astype(dtype_)
+    ss = np.sin(angle).astype(dtype_)
+    x_, y_, z_ = x, y, z
 
     if axis in 'X':
         y_ = origin[1] + (y-origin[1])*cc - (z-origin[2])*ss
@@ -1180,6 +3073,11 @@ def rotate(x, y, z, angle=0.0, origin=[0.0, 0.0, 0.0], axis='X'):
         x_ = origin[0] + (x-origin[0])*cc - (y-origin[1])*ss
         y_ = origin[1] + (x-origin[0])*ss + (y-origin[1])*cc
 
+    #* Only the coordinate along the axis is copied, the others are new arrays
+    x_ = copy.deepcopy(x) if x_ is x else x_
+    y_ = copy.deepcopy(y) if y_ is y else y_
+    z_ = copy.deepcopy(z) if z_ is z else z_
+
     return x_, y_, z_
 
 def interplot_from_curve(x0, x, y) -> np.ndarray:
@@ -1202,6 +3100,32 @@ def interplot_from_curve(x0, x, y) -> np.ndarray:
 
     return y0
 
+def interplot_weights(x0: float, x) -> np.ndarray:
+    '''
+    Weights of the cubic interpolation (same as interplot_from_curve) at x0,
+    i.e., y0 = w @ y for any curve y defined on points x.
+    The weights are cached in BASIS_CACHE.
+
+    >>> w = interplot_weights(x0, x)
+
+    ### Inputs:
+    ```text
+    x0: x location to be interploted (float)
+    x:  points x of curves (ndarray [nn])
+    ```
+
+    ### Return: 
+    w: ndarray [nn]
+    '''
+    key = ('interplot', distribution_fingerprint(x), x0)
+    w = BASIS_CACHE.get(key)
+
+    if w is None:
+        w = interplot_from_curve(x0, x, np.eye(x.shape[0]))
+        w = BASIS_CACHE.put(key, np.ascontiguousarray(w))
+
+    return w
+
 def curve_intersect(x1, y1, x2, y2):
     '''
     Find the intersect index between two curves.
@@ -1249,9 +3173,6 @@ def stretch_fixed_point(x, y, dx=0.0, dy=0.0, xm=None, ym=None, xf=None, yf=None
     ### Returns:
     x_, y_ (ndarray)
     '''
-    x_ = x.copy()
-    y_ = y.copy()
-
     if xf is None or yf is None:
         xf = x[-1]
         yf = y[-1]
@@ -1260,14 +3181,13 @@ def stretch_fixed_point(x, y, dx=0.0, dy=0.0, xm=None, ym=None, xf=None, yf=None
         xm = x[0]
         ym = y[0]
 
-    lm = np.linalg.norm([xm-xf, ym-yf])
+    return get_kernel('stretch_fixed_point')(x, y, dx, dy, xm, ym, xf, yf)
 
-    for i in range(x.shape[0]):
-        rr  = np.linalg.norm([x[i]-xf, y[i]-yf]) / lm
-        x_[i] = x_[i] + rr*dx
-        y_[i] = y_[i] + rr*dy
-
-    return x_, y_
+@register_kernel('stretch_fixed_point')
+def _stretch_fixed_point_numpy(x, y, dx, dy, xm, ym, xf, yf):
+    lm = np.hypot(xm-xf, ym-yf)
+    rr = np.hypot(x-xf, y-yf) / lm
+    return x + rr*dx, y + rr*dy
 
 def add_bump(x, y, xc: float, h: float, s: float, kind='G'):
     '''
@@ -1297,15 +3217,7 @@ def add_bump(x, y, xc: float, h: float, s: float, kind='G'):
 
     if 'G' in kind:
 
-        for i in range(x.shape[0]):
-            if xc-s<0.0 and x[i]<xc:
-                sigma = xc/3.5
-            elif  xc+s>1.0 and x[i]>xc:
-                sigma = (1.0-xc)/3.5
-            else:
-                sigma = s/6.0
-            aa = -np.power(x[i]-xc,2)/2.0/sigma**2
-            y_new[i] += h*np.exp(aa)
+        y_new += get_kernel('bump_gaussian')(x, xc, h, s)
 
     else:
         
@@ -1314,40 +3226,48 @@ def add_bump(x, y, xc: float, h: float, s: float, kind='G'):
         Pow = 1
         span = 1.0
         hm = np.abs(h)
+        xx = np.arange(201)*0.005
+        rr = np.pi*np.power(xx,s0)
         while Pow<100 and span>s:
-            x1  = -1.0
-            x2  = -1.0
-            for i in range(0, 201):
-                xx = i*0.005
-                rr = np.pi*np.power(xx,s0)
-                yy = hm * np.power(np.sin(rr),Pow)
-                if yy > 0.01*hm and x1<0.0 and xx<xc:
-                    x1 = xx
-                if yy < 0.01*hm and x2<0.0 and xx>xc:
-                    x2 = xx
-            if x2 < 0.0:
-                x2 = 1.0
+            yy = hm * np.power(np.sin(rr),Pow)
+            i1 = np.flatnonzero(np.logical_and(yy > 0.01*hm, xx<xc))
+            i2 = np.flatnonzero(np.logical_and(yy < 0.01*hm, xx>xc))
+            x1 = xx[i1[0]] if i1.shape[0]>0 else -1.0
+            x2 = xx[i2[0]] if i2.shape[0]>0 else  1.0
             
             span = x2 - x1
             Pow = Pow + 1
 
-        for i in range(len(x)):
-            rr = np.pi*np.power(x[i],s0)
-            dy = h*np.power(np.sin(rr),Pow)
-            y_new[i] += dy
+        y_new += get_kernel('bump_hicks_henne')(x, s0, h, Pow)
 
     return y_new
 
-def fit_curve(x, y, n_order=7, xn1=0.5, xn2=1.0):
+@register_kernel('bump_gaussian')
+def _bump_gaussian_numpy(x, xc: float, h: float, s: float):
+    sigma = np.full(x.shape, s/6.0)
+    if xc-s<0.0:
+        sigma[x<xc] = xc/3.5
+    if xc+s>1.0:
+        sigma[x>xc] = (1.0-xc)/3.5
+    aa = -np.power(x-xc,2)/2.0/sigma**2
+    return h*np.exp(aa)
+
+@register_kernel('bump_hicks_henne')
+def _bump_hicks_henne_numpy(x, s0: float, h: float, Pow: int):
+    rr = np.pi*np.power(x,s0)
+    return h*np.power(np.sin(rr),Pow)
+
+def fit_curve(x, y, n_order=7, xn1=0.5, xn2=1.0, cache=False):
     '''
     Using least square method to fit a CST curve
 
-    >>> coef = fit_curve(x, y, n_order, xn1, xn2)
+    >>> coef = fit_curve(x, y, n_order, xn1, xn2, cache)
 
     ### Input:
     ```text
     x, y:    curve points (ndarray)
     n_order: number of CST parameters
+    cache:   if True, fit by the cached least square operator (see fit_curves_batch)
     ```
 
     ### Attributes:
@@ -1358,24 +3278,192 @@ def fit_curve(x, y, n_order=7, xn1=0.5, xn2=1.0):
 
     ### Return: 
     coef (ndarray)
+
+    ### Note:
+    ```text
+    By default, the curve is solved by lstsq without the cache, 
+    since single curves are usually fitted on their own points.
+    ```
     '''
-    nn = x.shape[0]
+    if cache:
+        return fit_curves_batch(x, y, n_order=n_order, xn1=xn1, xn2=xn2, cache=True)[0]
+
+    x  = np.asarray(x, dtype=np.float64)
+    y  = np.asarray(y, dtype=np.float64)
+    L  = x[-1] - x[0]   # type: float
+    x_ = (x-x[0])/L     # scaling x to 0~1
+    b  = y - x_*y[-1]   # removing tail
+
+    A = cst_basis(x_, n_order, xn1=xn1, xn2=xn2, cache=False)
+
+    return lstsq(A, b, rcond=None)[0]
+
+def fit_curve_auto_order(x, y, tol=1e-5, max_order=20, min_order=1, xn1=0.5, xn2=1.0):
+    '''
+    Using least square method to fit a CST curve, 
+    with the lowest number of CST parameters that meets the target residual.
+
+    >>> coef, n_order, history = fit_curve_auto_order(x, y, tol, max_order, min_order, xn1, xn2)
+
+    ### Input:
+    ```text
+    x, y:       curve points (ndarray)
+    tol:        target root mean square error of the fitting
+    max_order:  maximum number of CST parameters
+    min_order:  minimum number of CST parameters
+    ```
+
+    ### Return: 
+    ```text
+    coef:       CST coefficients (ndarray [n_order])
+    n_order:    number of CST parameters chosen
+    history:    root mean square errors (ndarray [n_order-min_order+1]), 
+                history[i] is the error with min_order+i CST parameters
+    ```
+
+    ### Note:
+    ```text
+    The orders are checked by a nested factorization (see _NestedCurveFit),
+    so that increasing the order only adds one column to the factorization.
+    Then only the chosen order is fitted by fit_curve.
+    ```
+    '''
+    fit = _NestedCurveFit(x, y, n_order=min_order, xn1=xn1, xn2=xn2)
+
+    history = [fit.rms()[0]]
+    for n_order in range(min_order+1, max_order+1):
+        if history[-1] <= tol:
+            break
+        history.append(fit.add_order()[0])
+
+    n_order = min_order + len(history) - 1
+    coef = fit_curve(x, y, n_order=n_order, xn1=xn1, xn2=xn2)
+
+    return coef, n_order, np.array(history)
+
+class _NestedCurveFit():
+    '''
+    Least square residuals of CST fitting with increasing number of CST parameters.
+
+    The Bernstein basis of n_order-1 degree spans the polynomials of degree below n_order,
+    so the space of CST curves with n_order parameters is also spanned by
+    the class function times Chebyshev polynomials T_0, ..., T_{n_order-1} (of 2x-1),
+    which is nested as n_order increases. Each order adds one column to the
+    orthonormal factor Q (Gram-Schmidt, twice), and the residuals are updated by that column.
+
+    >>> fit = _NestedCurveFit(x, Y, n_order, xn1, xn2)
+    >>> rms = fit.add_order()
+    '''
+    def __init__(self, x, Y, n_order=1, xn1=0.5, xn2=1.0):
+
+        x  = np.asarray(x, dtype=np.float64)
+        Y  = np.atleast_2d(np.asarray(Y, dtype=np.float64))
+        L  = x[-1] - x[0]
+        x_ = (x-x[0])/L
+
+        self.C = np.power(x_,xn1) * np.power(1-x_,xn2)
+        self.t = 2.0*x_ - 1.0
+        self.T = [np.ones_like(x_), self.t]
+
+        self.Q = np.zeros((x_.shape[0], 0))
+        self.E = Y - x_[None,:]*Y[:,-1:]    # residuals, tail removed
+        self.n_order = 0
+
+        for _ in range(n_order):
+            self.add_order()
+
+    def add_order(self) -> np.ndarray:
+        '''
+        Add one CST parameter, return the root mean square errors of all curves
+        '''
+        k = self.n_order
+        if k >= 2:
+            self.T.append(2.0*self.t*self.T[-1] - self.T[-2])
+
+        v = self.T[k]*self.C
+        norm0 = np.linalg.norm(v)
+
+        for _ in range(2):
+            v = v - np.dot(self.Q, np.dot(self.Q.T, v))
+
+        norm = np.linalg.norm(v)
+        if norm > 1E-12*norm0:
+            q = v/norm
+            self.Q = np.column_stack((self.Q, q))
+            self.E = self.E - np.outer(np.dot(self.E, q), q)
+
+        self.n_order += 1
+
+        return self.rms()
+
+    def rms(self) -> np.ndarray:
+        '''
+        Root mean square errors of all curves with the current number of CST parameters
+        '''
+        return np.sqrt(np.mean(self.E**2, axis=1))
+
+def fit_curves_batch(x, Y, n_order=7, xn1=0.5, xn2=1.0, cache=True):
+    '''
+    Using least square method to fit a batch of CST curves on the same points x.
+    The pseudo-inverse of the basis matrix is computed once and cached (see cst_pinv).
+
+    >>> coefs = fit_curves_batch(x, Y, n_order, xn1, xn2, cache)
+
+    ### Input:
+    ```text
+    x:       points x of all curves (ndarray [nn])
+    Y:       points y of curves (ndarray [n_sample, nn] or [nn])
+    n_order: number of CST parameters
+    cache:   if True, the pseudo-inverse is stored in (and taken from) BASIS_CACHE,
+             which pays off when the same points x are fitted again
+    ```
+
+    ### Return: 
+    coefs (ndarray [n_sample, n_order])
+    '''
+    x  = np.asarray(x, dtype=np.float64)
+    Y  = np.atleast_2d(np.asarray(Y, dtype=np.float64))
     L  = x[-1] - x[0]   # type: float
     x_ = (x-x[0])/L     # scaling x to 0~1
-    b  = y.copy()
-    for ip in range(nn):
-        b[ip] -= x_[ip]*y[-1]   # removing tail
+    B  = Y - x_[None,:]*Y[:,-1:]    # removing tail
+
+    P = cst_pinv(x_, n_order, xn1=xn1, xn2=xn2, cache=cache)
+
+    return np.dot(B, P.T)
+
+def cst_pinv(x, n_order: int, xn1=0.5, xn2=1.0, cache=True) -> np.ndarray:
+    '''
+    Pseudo-inverse of the CST basis matrix, i.e., the least square solution operator.
+    It uses the same cutoff of small singular values as numpy.linalg.lstsq(rcond=None).
+
+    >>> P = cst_pinv(x, n_order, xn1, xn2, cache)
 
-    A = np.zeros((nn, n_order))
-    for ip in range(nn):
-        C_n1n2 = np.power(x_[ip],xn1) * np.power(1-x_[ip],xn2)
-        for i in range(n_order):
-            xk_i_n = factorial(n_order-1)/factorial(i)/factorial(n_order-1-i)
-            A[ip][i] = xk_i_n * np.power(x_[ip],i) * np.power(1-x_[ip],n_order-1-i) * C_n1n2
+    ### Inputs:
+    ```text
+    x:          points x [0,1] (ndarray)
+    n_order:    number of CST parameters
+    xn1,2:      CST parameters
+    cache:      if True, the matrix is stored in (and taken from) BASIS_CACHE
+    ```
+
+    ### Return:
+    P (ndarray [n_order, nn]), the CST coefficients of curve y are np.dot(P, y)
+    '''
+    if cache:
+        key = ('pinv', distribution_fingerprint(x), n_order, xn1, xn2)
+        P = BASIS_CACHE.get(key)
+        if P is None:
+            P = BASIS_CACHE.put(key, cst_pinv(x, n_order, xn1=xn1, xn2=xn2, cache=False))
+        return P
 
-    solution = lstsq(A, b, rcond=None)
+    A = cst_basis(x, n_order, xn1=xn1, xn2=xn2, cache=False)
 
-    return solution[0]
+    U, sv, Vt = svd(A, full_matrices=False)
+    cutoff = np.finfo(np.float64).eps * max(A.shape) * sv[0]
+    sv_inv = np.zeros_like(sv)
+    sv_inv[sv>cutoff] = 1.0/sv[sv>cutoff]
+
+    return np.dot(Vt.T*sv_inv, U.T)
 
 def fit_curve_with_twist(x, y, n_order=7, xn1=0.5, xn2=1.0):
     '''
@@ -1401,6 +3489,9 @@ def fit_curve_with_twist(x, y, n_order=7, xn1=0.5, xn2=1.0):
     twist:  degree, +z axis
     thick:  maximum relative thickness
     '''
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
     chord = np.sqrt((x[0]-x[-1])**2+(y[0]-y[-1])**2)
     twist = np.arctan((y[-1]-y[0])/(x[-1]-x[0]))*180/np.pi
 
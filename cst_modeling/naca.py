@@ -32,99 +32,110 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 THE SOFTWARE.
 """
 
-from math import cos, sin, tan
-from math import atan
 from math import pi
-from math import pow
-from math import sqrt
 
-def linspace(start,stop,np):
+import numpy as np
+
+def linspace(start,stop,num):
     """
     Emulate Matlab linspace
     """
-    return [start+(stop-start)*i/(np-1) for i in range(np)]
+    return np.linspace(start, stop, num)
 
-def interpolate(xa,ya,queryPoints):
-    """
-    A cubic spline interpolation on a given set of points (x,y)
-    Recalculates everything on every call which is far from efficient but does the job for now
-    should eventually be replaced by an external helper class
+class SplineInterpolator():
     """
+    A natural cubic spline interpolation on a given set of points (x,y).
+    The tridiagonal system is solved once, and the second derivatives are kept
+    for vectorized queries.
 
-    # PreCompute() from Paint Mono which in turn adapted:
-    # NUMERICAL RECIPES IN C: THE ART OF SCIENTIFIC COMPUTING
-    # ISBN 0-521-43108-5, page 113, section 3.3.
-    # http://paint-mono.googlecode.com/svn/trunk/src/PdnLib/SplineInterpolator.cs
+    >>> spline = SplineInterpolator(xa, ya)
+    >>> y = spline(queryPoints)
+    """
+    def __init__(self, xa, ya):
 
-    #number of points
-    n = len(xa)
-    u, y2 = [0]*n, [0]*n
+        # PreCompute() from Paint Mono which in turn adapted:
+        # NUMERICAL RECIPES IN C: THE ART OF SCIENTIFIC COMPUTING
+        # ISBN 0-521-43108-5, page 113, section 3.3.
+        # http://paint-mono.googlecode.com/svn/trunk/src/PdnLib/SplineInterpolator.cs
 
-    for i in range(1,n-1):
+        self.xa = np.array(xa, dtype=float)
+        self.ya = np.array(ya, dtype=float)
 
-        # This is the decomposition loop of the tridiagonal algorithm.
-        # y2 and u are used for temporary storage of the decomposed factors.
+        xa = self.xa
+        ya = self.ya
 
-        wx = xa[i + 1] - xa[i - 1]
-        sig = (xa[i] - xa[i - 1]) / wx
-        p = sig * y2[i - 1] + 2.0
+        #number of points
+        n = xa.shape[0]
+        u, y2 = np.zeros(n), np.zeros(n)
 
-        y2[i] = (sig - 1.0) / p
+        for i in range(1,n-1):
 
-        ddydx = (ya[i + 1] - ya[i]) / (xa[i + 1] - xa[i]) - (ya[i] - ya[i - 1]) / (xa[i] - xa[i - 1])
+            # This is the decomposition loop of the tridiagonal algorithm.
+            # y2 and u are used for temporary storage of the decomposed factors.
 
-        u[i] = (6.0 * ddydx / wx - sig * u[i - 1]) / p
+            wx = xa[i + 1] - xa[i - 1]
+            sig = (xa[i] - xa[i - 1]) / wx
+            p = sig * y2[i - 1] + 2.0
 
+            y2[i] = (sig - 1.0) / p
 
-    y2[n - 1] = 0
+            ddydx = (ya[i + 1] - ya[i]) / (xa[i + 1] - xa[i]) - (ya[i] - ya[i - 1]) / (xa[i] - xa[i - 1])
 
-    # This is the backsubstitution loop of the tridiagonal algorithm
-    #((int i = n - 2; i >= 0; --i):
-    for i in range(n-2,-1,-1):
-        y2[i] = y2[i] * y2[i + 1] + u[i]
+            u[i] = (6.0 * ddydx / wx - sig * u[i - 1]) / p
 
-    # interpolate() adapted from Paint Mono which in turn adapted:
-    # NUMERICAL RECIPES IN C: THE ART OF SCIENTIFIC COMPUTING
-    # ISBN 0-521-43108-5, page 113, section 3.3.
-    # http://paint-mono.googlecode.com/svn/trunk/src/PdnLib/SplineInterpolator.cs
+        y2[n - 1] = 0
 
-    results = [0]*n
+        # This is the backsubstitution loop of the tridiagonal algorithm
+        #((int i = n - 2; i >= 0; --i):
+        for i in range(n-2,-1,-1):
+            y2[i] = y2[i] * y2[i + 1] + u[i]
 
-    #loop over all query points
-    for i in range(len(queryPoints)):
-        # bisection. This is optimal if sequential calls to this
-        # routine are at random values of x. If sequential calls
-        # are in order, and closely spaced, one would do better
-        # to store previous values of klo and khi and test if
+        self.y2 = y2
 
-        klo = 0
-        khi = n - 1
+    def __call__(self, queryPoints):
+        """
+        Interpolate at queryPoints (float or array), 
+        points out of range are extrapolated by the end intervals
+        """
+        xa, ya, y2 = self.xa, self.ya, self.y2
+        x = np.asarray(queryPoints, dtype=float)
 
-        while (khi - klo > 1):
-            k = (khi + klo) >> 1
-            if (xa[k] > queryPoints[i]):
-                khi = k
-            else:
-                klo = k
+        # Interval xa[klo] <= x < xa[khi], same as the bisection
+        klo = np.clip(np.searchsorted(xa, x, side='right') - 1, 0, xa.shape[0]-2)
+        khi = klo + 1
 
         h = xa[khi] - xa[klo]
-        a = (xa[khi] - queryPoints[i]) / h
-        b = (queryPoints[i] - xa[klo]) / h
+        a = (xa[khi] - x) / h
+        b = (x - xa[klo]) / h
 
         # Cubic spline polynomial is now evaluated.
-        results[i] = a * ya[klo] + b * ya[khi] + ((a * a * a - a) * y2[klo] + (b * b * b - b) * y2[khi]) * (h * h) / 6.0
+        return a * ya[klo] + b * ya[khi] + ((a * a * a - a) * y2[klo] + (b * b * b - b) * y2[khi]) * (h * h) / 6.0
 
-    return results
-
-def naca4(number, n, finite_TE = False, half_cosine_spacing = False):
+def interpolate(xa,ya,queryPoints):
     """
-    Returns 2*n+1 points in [0 1] for the given 4 digit NACA number string
+    A cubic spline interpolation on a given set of points (x,y).
+    It factors the spline on every call, use SplineInterpolator to reuse the factorization.
     """
+    return SplineInterpolator(xa, ya)(queryPoints)
 
-    m = float(number[0])/100.0
-    p = float(number[1])/10.0
-    t = float(number[2:])/100.0
+#* Splines of the NACA 5 digit mean line parameters
+_NACA5_M = SplineInterpolator([0.05,0.1,0.15,0.2,0.25], [0.0580,0.1260,0.2025,0.2900,0.3910])
+_NACA5_K = SplineInterpolator([0.0580,0.1260,0.2025,0.2900,0.3910], [361.4,51.64,15.957,6.643,3.230])
 
+def _x_distribution(n, half_cosine_spacing = False):
+    """
+    Returns n+1 points of x in [0 1]
+    """
+    if half_cosine_spacing:
+        beta = np.linspace(0.0,pi,n+1)
+        return 0.5*(1.0-np.cos(beta))  # Half cosine based spacing
+    else:
+        return np.linspace(0.0,1.0,n+1)
+
+def _thickness(x, t, finite_TE = False):
+    """
+    Returns the thickness distribution [n_series, n+1] for the maximum thickness t [n_series]
+    """
     a0 = +0.2969
     a1 = -0.1260
     a2 = -0.3516
@@ -135,120 +146,114 @@ def naca4(number, n, finite_TE = False, half_cosine_spacing = False):
     else:
         a4 = -0.1036 # For zero thick TE
 
-    if half_cosine_spacing:
-        beta = linspace(0.0,pi,n+1)
-        x = [(0.5*(1.0-cos(xx))) for xx in beta]  # Half cosine based spacing
-    else:
-        x = linspace(0.0,1.0,n+1)
-
-    yt = [5*t*(a0*sqrt(xx)+a1*xx+a2*pow(xx,2)+a3*pow(xx,3)+a4*pow(xx,4)) for xx in x]
-
-    xc1 = [xx for xx in x if xx <= p]
-    xc2 = [xx for xx in x if xx > p]
-
-    if p == 0:
-        xu = x
-        yu = yt
-
-        xl = x
-        yl = [-xx for xx in yt]
-
-        xc = xc1 + xc2
-        zc = [0]*len(xc)
-    else:
-        yc1 = [m/pow(p,2)*xx*(2*p-xx) for xx in xc1]
-        yc2 = [m/pow(1-p,2)*(1-2*p+xx)*(1-xx) for xx in xc2]
-        zc = yc1 + yc2
-
-        dyc1_dx = [m/pow(p,2)*(2*p-2*xx) for xx in xc1]
-        dyc2_dx = [m/pow(1-p,2)*(2*p-2*xx) for xx in xc2]
-        dyc_dx = dyc1_dx + dyc2_dx
+    return 5*t[:,None]*(a0*np.sqrt(x)+a1*x+a2*np.power(x,2)+a3*np.power(x,3)+a4*np.power(x,4))
 
-        theta = [atan(xx) for xx in dyc_dx]
+def _surfaces(x, yt, zc, dyc_dx):
+    """
+    Returns the [n_series, 2n+1] points of airfoils from the camber line and thickness
+    """
+    theta = np.arctan(dyc_dx)
 
-        xu = [xx - yy * sin(zz) for xx,yy,zz in zip(x,yt,theta)]
-        yu = [xx + yy * cos(zz) for xx,yy,zz in zip(zc,yt,theta)]
+    xu = x - yt * np.sin(theta)
+    yu = zc + yt * np.cos(theta)
 
-        xl = [xx + yy * sin(zz) for xx,yy,zz in zip(x,yt,theta)]
-        yl = [xx - yy * cos(zz) for xx,yy,zz in zip(zc,yt,theta)]
+    xl = x + yt * np.sin(theta)
+    yl = zc - yt * np.cos(theta)
 
-    X = xu[::-1] + xl[1:]
-    Z = yu[::-1] + yl[1:]
+    X = np.concatenate((xu[:,::-1], xl[:,1:]), axis=1)
+    Z = np.concatenate((yu[:,::-1], yl[:,1:]), axis=1)
 
     return X,Z
 
-def naca5(number, n, finite_TE = False, half_cosine_spacing = False):
+def naca4_params(numbers):
     """
-    Returns 2*n+1 points in [0 1] for the given 5 digit NACA number string
+    Returns the parameters [n_series, 3] of 4 digit NACA number strings,
+    i.e., maximum camber m, location of maximum camber p, and maximum thickness t
     """
+    return np.array([[float(number[0])/100.0, float(number[1])/10.0, float(number[2:])/100.0]
+                        for number in numbers]).reshape(-1,3)
 
-    naca1 = int(number[0])
-    naca23 = int(number[1:3])
-    naca45 = int(number[3:])
-
-    cld = naca1*(3.0/2.0)/10.0
-    p = 0.5*naca23/100.0
-    t = naca45/100.0
-
-    a0 = +0.2969
-    a1 = -0.1260
-    a2 = -0.3516
-    a3 = +0.2843
+def naca5_params(numbers):
+    """
+    Returns the parameters [n_series, 3] of 5 digit NACA number strings,
+    i.e., design lift coefficient cld, location of maximum camber p, and maximum thickness t
+    """
+    return np.array([[int(number[0])*(3.0/2.0)/10.0, 0.5*int(number[1:3])/100.0, int(number[3:])/100.0]
+                        for number in numbers]).reshape(-1,3)
 
-    if finite_TE:
-        a4 = -0.1015 # For finite thickness trailing edge
+def naca4_batch(numbers, n, finite_TE = False, half_cosine_spacing = False):
+    """
+    Returns [n_series, 2*n+1] points in [0 1] for a batch of 4 digit NACA airfoils.
+    numbers is a list of 4 digit NACA number strings, or an array [n_series, 3] of (m, p, t)
+    """
+    if len(numbers) > 0 and isinstance(numbers[0], str):
+        params = naca4_params(numbers)
     else:
-        a4 = -0.1036  # For zero thickness trailing edge
+        params = np.array(numbers, dtype=float).reshape(-1,3)
 
-    if half_cosine_spacing:
-        beta = linspace(0.0,pi,n+1)
-        x = [(0.5*(1.0-cos(x))) for x in beta]  # Half cosine based spacing
-    else:
-        x = linspace(0.0,1.0,n+1)
+    m = params[:,0:1]
+    p = params[:,1:2]
+    t = params[:,2]
 
-    yt = [5*t*(a0*sqrt(xx)+a1*xx+a2*pow(xx,2)+a3*pow(xx,3)+a4*pow(xx,4)) for xx in x]
+    x  = _x_distribution(n, half_cosine_spacing)
+    yt = _thickness(x, t, finite_TE)
 
-    P = [0.05,0.1,0.15,0.2,0.25]
-    M = [0.0580,0.1260,0.2025,0.2900,0.3910]
-    K = [361.4,51.64,15.957,6.643,3.230]
+    # Symmetric airfoils (p = 0) have no camber
+    cambered = p != 0
+    p_ = np.where(cambered, p, 0.5)
+    m_ = np.where(cambered, m, 0.0)
+    front = x <= p_
 
-    m = interpolate(P,M,[p])[0]
-    k1 = interpolate(M,K,[m])[0]
+    zc = np.where(front, m_/np.power(p_,2)*x*(2*p_-x), m_/np.power(1-p_,2)*(1-2*p_+x)*(1-x))
+    dyc_dx = np.where(front, m_/np.power(p_,2)*(2*p_-2*x), m_/np.power(1-p_,2)*(2*p_-2*x))
 
-    xc1 = [xx for xx in x if xx <= p]
-    xc2 = [xx for xx in x if xx > p]
-    xc = xc1 + xc2
+    return _surfaces(x, yt, zc, dyc_dx)
 
-    if p == 0:
-        xu = x
-        yu = yt
+def naca5_batch(numbers, n, finite_TE = False, half_cosine_spacing = False):
+    """
+    Returns [n_series, 2*n+1] points in [0 1] for a batch of 5 digit NACA airfoils.
+    numbers is a list of 5 digit NACA number strings, or an array [n_series, 3] of (cld, p, t)
+    """
+    if len(numbers) > 0 and isinstance(numbers[0], str):
+        params = naca5_params(numbers)
+    else:
+        params = np.array(numbers, dtype=float).reshape(-1,3)
 
-        xl = x
-        yl = [-x for x in yt]
+    cld = params[:,0:1]
+    p   = params[:,1:2]
+    t   = params[:,2]
 
-        zc = [0]*len(xc)
-    else:
-        yc1 = [k1/6.0*(pow(xx,3)-3*m*pow(xx,2)+ pow(m,2)*(3-m)*xx) for xx in xc1]
-        yc2 = [k1/6.0*pow(m,3)*(1-xx) for xx in xc2]
-        zc  = [cld/0.3 * xx for xx in yc1 + yc2]
+    x  = _x_distribution(n, half_cosine_spacing)
+    yt = _thickness(x, t, finite_TE)
 
-        dyc1_dx = [cld/0.3*(1.0/6.0)*k1*(3*pow(xx,2)-6*m*xx+pow(m,2)*(3-m)) for xx in xc1]
-        dyc2_dx = [cld/0.3*(1.0/6.0)*k1*pow(m,3)]*len(xc2)
+    m  = _NACA5_M(p)
+    k1 = _NACA5_K(m)
 
-        dyc_dx = dyc1_dx + dyc2_dx
-        theta = [atan(xx) for xx in dyc_dx]
+    # Symmetric airfoils (p = 0) have no camber
+    cambered = p != 0
+    front = x <= p
 
-        xu = [xx - yy * sin(zz) for xx,yy,zz in zip(x,yt,theta)]
-        yu = [xx + yy * cos(zz) for xx,yy,zz in zip(zc,yt,theta)]
+    yc = np.where(front, k1/6.0*(np.power(x,3)-3*m*np.power(x,2)+np.power(m,2)*(3-m)*x), k1/6.0*np.power(m,3)*(1-x))
+    zc = np.where(cambered, cld/0.3*yc, 0.0)
 
-        xl = [xx + yy * sin(zz) for xx,yy,zz in zip(x,yt,theta)]
-        yl = [xx - yy * cos(zz) for xx,yy,zz in zip(zc,yt,theta)]
+    dyc_dx = np.where(front, cld/0.3*(1.0/6.0)*k1*(3*np.power(x,2)-6*m*x+np.power(m,2)*(3-m)), cld/0.3*(1.0/6.0)*k1*np.power(m,3))
+    dyc_dx = np.where(cambered, dyc_dx, 0.0)
 
+    return _surfaces(x, yt, zc, dyc_dx)
 
-    X = xu[::-1] + xl[1:]
-    Z = yu[::-1] + yl[1:]
+def naca4(number, n, finite_TE = False, half_cosine_spacing = False):
+    """
+    Returns 2*n+1 points in [0 1] for the given 4 digit NACA number string
+    """
+    X,Z = naca4_batch([number], n, finite_TE, half_cosine_spacing)
+    return X[0],Z[0]
 
-    return X,Z
+def naca5(number, n, finite_TE = False, half_cosine_spacing = False):
+    """
+    Returns 2*n+1 points in [0 1] for the given 5 digit NACA number string
+    """
+    X,Z = naca5_batch([number], n, finite_TE, half_cosine_spacing)
+    return X[0],Z[0]
 
 def naca(number, n, finite_TE = False, half_cosine_spacing = False):
     if len(number)==4:
@@ -258,5 +263,20 @@ def naca(number, n, finite_TE = False, half_cosine_spacing = False):
     else:
         raise Exception
 
+def naca_batch(numbers, n, finite_TE = False, half_cosine_spacing = False):
+    """
+    Returns [n_series, 2*n+1] points in [0 1] for a list of 4 or 5 digit NACA number strings
+    """
+    invalid = [number for number in numbers if len(number) not in (4, 5)]
+    if len(invalid) > 0:
+        raise Exception('NACA series must be 4 or 5 digits: %s'%(', '.join(invalid)))
+
+    X = np.zeros((len(numbers), 2*n+1))
+    Z = np.zeros((len(numbers), 2*n+1))
 
+    for n_digit, func in [(4, naca4_batch), (5, naca5_batch)]:
+        index = [i for i, number in enumerate(numbers) if len(number)==n_digit]
+        if len(index) > 0:
+            X[index], Z[index] = func([numbers[i] for i in index], n, finite_TE, half_cosine_spacing)
 
+    return X,Z
@@ -0,0 +1,388 @@
+'''
+This is a module containing functions to sample valid airfoils in a box of CST coefficients.
+
+Coefficients are drawn in batches by uniform random, Latin hypercube or Sobol sampling,
+screened by CSTPrefilter, then built by cst_foil_batch and checked by check_valid_batch
+in stages of increasing resolutions (see screen_airfoils).
+The batches are processed in a process pool. Each batch has its own seed spawned from
+one SeedSequence, so that the samples do not depend on the number of processes.
+'''
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+from scipy.stats import qmc
+
+from cst_modeling.foil import CSTPrefilter, check_valid_batch, cst_foil_batch, default_distribution
+
+
+def sample_coefficients(n: int, lower, upper, method='sobol', rng=None) -> np.ndarray:
+    '''
+    Draw samples in a box
+
+    >>> samples = sample_coefficients(n, lower, upper, method='sobol', rng=None)
+
+    ### Inputs:
+    ```text
+    n:          number of samples (a power of 2 is preferred by Sobol sampling)
+    lower:      lower bounds (ndarray [n_dim])
+    upper:      upper bounds (ndarray [n_dim])
+    method:     'uniform', 'lhs' (Latin hypercube) or 'sobol' (scrambled Sobol sequence)
+    rng:        seed, SeedSequence or numpy Generator
+    ```
+
+    ### Return:
+    samples (ndarray [n, n_dim])
+    '''
+    lower = np.asarray(lower, dtype=np.float64)
+    upper = np.asarray(upper, dtype=np.float64)
+    if lower.shape != upper.shape:
+        raise Exception('Lower and upper bounds have different shapes')
+
+    n_dim = lower.shape[0]
+    rng = np.random.default_rng(rng)
+
+    if method == 'uniform':
+        unit = rng.random((n, n_dim))
+    elif method == 'lhs':
+        unit = qmc.LatinHypercube(n_dim, seed=rng).random(n)
+    elif method == 'sobol':
+        unit = qmc.Sobol(n_dim, scramble=True, seed=rng).random(n)
+    else:
+        raise Exception('Sampling method %s is not supported'%(method))
+
+    return lower + unit*(upper-lower)
+
+def sample_batch(i_batch: int, entropy: int, settings: dict) -> dict:
+    '''
+    Sample, build and check one batch of airfoils (the worker of sample_airfoils)
+
+    >>> result = sample_batch(i_batch, entropy, settings)
+
+    ### Inputs:
+    ```text
+    i_batch:    index of the batch, the seed of the batch is SeedSequence(entropy, spawn_key=(i_batch,))
+    entropy:    entropy of the root SeedSequence
+    settings:   dict of the inputs of sample_airfoils
+    ```
+
+    ### Return:
+    ```text
+    result: dict of
+            i_batch:        index of the batch
+            cst_u, cst_l:   CST coefficients of valid airfoils (ndarray [n_valid, n_order])
+            n_sample:       number of samples in the batch
+            n_fail:         number of samples rejected by each rule (ndarray [10])
+            n_check:        number of samples checked by each rule (ndarray [10])
+            stages:         statistics of stages (see screen_airfoils)
+            time:           wall time (s)
+    ```
+    '''
+    t0 = time.perf_counter()
+
+    seed = np.random.SeedSequence(entropy, spawn_key=(i_batch,))
+    lower = np.concatenate((settings['lower_upp'], settings['lower_low']))
+    upper = np.concatenate((settings['upper_upp'], settings['upper_low']))
+    n_order = len(settings['lower_upp'])
+
+    coefs = sample_coefficients(settings['n_batch'], lower, upper, method=settings['method'], rng=seed)
+    cst_u = coefs[:,:n_order]
+    cst_l = coefs[:,n_order:]
+    n_sample = coefs.shape[0]
+
+    valid, n_fail, n_check, stages = screen_airfoils(cst_u, cst_l, nn=settings['nn'], x=settings['x'],
+                                stages=settings['stages'], t=settings['t'], tail=settings['tail'],
+                                neg_tcri=settings['neg_tcri'], stage_rules=settings['stage_rules'],
+                                prefilter=settings['prefilter'])
+
+    return {'i_batch': i_batch, 'cst_u': cst_u[valid], 'cst_l': cst_l[valid],
+            'n_sample': n_sample, 'n_fail': n_fail, 'n_check': n_check, 'stages': stages,
+            'time': time.perf_counter()-t0}
+
+def screen_airfoils(cst_u, cst_l, nn=101, x=None, stages=None, t=None, tail=0.0, neg_tcri=0.0,
+                    stage_rules=(1, 5, 6), prefilter=True):
+    '''
+    Check airfoils by a pipeline of stages with increasing resolutions,
+    each stage runs cst_foil_batch and check_valid_batch on the survivors of the previous stage.
+
+    >>> valid, n_fail, n_check, stats = screen_airfoils(cst_u, cst_l, nn=1001, stages=[101, 301])
+
+    ### Inputs:
+    ```text
+    cst_u, cst_l:   CST coefficients (ndarray [n_sample, n_order])
+    nn:             total amount of points of the airfoils, i.e., the final stage
+    x:              point x [0,1] (optional ndarray, size is nn)
+    stages:         numbers of points of the coarse stages before the final stage, e.g., [101, 301]
+    t:              relative maximum thickness (optional), the prefilter is not used when t is specified
+    tail:           relative tail thickness
+    neg_tcri:       critical value for checking negative thickness (see check_valid)
+    stage_rules:    rules (1 to 10) that reject airfoils in the coarse stages
+    prefilter:      if True, screen the airfoils by CSTPrefilter before the first stage
+    ```
+
+    ### Return:
+    ```text
+    valid:      if the airfoil is valid (ndarray [n_sample] of bool)
+    n_fail:     number of airfoils rejected by each rule (ndarray [10]),
+                an airfoil is only counted in the stage that rejects it
+    n_check:    number of airfoils checked by each rule (ndarray [10]),
+                i.e., counted in the stage that rejects them or in the final stage,
+                and by the prefilter only for the rules it proves to pass or fail
+    stats:      statistics of stages (ndarray [n_stage, 4]), 
+                each row is nn (0 for the prefilter), number of input airfoils, 
+                number of survivors, and wall time (s)
+    ```
+
+    ### Note:
+    ```text
+    The points of a coarse stage are a subset of the points x of the final stage (see stage_points).
+    Rules 1, 5, 6 that fail at a subset of points also fail at all points, 
+    so that the valid airfoils are the same as a single full resolution check, 
+    except for airfoils within round-off errors (~1e-15) of the thresholds of these rules.
+    This does not hold when t is specified, since the thickness scaling depends on the points,
+    or when other rules (e.g., 2, 3, 4, 7) are in stage_rules.
+    ```
+    '''
+    cst_u = np.atleast_2d(cst_u)
+    cst_l = np.atleast_2d(cst_l)
+    n_sample = cst_u.shape[0]
+
+    if x is None:
+        x = default_distribution(nn)
+
+    stage_rules = np.array(stage_rules, dtype=int) - 1
+    stages = [] if stages is None else list(stages)
+
+    n_fail = np.zeros(10, dtype=int)
+    n_check = np.zeros(10, dtype=int)
+    valid = np.ones(n_sample, dtype=bool)
+    stats = []
+
+    #* Screening by CST coefficients (not valid for the thickness constraint)
+    if prefilter and t is None:
+        t0 = time.perf_counter()
+        n_in = int(np.count_nonzero(valid))
+
+        status = CSTPrefilter(nn, x=x, tail=tail, neg_tcri=neg_tcri).check(cst_u, cst_l)
+        n_fail += np.count_nonzero(status==1, axis=0)
+        valid = np.logical_not(np.any(status==1, axis=1))
+        n_check += np.count_nonzero(status[np.logical_not(valid)]>=0, axis=0)
+
+        stats.append([0, n_in, int(np.count_nonzero(valid)), time.perf_counter()-t0])
+
+    #* Coarse stages and the final stage
+    for nn_stage in stages + [nn]:
+
+        t0 = time.perf_counter()
+        n_in = int(np.count_nonzero(valid))
+
+        if nn_stage < nn:
+            x_stage = x[stage_points(nn, nn_stage)]
+            rules = stage_rules
+        else:
+            x_stage = x
+            rules = np.arange(10)
+
+        x_, yu, yl, _, R0 = cst_foil_batch(x_stage.shape[0], cst_u[valid], cst_l[valid], x=x_stage,
+                                            t=t, tail=tail)
+        rule_invalid = check_valid_batch(x_, yu, yl, RLE=R0, neg_tcri=neg_tcri)[:,rules]
+
+        rejected = np.any(rule_invalid, axis=1)
+        n_fail[rules] += np.count_nonzero(rule_invalid[rejected], axis=0)
+        n_check[rules] += n_in if nn_stage >= nn else int(np.count_nonzero(rejected))
+        valid[valid] = np.logical_not(rejected)
+
+        stats.append([x_stage.shape[0], n_in, int(np.count_nonzero(valid)), time.perf_counter()-t0])
+
+    return valid, n_fail, n_check, np.array(stats)
+
+def stage_points(nn: int, nn_stage: int) -> np.ndarray:
+    '''
+    Indices of the points of a coarse stage, which are a subset of nn points (including both ends)
+
+    >>> index = stage_points(nn, nn_stage)
+    '''
+    return np.unique(np.round(np.linspace(0, nn-1, min(nn_stage, nn))).astype(int))
+
+def sample_airfoils(n_target: int, lower_upp, upper_upp, lower_low, upper_low,
+                    nn=101, x=None, t=None, tail=0.0, neg_tcri=0.0, method='sobol', seed=None,
+                    n_batch=4096, n_process=None, prefilter=True, stages=None, stage_rules=(1, 5, 6),
+                    max_sample=None, info=True) -> dict:
+    '''
+    Sample valid airfoils (see check_valid) in a box of CST coefficients.
+
+    >>> data = sample_airfoils(n_target, lower_upp, upper_upp, lower_low, upper_low, nn=101)
+
+    ### Inputs:
+    ```text
+    n_target:   number of valid airfoils
+    lower_upp, upper_upp:   bounds of CST coefficients of upper surface (ndarray [n_order])
+    lower_low, upper_low:   bounds of CST coefficients of lower surface (ndarray [n_order])
+    nn:         total amount of points of the airfoils
+    x:          point x [0,1] (optional ndarray, size is nn)
+    t:          relative maximum thickness (optional), the prefilter is not used when t is specified
+    tail:       relative tail thickness
+    neg_tcri:   critical value for checking negative thickness (see check_valid)
+    method:     sampling method, 'uniform', 'lhs' or 'sobol' (see sample_coefficients)
+    seed:       seed of the root SeedSequence, None means a random seed (reported in the return)
+    n_batch:    number of samples in a batch
+    n_process:  number of processes, None means the number of CPUs, 1 means no process pool
+    prefilter:  if True, screen the samples by CSTPrefilter before building the airfoils
+    stages:     numbers of points of the coarse stages before nn, e.g., nn=1001, stages=[101, 301]
+    stage_rules: rules that reject airfoils in the coarse stages (see screen_airfoils)
+    max_sample: maximum number of samples, None means no limit
+    info:       if True, print the statistics
+    ```
+
+    ### Return:
+    ```text
+    data:   dict of
+            cst_u, cst_l:   CST coefficients of valid airfoils (ndarray [n_valid, n_order]),
+                            n_valid is n_target unless max_sample is reached
+            seed:           entropy of the root SeedSequence,
+                            batch i is sampled by SeedSequence(seed, spawn_key=(i,))
+            n_batch:        number of batches used
+            n_sample:       number of samples drawn in these batches
+            n_fail:         number of samples rejected by each rule (ndarray [10]),
+                            samples are only checked until the stage that rejects them
+            n_check:        number of samples checked by each rule (ndarray [10]),
+                            samples rejected by the prefilter or a coarse stage are not checked by all rules
+            stages:         statistics of stages (ndarray [n_stage, 4]), each row is 
+                            nn (0 for the prefilter), number of input samples, number of survivors, 
+                            and wall time (s) summed over batches
+            acceptance:     ratio of samples that pass each rule among the samples checked by it, 
+                            i.e., 1-n_fail/n_check (ndarray [10])
+            ratio:          ratio of valid samples
+            time:           wall time (s)
+            throughput:     number of samples per second
+    ```
+
+    ### Note:
+    ```text
+    The valid airfoils are taken from batches 0, 1, 2, ... in order,
+    so that the results are the same for any number of processes.
+    On Windows, the process pool must be used under `if __name__ == "__main__":`.
+    ```
+    '''
+    t0 = time.perf_counter()
+
+    root = np.random.SeedSequence(seed)
+    settings = {
+        'lower_upp': np.asarray(lower_upp, dtype=np.float64),
+        'upper_upp': np.asarray(upper_upp, dtype=np.float64),
+        'lower_low': np.asarray(lower_low, dtype=np.float64),
+        'upper_low': np.asarray(upper_low, dtype=np.float64),
+        'nn': nn, 'x': x, 't': t, 'tail': tail, 'neg_tcri': neg_tcri,
+        'method': method, 'n_batch': n_batch, 'prefilter': prefilter,
+        'stages': stages, 'stage_rules': stage_rules,
+    }
+
+    if settings['lower_upp'].shape != settings['lower_low'].shape:
+        raise Exception('Upper and lower surfaces have different numbers of CST coefficients')
+
+    n_max_batch = None if max_sample is None else max(int(np.ceil(max_sample/n_batch)), 1)
+
+    results = {}
+
+    def n_done() -> tuple:
+        '''
+        Number of batches finished in order, and the number of valid airfoils in them
+        '''
+        i, n_valid = 0, 0
+        while i in results and n_valid < n_target:
+            n_valid += results[i]['cst_u'].shape[0]
+            i += 1
+        return i, n_valid
+
+    def finished() -> bool:
+        _, n_valid = n_done()
+        return n_valid >= n_target or (n_max_batch is not None and len(results) >= n_max_batch)
+
+    if n_process == 1:
+
+        i_next = 0
+        while not finished():
+            results[i_next] = sample_batch(i_next, root.entropy, settings)
+            i_next += 1
+
+    else:
+
+        n_worker = os.cpu_count() if n_process is None else n_process
+
+        with ProcessPoolExecutor(max_workers=n_worker) as executor:
+
+            i_next = 0
+            pending = set()
+            while not finished():
+
+                while len(pending) < 2*n_worker and (n_max_batch is None or i_next < n_max_batch):
+                    pending.add(executor.submit(sample_batch, i_next, root.entropy, settings))
+                    i_next += 1
+
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    result = future.result()
+                    results[result['i_batch']] = result
+
+            for future in pending:
+                future.cancel()
+
+    #* Collect batches in order
+    n_used, _ = n_done()
+    used = [results[i] for i in range(n_used)]
+
+    n_order = settings['lower_upp'].shape[0]
+    cst_u = np.concatenate([r['cst_u'] for r in used] + [np.zeros((0, n_order))])[:n_target]
+    cst_l = np.concatenate([r['cst_l'] for r in used] + [np.zeros((0, n_order))])[:n_target]
+
+    n_sample = sum([r['n_sample'] for r in used])
+    n_fail = np.sum([r['n_fail'] for r in used] + [np.zeros(10, dtype=int)], axis=0)
+    n_check = np.sum([r['n_check'] for r in used] + [np.zeros(10, dtype=int)], axis=0)
+    n_valid = sum([r['cst_u'].shape[0] for r in used])
+
+    stats = np.zeros((0, 4))
+    if len(used) > 0:
+        stats = np.sum([r['stages'] for r in used], axis=0)
+        stats[:,0] = used[0]['stages'][:,0]
+    t_all = time.perf_counter() - t0
+
+    data = {
+        'cst_u': cst_u, 'cst_l': cst_l, 'seed': root.entropy,
+        'n_batch':      n_used,
+        'n_sample':     n_sample,
+        'n_fail':       n_fail,
+        'n_check':      n_check,
+        'stages':       stats,
+        'acceptance':   1.0 - n_fail/np.maximum(n_check, 1),
+        'ratio':        n_valid/max(n_sample, 1),
+        'time':         t_all,
+        'throughput':   n_sample/t_all,
+    }
+
+    if info:
+        print(sampling_summary(data))
+
+    return data
+
+def sampling_summary(data: dict) -> str:
+    '''
+    Summary of the statistics of sample_airfoils
+
+    >>> print(sampling_summary(data))
+    '''
+    lines = [
+        'Sampled %d airfoils in %d batches, %d valid (%.2f%%), seed = %d'%(
+            data['n_sample'], data['n_batch'], data['cst_u'].shape[0], 100*data['ratio'], data['seed']),
+        '  Time %.2f s, throughput %.0f samples/s'%(data['time'], data['throughput']),
+    ]
+
+    for nn, n_in, n_out, t_stage in data['stages']:
+        name = 'prefilter' if nn == 0 else 'nn = %d'%(nn)
+        lines.append('  Stage %-10s: %8d in, %8d rejected (%.2f%%), %.2f s'%(
+            name, n_in, n_in-n_out, 100*(n_in-n_out)/max(n_in, 1), t_stage))
+
+    for i in range(7):
+        lines.append('  Rule %d: acceptance %.2f%% of %d checked'%(i+1, 100*data['acceptance'][i], data['n_check'][i]))
+
+    return '\n'.join(lines)
@@ -10,19 +10,23 @@ import numpy as np
 from mpl_toolkits.mplot3d import Axes3D
 from scipy.interpolate import CubicSpline
 
-from cst_modeling.foil import (BasicSection, OpenSection, Section,
-                               cst_foil_fit, output_foil, rotate,
-                               stretch_fixed_point, toCylinder, transform)
+from cst_modeling.foil import (BasicSection, OpenSection, Section, SectionArray,
+                               cst_foil_fit, get_dtype, output_foil, rotate,
+                               same_array, share_array, stretch_fixed_point,
+                               toCylinder, transform, writable_array)
 
 
 class BasicSurface():
     '''
     Construct multi-section surface with BasicSection objects.
 
-    >>> BasicSurface(n_sec=0, name='Surf', nn=1001, ns=101, project=True)
+    >>> BasicSurface(n_sec=0, name='Surf', nn=1001, ns=101, project=True, dtype=None, vectorized=False)
+
+    dtype:      floating-point precision of sections and surfaces, None means get_dtype()
+    vectorized: True ~ generate all sections by one SectionArray in geo_secs()
     '''
 
-    def __init__(self, n_sec=0, name='Surf', nn=1001, ns=101, project=True):
+    def __init__(self, n_sec=0, name='Surf', nn=1001, ns=101, project=True, dtype=None, vectorized=False):
 
         n_ = max(1, n_sec)
         self.l2d   = n_ == 1    # type: bool
@@ -32,6 +36,13 @@ class BasicSurface():
         self.secs  = [ BasicSection() for _ in range(n_) ]
         self.surfs = []         # type: list[list]
         self.project = project  # type: bool
+        self.dtype = dtype      # type: type
+        self.vectorized = vectorized    # type: bool
+        self.sec_array = None   # type: SectionArray
+
+        # States of the last geo(), for the incremental update
+        self._geo_state = None  # type: dict
+        self._surfs_modified = False
 
         # Parameters for plot
         self.half_s = 0.5       # type: float
@@ -146,12 +157,72 @@ class BasicSurface():
         self.name  = other.name
         self.nn    = other.nn
         self.ns    = other.ns
+        self.dtype = other.dtype
+        self.vectorized = other.vectorized
         self.secs  = copy.deepcopy(other.secs)
         self.surfs = copy.deepcopy(other.surfs)
 
         self.half_s = other.half_s
         self.center = other.center.copy()
 
+        self._geo_state = None
+
+    def clone(self):
+        '''
+        Copy-on-write clone of the surface.
+        The arrays of sections and surfaces are shared until they are written (see share_array),
+        so that a clone costs much less memory than a deep copy.
+        Use copyfrom or copy.deepcopy for an independent copy.
+
+        >>> surf_new = surf.clone()
+
+        ### Note:
+        ```text
+        This surface and the clone hold the same read-only views of the arrays.
+        Functions of this library copy them before writing them in place (see writable_surfs),
+        and item assignment (e.g., surf.surfs[0][0][0,0] = 0.0) raises an error on either surface.
+        ```
+        '''
+        other = copy.copy(self)
+
+        for key, value in list(self.__dict__.items()):
+            if key == 'secs':
+                other.secs = [sec.clone() for sec in self.secs]
+            elif key == 'surfs':
+                self.surfs = [[share_array(aa) for aa in surf] for surf in self.surfs]
+                other.surfs = [list(surf) for surf in self.surfs]
+            elif key == 'center':
+                other.center = self.center.copy()
+            elif key == '_geo_state':
+                continue
+            elif isinstance(value, np.ndarray):
+                setattr(self, key, share_array(value))
+                setattr(other, key, getattr(self, key))
+            elif isinstance(value, (list, dict)):
+                setattr(other, key, copy.deepcopy(value))
+
+        other.sec_array = None
+
+        return other
+
+    def writable_surfs(self, i_surfs=None):
+        '''
+        Copy the read-only arrays of surfaces, e.g., shared with clones, before writing them in place (copy-on-write)
+
+        >>> writable_surfs(i_surfs=None)
+
+        ### Inputs:
+        ```text
+        i_surfs:    list of surface indices, None means all surfaces
+        ```
+        '''
+        if i_surfs is None:
+            i_surfs = range(len(self.surfs))
+
+        self._surfs_modified = True
+
+        for i in i_surfs:
+            self.surfs[i] = [writable_array(aa) for aa in self.surfs[i]]
 
     def geo_secs(self, flip_x=False):
         '''
@@ -167,35 +238,98 @@ class BasicSurface():
         ```text
         flip_x:     True ~ flip section.xx in reverse order
         ```
+
+        ### Note:
+        ```text
+        If self.vectorized, all sections are generated by self.sec_array (SectionArray),
+        and the curves of each section object are views of its rows.
+        Sections that can not be stored in one SectionArray (see SectionArray.batchable)
+        are generated one by one.
+        ```
         '''
+        if self.vectorized and SectionArray.batchable(self.secs):
+            self.sec_array = SectionArray(self.secs)
+            self.sec_array.section(nn=self.nn, flip_x=flip_x, proj=self.project, dtype=self.dtype)
+            self.sec_array.update_sections(self.secs)
+            return
+
         for i in range(self.n_sec):
-            self.secs[i].section(nn=self.nn, flip_x=flip_x, proj=self.project)
+            self.secs[i].section(nn=self.nn, flip_x=flip_x, proj=self.project, dtype=self.dtype)
 
-    def geo(self, flip_x=False, update_sec=True):
+    def geo(self, flip_x=False, update_sec=True, incremental=False) -> dict:
         '''
         Generate surface geometry
 
+        >>> report = geo(flip_x=False, update_sec=True, incremental=False)
+
         ### Inputs:
         ```text
-        flip_x:     True ~ flip section.xx in reverse order
-        update_sec: True ~ update sections
+        flip_x:         True ~ flip section.xx in reverse order
+        update_sec:     True ~ update sections
+        incremental:    True ~ only update the sections whose parameters are changed 
+                        since the last geo() (see BasicSection.dirty), 
+                        and the surfaces next to the sections that are changed
+        ```
+
+        ### Return:
+        ```text
+        report: dict of
+                full:       True if all sections (when update_sec) and surfaces are rebuilt
+                sections:   indices of the rebuilt sections
+                surfaces:   indices of the rebuilt surfaces
+        ```
+
+        ### Note:
+        ```text
+        Everything is rebuilt when the settings (flip_x, nn, ns, project, dtype, n_sec) are changed,
+        or the surfaces are modified after the last geo(), e.g., by smooth, bend, flip, etc.
+        The sections are compared with the last geo() by their arrays x, y, z, 
+        so that sections modified without parameters (e.g., section_flap) also update their surfaces.
         ```
         '''
-        if update_sec:
+        key = (flip_x, self.nn, self.ns, self.project, self.dtype, self.n_sec, self.vectorized)
+        n_surf = 1 if self.l2d else self.n_sec-1
+        state = self._geo_state
+
+        full = not incremental or state is None or state['key'] != key \
+                or self._surfs_modified or len(self.surfs) != n_surf
+
+        #* Sections
+        if not update_sec:
+            i_secs = []
+        elif full:
+            i_secs = list(range(self.n_sec))
             self.geo_secs(flip_x=flip_x)
+        else:
+            i_secs = [i for i in range(self.n_sec) if self.secs[i].dirty]
+            for i in i_secs:
+                self.secs[i].section(nn=self.nn, flip_x=flip_x, proj=self.project, dtype=self.dtype)
 
-        self.surfs = []
-
-        if self.l2d:
-            sec_ = copy.deepcopy(self.secs[0])
-            sec_.zLE = 1.0
-            surf = self.section_surf(self.secs[0], sec_, ns=self.ns)
-            self.surfs.append(surf)
+        #* Surfaces
+        arrays = [(sec.x, sec.y, sec.z) for sec in self.secs]
 
+        if full:
+            i_surfs = list(range(n_surf))
+            self.surfs = [None for _ in range(n_surf)]
         else:
-            for i in range(self.n_sec-1):
-                surf = self.section_surf(self.secs[i], self.secs[i+1], ns=self.ns)
-                self.surfs.append(surf)
+            changed = [not all(same_array(a, b) for a, b in zip(arrays[i], state['arrays'][i])) for i in range(self.n_sec)]
+            if self.l2d:
+                i_surfs = [0] if changed[0] else []
+            else:
+                i_surfs = [i for i in range(n_surf) if changed[i] or changed[i+1]]
+
+        for i in i_surfs:
+            if self.l2d:
+                sec_ = self.secs[0].clone()
+                sec_.zLE = 1.0
+                self.surfs[0] = self.section_surf(self.secs[0], sec_, ns=self.ns, dtype=self.dtype)
+            else:
+                self.surfs[i] = self.section_surf(self.secs[i], self.secs[i+1], ns=self.ns, dtype=self.dtype)
+
+        self._geo_state = {'key': key, 'arrays': arrays}
+        self._surfs_modified = False
+
+        return {'full': full, 'sections': i_secs, 'surfaces': i_surfs}
 
     def geo_axisymmetric(self, phi, flip_x=False, update_sec=True):
         '''
@@ -218,21 +352,24 @@ class BasicSurface():
 
         else:
             for i in range(self.n_sec-1):
-                surf = self.section_surf_axisymmetric(self.secs[i], self.secs[i+1], phi[i], phi[i+1], ns=self.ns)
+                surf = self.section_surf_axisymmetric(self.secs[i], self.secs[i+1], phi[i], phi[i+1], ns=self.ns, dtype=self.dtype)
                 self.surfs.append(surf)
 
+        self._surfs_modified = True
+
 
     @staticmethod
-    def section_surf(sec0, sec1, ns=101):
+    def section_surf(sec0, sec1, ns=101, dtype=None):
         '''
         Interplot surface section between curves
 
-        >>> surf = section_surf(sec0, sec1, ns)
+        >>> surf = section_surf(sec0, sec1, ns, dtype)
 
         ### Inputs:
         ```text
         sec0, sec1:     Section object
         ns:             number of spanwise points
+        dtype:          floating-point precision of the surface, None means get_dtype()
         ```
 
         ### Return: 
@@ -242,10 +379,11 @@ class BasicSurface():
         ```
         '''
 
+        dtype = get_dtype(dtype)
         nn = sec0.x.shape[0]
-        surf_x = np.zeros((ns,nn))
-        surf_y = np.zeros((ns,nn))
-        surf_z = np.zeros((ns,nn))
+        surf_x = np.zeros((ns,nn), dtype=dtype)
+        surf_y = np.zeros((ns,nn), dtype=dtype)
+        surf_z = np.zeros((ns,nn), dtype=dtype)
         
         for i in range(ns):
             tt = 1.0*i/(ns-1.0)
@@ -258,17 +396,18 @@ class BasicSurface():
         return surf
 
     @staticmethod
-    def section_surf_axisymmetric(sec0, sec1, phi0: float, phi1: float, ns=101):
+    def section_surf_axisymmetric(sec0, sec1, phi0: float, phi1: float, ns=101, dtype=None):
         '''
         Interplot axisymmetric surface section between curves
 
-        >>> surf = section_surf_axisymmetric(sec0, sec1, ns)
+        >>> surf = section_surf_axisymmetric(sec0, sec1, ns, dtype)
 
         ### Inputs:
         ```text
         sec0, sec1:     Section object
         phi0, phi1:     angle (degree) about X-axis (X-Y plane is 0 degree)
         ns:             number of spanwise points
+        dtype:          floating-point precision of the surface, None means get_dtype()
         ```
 
         ### Return: 
@@ -277,13 +416,14 @@ class BasicSurface():
                 list of ndarray [ns, nn]
         ```
         '''
+        dtype = get_dtype(dtype)
         nn = sec0.x.shape[0]
-        surf_x = np.zeros((ns,nn))
-        surf_y = np.zeros((ns,nn))
-        surf_z = np.zeros((ns,nn))
-        xx = np.zeros(nn)
-        yy = np.zeros(nn)
-        zz = np.zeros(nn)
+        surf_x = np.zeros((ns,nn), dtype=dtype)
+        surf_y = np.zeros((ns,nn), dtype=dtype)
+        surf_z = np.zeros((ns,nn), dtype=dtype)
+        xx = np.zeros(nn, dtype=dtype)
+        yy = np.zeros(nn, dtype=dtype)
+        zz = np.zeros(nn, dtype=dtype)
 
         R = np.sqrt(sec0.yLE**2+sec0.zLE**2)
         
@@ -322,6 +462,8 @@ class BasicSurface():
         plane: get symmetry about plane: 'XY', 'YZ', 'ZX'
         ```
         '''
+        self._surfs_modified = True
+
         for axis_ in axis.split():
             if '+X' in axis_:
                 for isec in range(len(self.surfs)):
@@ -404,6 +546,8 @@ class BasicSurface():
 
         >>> translate(dX=0.0, dY=0.0, dZ=0.0)
         '''
+        self.writable_surfs()
+
         for surf in self.surfs:
             surf[0] += dX
             surf[1] += dY
@@ -419,6 +563,8 @@ class BasicSurface():
 
         >>> scale(scale=1.0, X0=0.0, Y0=0.0, Z0=0.0)
         '''
+        self._surfs_modified = True
+
         for surf in self.surfs:
             surf[0] = (surf[0]-X0)*scale + X0
             surf[1] = (surf[1]-Y0)*scale + Y0
@@ -439,6 +585,8 @@ class BasicSurface():
         smooth0, smooth1:   bool, whether have smooth transition to the neighboring surfaces
         ```
         '''
+        self.writable_surfs()
+
         #* Do not have neighboring surfaces
         if isec0 == 0:
             smooth0 = False
@@ -523,6 +671,8 @@ class BasicSurface():
                         default None, means ratio = tx
         ```
         '''
+        self.writable_surfs()
+
         periodic = False
         if np.abs(phi[0]+phi[-1]-360.0)<1E-3:
             periodic = True
@@ -636,6 +786,8 @@ class BasicSurface():
         X is the flow direction (chord direction)
         ```
         '''
+        self.writable_surfs()
+
         if self.l2d:
             print('No bending for 2D cases')
             return
@@ -780,6 +932,7 @@ class BasicSurface():
                 can be ndarray or list
         ```
         '''
+        self.writable_surfs()
 
         if origin is None:
             for surf in self.surfs:
@@ -1059,11 +1212,11 @@ class OpenSurface(BasicSurface):
     '''
     Open surface defined by multiple OpenSection objects
 
-    >>> OpenSurface(n_sec=0, name='Patch', nn=1001, ns=101, project=True)
+    >>> OpenSurface(n_sec=0, name='Patch', nn=1001, ns=101, project=True, dtype=None, vectorized=False)
     '''
-    def __init__(self, n_sec=0, name='Patch', nn=1001, ns=101, project=True):
+    def __init__(self, n_sec=0, name='Patch', nn=1001, ns=101, project=True, dtype=None, vectorized=False):
 
-        super().__init__(n_sec=n_sec, name=name, nn=nn, ns=ns, project=project)
+        super().__init__(n_sec=n_sec, name=name, nn=nn, ns=ns, project=project, dtype=dtype, vectorized=vectorized)
 
         n_ = max(1, n_sec)
         self.secs = [ OpenSection() for _ in range(n_) ]
@@ -1203,7 +1356,7 @@ class Surface(BasicSurface):
     '''
     Surface defined by multiple Section objects, i.e., foils
 
-    >>> Surface(n_sec=0, name='Wing', nn=1001, ns=101, project=True)
+    >>> Surface(n_sec=0, name='Wing', nn=1001, ns=101, project=True, dtype=None, vectorized=False)
 
     ### Inputs:
     ```text
@@ -1212,6 +1365,8 @@ class Surface(BasicSurface):
     nn:      number of points of upper/lower section
     ns:      number of spanwise points
     project: True ~ projected chord length does not change when twisted
+    dtype:   floating-point precision of sections and surfaces, None means get_dtype()
+    vectorized: True ~ generate all sections by one SectionArray in geo_secs()
     ```
 
     ### Note:
@@ -1231,11 +1386,11 @@ class Surface(BasicSurface):
     surfs:  list of [surf_x, surf_y, surf_z], they are [ns, nn] ndarray
     ```
     '''
-    def __init__(self, n_sec=0, name='Wing', nn=1001, ns=101, project=True):
+    def __init__(self, n_sec=0, name='Wing', nn=1001, ns=101, project=True, dtype=None, vectorized=False):
         '''
         Initialize the CST surface (upper & lower)
         '''
-        super().__init__(n_sec=n_sec, name=name, nn=nn, ns=ns, project=project)
+        super().__init__(n_sec=n_sec, name=name, nn=nn, ns=ns, project=project, dtype=dtype, vectorized=vectorized)
 
         n_ = max(1, n_sec)
         self.secs = [ Section() for _ in range(n_) ]
@@ -1546,13 +1701,15 @@ class Surface(BasicSurface):
 #* ===========================================
 def interplot_sec(sec0: Section, sec1: Section, ratio: float):
     '''
-    Interplot a section by ratio. CST coefficients are gained by cst_foil_fit.
+    Interplot a section by ratio. CST coefficients are gained by cst_foil_fit,
+    the least square operator is cached, since the sections of a surface usually share the points xx.
 
     >>> sec = interplot_sec(sec0, sec1, ratio)
     '''
-    
-    sec = Section()
-    sec.copyfrom(sec0)
+    # All arrays are reassigned below, so the clone shares them with sec0 until then.
+    # The thickness constraint of sec0 is not copied (same as copyfrom).
+    sec = sec0.clone()
+    sec.thick_set = None
 
     sec.xLE   = (1-ratio)*sec0.xLE   + ratio*sec1.xLE
     sec.yLE   = (1-ratio)*sec0.yLE   + ratio*sec1.yLE
@@ -1571,7 +1728,7 @@ def interplot_sec(sec0: Section, sec1: Section, ratio: float):
     sec.y  = (1-ratio)*sec0.y + ratio*sec1.y
     sec.z  = (1-ratio)*sec0.z + ratio*sec1.z
 
-    sec.cst_u, sec.cst_l = cst_foil_fit(sec.xx, sec.yu, sec.xx, sec.yl, n_order=sec0.cst_u.shape[0])
+    sec.cst_u, sec.cst_l = cst_foil_fit(sec.xx, sec.yu, sec.xx, sec.yl, n_order=sec0.cst_u.shape[0], cache=True)
 
     return sec
 
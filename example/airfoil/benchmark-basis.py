@@ -0,0 +1,57 @@
+import time
+
+import numpy as np
+from scipy.special import factorial
+
+from cst_modeling.foil import bernstein, cst_curve, default_distribution, fit_curve
+
+
+def bernstein_factorial(x, n: int):
+    '''
+    The former evaluation of Bernstein polynomials by factorials
+    '''
+    x  = np.asarray(x, dtype=float)[:,None]
+    ii = np.arange(n+1)
+    xk_i_n = factorial(n)/factorial(ii)/factorial(n-ii)
+    return xk_i_n * np.power(x,ii) * np.power(1-x,n-ii)
+
+def timing(func, n_repeat=200):
+    t0 = time.perf_counter()
+    for _ in range(n_repeat):
+        func()
+    return (time.perf_counter()-t0)/n_repeat*1e6
+
+
+if __name__ == "__main__":
+
+    nn = 1001
+    x  = default_distribution(nn)
+
+    #* Throughput of the basis (without cache) and the curve (with cache)
+    print('%8s %14s %14s %14s %12s'%('n_order', 'factorial(us)', 'bernstein(us)', 'cst_curve(us)', 'sum(B)-1'))
+
+    for n_order in [4, 7, 10, 20, 40, 80, 200]:
+
+        n = n_order-1
+        coef = np.ones(n_order)
+
+        with np.errstate(all='ignore'):
+            t_old = timing(lambda: bernstein_factorial(x, n))
+            B_old = bernstein_factorial(x, n)
+
+        t_new = timing(lambda: bernstein(x, n))
+        t_crv = timing(lambda: cst_curve(nn, coef, x=x))
+
+        # Partition of unity, nan when the factorials overflow
+        err_old = np.max(np.abs(np.sum(B_old, axis=1)-1.0))
+        err_new = np.max(np.abs(np.sum(bernstein(x, n), axis=1)-1.0))
+
+        print('%8d %14.1f %14.1f %14.1f %12.2e (factorial: %.2e)'%(n_order, t_old, t_new, t_crv, err_new, err_old))
+
+    #* High order fitting of a smooth curve
+    y = 0.6*np.sqrt(x)*(1.0-x) + 0.02*np.sin(3*np.pi*x)*x*(1.0-x)
+
+    for n_order in [7, 20, 41]:
+        coef = fit_curve(x, y, n_order=n_order)
+        _, y_ = cst_curve(nn, coef, x=x)
+        print('fit_curve n_order=%3d  max error = %.3e'%(n_order, np.max(np.abs(y_-y))))
@@ -0,0 +1,58 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from cst_modeling.backend import available_backends, self_test
+
+
+def test_self_test_numpy(capsys):
+    assert self_test('numpy') == {}
+    assert capsys.readouterr().out == ''
+
+def test_self_test_numba(capsys):
+    pytest.importorskip('numba')
+    assert 'numba' in available_backends()
+
+    errors = self_test('numba')
+
+    assert len(errors) > 0
+    assert capsys.readouterr().out == ''
+
+def test_unavailable_backend():
+    env = dict(os.environ, CST_MODELING_BACKEND='unknown')
+    result = subprocess.run([sys.executable, '-W', 'error::RuntimeWarning', '-c', 'import cst_modeling.backend'],
+                            env=env, capture_output=True, text=True)
+
+    assert result.returncode != 0
+    assert 'RuntimeWarning' in result.stderr and 'CST_MODELING_BACKEND=unknown' in result.stderr
+
+def test_check_valid_backend(monkeypatch):
+    pytest.importorskip('numba')
+    from cst_modeling.backend import _KERNELS, get_backend, set_backend
+    from cst_modeling.foil import check_valid, check_valid_batch, cst_foil_batch
+
+    rng = np.random.default_rng(0)
+    cst_u = np.array([0.12, 0.12, 0.16, 0.14, 0.21, 0.15, 0.19])*(1+rng.normal(size=(200, 7)))
+    cst_l = np.array([-0.12, -0.13, -0.11, -0.25, -0.01, -0.12, 0.06])*(1+rng.normal(size=(200, 7)))
+    x, yu, yl, _, RLE = cst_foil_batch(101, cst_u, cst_l, dtype=np.float64)
+
+    # Count the calls of the numba kernel
+    calls = []
+    kernel = _KERNELS['curve_curvature_batch']['numba']
+    monkeypatch.setitem(_KERNELS['curve_curvature_batch'], 'numba', lambda *args: calls.append(1) or kernel(*args))
+
+    backend = get_backend()
+    try:
+        set_backend('numpy')
+        ref = check_valid_batch(x, yu, yl, RLE=RLE)
+        set_backend('numba')
+        rule_invalid = check_valid_batch(x, yu, yl, RLE=RLE)
+        assert check_valid(x, yu[0], yl[0], RLE=RLE[0]) == ref[0].astype(int).tolist()
+    finally:
+        set_backend(backend)
+
+    assert len(calls) == 4 and 'curve_curvature_batch' in self_test('numba')
+    assert np.array_equal(rule_invalid, ref) and np.count_nonzero(ref[:,3]) > 0
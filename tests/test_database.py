@@ -0,0 +1,115 @@
+import os
+
+import numpy as np
+import pytest
+
+from cst_modeling import database
+from cst_modeling.database import convert_database, load_database, read_airfoil, save_database
+from cst_modeling.foil import BASIS_CACHE, cst_foil
+
+CST_U = np.array([0.1185, 0.1189, 0.1557, 0.1367, 0.2092, 0.1483, 0.1935])
+CST_L = np.array([-0.1155, -0.1341, -0.1091, -0.2532, -0.0122, -0.1184, 0.0641])
+
+
+def write_airfoil(fname, cst_u, cst_l, selig=True, nn=81):
+    x, yu, yl, _, _ = cst_foil(nn, cst_u, cst_l, tail=0.004)
+
+    with open(fname, 'w') as f:
+        f.write('FOIL\n')
+        if selig:
+            for j in range(nn-1, -1, -1):
+                f.write(' %.9f %.9f\n'%(x[j], yu[j]))
+            for j in range(1, nn):
+                f.write(' %.9f %.9f\n'%(x[j], yl[j]))
+        else:
+            f.write(' %d. %d.\n\n'%(nn, nn))
+            for j in range(nn):
+                f.write(' %.9f %.9f\n'%(x[j], yu[j]))
+            f.write('\n')
+            for j in range(nn):
+                f.write(' %.9f %.9f\n'%(x[j], yl[j]))
+
+    return x, yu, yl
+
+@pytest.fixture
+def airfoils(tmp_path):
+    rng = np.random.default_rng(0)
+    files = []
+    for i in range(8):
+        fname = str(tmp_path / ('foil%02d.dat'%i))
+        write_airfoil(fname, CST_U*(1+0.1*rng.normal(size=7)), CST_L*(1+0.1*rng.normal(size=7)), selig=(i%2==0))
+        files.append(fname)
+
+    bad = str(tmp_path / 'bad.dat')
+    with open(bad, 'w') as f:
+        f.write('bad\n1 2\n')
+
+    return files + [bad]
+
+def as_dict(data):
+    return {f: (data['cst_u'][i], data['cst_l'][i], data['tail'][i]) for i, f in enumerate(data['files'])}
+
+
+@pytest.mark.parametrize('selig', [True, False])
+def test_read_airfoil(tmp_path, selig):
+    fname = str(tmp_path / 'foil.dat')
+    x, yu, yl = write_airfoil(fname, CST_U, CST_L, selig=selig)
+
+    name, xu_, yu_, xl_, yl_ = read_airfoil(fname)
+
+    assert name == 'FOIL'
+    assert np.allclose(xu_, x, atol=1e-9) and np.allclose(yu_, yu, atol=1e-9)
+    assert np.allclose(xl_, x, atol=1e-9) and np.allclose(yl_, yl, atol=1e-9)
+
+def test_convert_airfoil(tmp_path):
+    fname = str(tmp_path / 'foil.dat')
+    write_airfoil(fname, CST_U, CST_L)
+
+    BASIS_CACHE.clear()
+    result = database.convert_airfoil(fname)
+
+    assert np.allclose(result['cst_u'], CST_U, atol=1e-5)
+    assert np.allclose(result['cst_l'], CST_L, atol=1e-5)
+    assert abs(result['tail']-0.004) < 1e-8
+    assert len(BASIS_CACHE) == 0
+
+def test_resume(tmp_path, airfoils):
+    ref = convert_database(airfoils, str(tmp_path / 'ref.npz'), n_process=1, info=False)
+
+    fname = str(tmp_path / 'db.npz')
+    convert_database(airfoils[:4], fname, n_process=1, n_save=2, info=False)
+    data = convert_database(airfoils, fname, n_process=1, n_save=2, info=False)
+
+    assert data['files'] == ref['files']
+    assert data['error_files'] == ref['error_files'] == [airfoils[-1]]
+
+    ref, data = as_dict(ref), as_dict(data)
+    for f in ref:
+        for a, b in zip(ref[f], data[f]):
+            assert np.array_equal(a, b)
+
+def test_process_pool(tmp_path, airfoils):
+    ref  = convert_database(airfoils, str(tmp_path / 'ref.npz'), n_process=1, info=False)
+    data = convert_database(airfoils, str(tmp_path / 'db.npz'), n_process=2, info=False)
+
+    ref, data = as_dict(ref), as_dict(data)
+    assert sorted(ref) == sorted(data)
+    for f in ref:
+        for a, b in zip(ref[f], data[f]):
+            assert np.allclose(a, b, rtol=0.0, atol=1e-14)
+
+def test_atomic_checkpoint(tmp_path, airfoils, monkeypatch):
+    fname = str(tmp_path / 'db.npz')
+    convert_database(airfoils[:2], fname, n_process=1, info=False)
+    data = load_database(fname)
+
+    def fail(*args, **kwargs):
+        raise OSError('disk full')
+
+    monkeypatch.setattr(np, 'savez_compressed', fail)
+    with pytest.raises(OSError):
+        save_database(fname, data)
+
+    # The archive of the last checkpoint is still complete
+    assert load_database(fname)['files'] == airfoils[:2]
+    assert not os.path.exists(fname+'.tmp')
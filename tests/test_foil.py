@@ -0,0 +1,450 @@
+from math import comb
+
+import numpy as np
+import pytest
+
+CST_U = np.array([0.1185, 0.1189, 0.1557, 0.1367, 0.2092, 0.1483, 0.1935])
+CST_L = np.array([-0.1155, -0.1341, -0.1091, -0.2532, -0.0122, -0.1184, 0.0641])
+
+from cst_modeling.foil import (BASIS_CACHE, SECTION_CACHE, BasicSection, CSTPrefilter, LRUCache, Section,
+                               SectionArray, StreamingCurveFit, apply_transform, check_valid, check_valid_batch,
+                               cst_basis, cst_curve, cst_foil, cst_foil_batch, cst_foil_fit, cst_foil_fit_auto_order,
+                               fit_curve, fit_curve_auto_order, fit_curve_with_twist, fit_curves_batch,
+                               naca_series_list, rotate, transform, transform_matrix)
+from cst_modeling.naca import naca_batch
+
+
+def cst_curve_loop(x, coef, xn1=0.5, xn2=1.0):
+    '''
+    Reference of cst_curve, evaluated point by point
+    '''
+    n_order = coef.shape[0]
+    y = np.zeros(x.shape[0])
+    for ip in range(x.shape[0]):
+        s_psi = 0.0
+        for i in range(n_order):
+            s_psi += coef[i]*comb(n_order-1, i)*x[ip]**i*(1-x[ip])**(n_order-1-i)
+        y[ip] = x[ip]**xn1*(1-x[ip])**xn2*s_psi
+
+    y[0] = 0.0
+    y[-1] = 0.0
+    return y
+
+def fit_curve_loop(x, y, n_order=7, xn1=0.5, xn2=1.0):
+    '''
+    Reference of fit_curve, with the basis matrix built point by point
+    '''
+    x_ = (x-x[0])/(x[-1]-x[0])
+    A = np.zeros((x.shape[0], n_order))
+    for i in range(n_order):
+        A[:,i] = cst_curve_loop(x_, np.eye(n_order)[i], xn1, xn2)
+    return np.linalg.lstsq(A, y-x_*y[-1], rcond=None)[0]
+
+def check_valid_loop(x, yu, yl, RLE=0.0, neg_tcri=0.0):
+    '''
+    Reference of check_valid, with the rules checked point by point
+    '''
+    nn = x.shape[0]
+    thickness = yu-yl
+    camber = 0.5*(yu+yl)
+
+    curvs = []
+    for y in [yu, yl]:
+        curv = np.zeros(nn)
+        for i in range(1, nn-1):
+            a = np.hypot(x[i-1]-x[i], y[i-1]-y[i])
+            b = np.hypot(x[i]-x[i+1], y[i]-y[i+1])
+            c = np.hypot(x[i+1]-x[i-1], y[i+1]-y[i-1])
+            p = 0.5*(a+b+c)
+            curv[i] = 0.0 if a*b*c <= 1e-12 else 4.0*np.sqrt(p*(p-a)*(p-b)*(p-c))/(a*b*c)
+            if (x[i]-x[i-1])*(y[i+1]-y[i-1]) < (y[i]-y[i-1])*(x[i+1]-x[i-1]):
+                curv[i] = -curv[i]
+        curv[0] = curv[1]
+        curv[-1] = curv[-2]
+        curvs.append(curv)
+
+    rule_invalid = [0]*10
+    i_max = np.argmax(thickness)
+    t0 = thickness[i_max]
+
+    if np.min(thickness) < neg_tcri:
+        rule_invalid[0] = 1
+
+    if x[i_max] < 0.15 or x[i_max] > 0.75:
+        rule_invalid[1] = 1
+
+    n_extreme = 0
+    for i in range(nn-2):
+        if (thickness[i+2]-thickness[i+1])*(thickness[i]-thickness[i+1]) >= 0.0:
+            n_extreme += 1
+    if n_extreme > 2:
+        rule_invalid[2] = 1
+
+    cur_max = max([abs(curv[i]) for curv in curvs for i in range(nn) if x[i] >= 0.1] + [0.0])
+    if cur_max > 5:
+        rule_invalid[3] = 1
+
+    cam_max = max([abs(camber[i]) for i in range(nn) if 0.2 <= x[i] <= 0.7] + [0.0])
+    if cam_max > 0.025:
+        rule_invalid[4] = 1
+
+    if RLE > 0.0 and (RLE < 0.005 or RLE/t0 < 0.01):
+        rule_invalid[5] = 1
+
+    ii = int(0.1*nn)+1
+    a0 = thickness[i_max]/x[i_max]
+    if yu[ii]/x[ii]/a0 < 1.0 or -yl[ii]/x[ii]/a0 < 1.0:
+        rule_invalid[6] = 1
+
+    return rule_invalid
+
+def transform_loop(x, y, scale=1.0, rot=None, x0=None, y0=None, dx=0.0, dy=0.0, proj=False):
+    '''
+    Reference of transform, by translation, scale and rotation point by point in float64
+    '''
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    x0 = x[0]+dx if x0 is None else x0
+    y0 = y[0]+dy if y0 is None else y0
+
+    angle = 0.0 if rot is None else rot/180.0*np.pi
+    rr = scale/np.cos(angle) if proj else scale
+
+    x_new = np.zeros_like(x)
+    y_new = np.zeros_like(y)
+    for i in range(x.shape[0]):
+        xs = x0 + (x[i]+dx-x0)*rr
+        ys = y0 + (y[i]+dy-y0)*rr
+        x_new[i] = x0 + (xs-x0)*np.cos(angle) - (ys-y0)*np.sin(angle)
+        y_new[i] = y0 + (xs-x0)*np.sin(angle) + (ys-y0)*np.cos(angle)
+
+    return x_new, y_new
+
+def random_coefs(n_sample, scale=0.4, seed=0):
+    rng = np.random.default_rng(seed)
+    cu = CST_U*(1+scale*rng.normal(size=(n_sample, 7)))
+    cl = CST_L*(1+scale*rng.normal(size=(n_sample, 7)))
+    return cu, cl
+
+def basic_section(i, nn=21, power=None):
+    sec = BasicSection(chord=1.0+0.1*i, twist=2.0*i)
+    sec.xLE = 0.1*i
+    sec.zLE = 1.0*i
+
+    x = np.linspace(0, 1, nn)**(1.0+0.5*i if power is None else power)
+    sec.xx = x
+    sec.yu = 0.1*np.sin(np.pi*x)*(1+0.1*i)
+    sec.yl = -0.05*np.sin(np.pi*x)
+    return sec
+
+
+@pytest.mark.parametrize('power', [None, 1.0])
+@pytest.mark.parametrize('flip_x', [False, True])
+def test_section_array_basic(power, flip_x):
+    ref = [basic_section(i, power=power) for i in range(4)]
+    for sec in ref:
+        sec.section(flip_x=flip_x)
+
+    secs = [basic_section(i, power=power) for i in range(4)]
+    array = SectionArray(secs)
+    array.section(flip_x=flip_x)
+    array.update_sections(secs)
+
+    for sec, sec_ref in zip(secs, ref):
+        for name in ['xx', 'x', 'y', 'z']:
+            assert np.allclose(getattr(sec, name), getattr(sec_ref, name), rtol=0.0, atol=1e-14)
+
+def test_section_array_batchable():
+    assert SectionArray.batchable([basic_section(0), basic_section(1)])
+    assert not SectionArray.batchable([basic_section(0), basic_section(1, nn=31)])
+
+    with pytest.raises(Exception):
+        SectionArray([basic_section(0), basic_section(1, nn=31)])
+
+def test_lru_cache_put():
+    a = np.ones(10)
+
+    # Values that are not stored are not changed
+    assert LRUCache(enabled=False).put('a', a) is a
+    assert LRUCache(max_bytes=8).put('a', a) is a
+    assert a.flags.writeable
+
+    cache = LRUCache(max_bytes=200)
+    b = cache.put('b', a, copy_arrays=True)
+    assert a.flags.writeable and not b.flags.writeable
+    assert cache.get('b') is b and cache.nbytes == 80
+
+    cache.put('c', np.ones(20))
+    assert cache.get('b') is None and cache.evictions == 1
+
+def cached_section(**kwargs):
+    sec = Section(thick=0.1, chord=1.2, twist=2.0, tail=0.002)
+    sec.xLE, sec.yLE, sec.zLE = 0.1, 0.05, 1.0
+    sec.cst_u, sec.cst_l = CST_U.copy(), CST_L.copy()
+    for key, value in kwargs.items():
+        setattr(sec, key, value)
+    return sec
+
+@pytest.fixture
+def section_cache(monkeypatch):
+    monkeypatch.setattr(SECTION_CACHE, 'enabled', True)
+    monkeypatch.setattr(SECTION_CACHE, 'max_bytes', SECTION_CACHE.max_bytes)
+    SECTION_CACHE.clear()
+    yield SECTION_CACHE
+    SECTION_CACHE.clear()
+
+def test_section_cache_hit(section_cache):
+    ref = cached_section()
+    section_cache.enabled = False
+    ref.section(nn=51)
+    section_cache.enabled = True
+
+    cached_section().section(nn=51)
+    sec = cached_section()
+    sec.section(nn=51)
+    assert section_cache.misses == 1 and section_cache.hits == 1 and not sec.dirty
+
+    # A hit gives writable copies with the same values as a fresh build
+    for name in ['xx', 'yu', 'yl', 'x', 'y', 'z']:
+        assert np.array_equal(getattr(sec, name), getattr(ref, name)) and getattr(sec, name).flags.writeable
+    assert sec.thick == ref.thick and sec.RLE == ref.RLE
+
+    sec.x[0] += 1.0
+    sec_ = cached_section()
+    sec_.section(nn=51)
+    assert np.array_equal(sec_.x, ref.x)
+
+@pytest.mark.parametrize('params, kwargs', [
+    ({'cst_u': CST_U*1.01}, {}), ({'cst_l': CST_L*1.01}, {}),
+    ({'refine_u': np.array([0.001, 0.002])}, {}), ({'refine_l': np.array([0.001, 0.002])}, {}),
+    ({'cst_flip_u': np.array([0.001, 0.002])}, {}), ({'cst_flip_l': np.array([0.001, 0.002])}, {}),
+    ({'thick_set': 0.11}, {}), ({'thick_set': None}, {}), ({'tail': 0.0}, {}),
+    ({'chord': 1.3}, {}), ({'twist': 1.0}, {}), ({'xLE': 0.2}, {}), ({'yLE': 0.0}, {}), ({'zLE': 2.0}, {}),
+    ({}, {'nn': 61}), ({}, {'flip_x': True}), ({}, {'proj': False}), ({}, {'dtype': np.float32}),
+])
+def test_section_cache_key(section_cache, params, kwargs):
+    args = dict(nn=51, flip_x=False, proj=True, dtype=np.float64)
+    cached_section().section(**args)
+
+    sec = cached_section(**params)
+    sec.section(**dict(args, **kwargs))
+    assert section_cache.misses == 2 and section_cache.hits == 0
+
+    ref = cached_section(**params)
+    section_cache.enabled = False
+    ref.section(**dict(args, **kwargs))
+    assert np.array_equal(sec.x, ref.x) and np.array_equal(sec.y, ref.y) and sec.x.dtype == ref.x.dtype
+
+def test_section_cache_eviction(section_cache):
+    cached_section().section(nn=51)
+    nbytes = section_cache.nbytes
+    section_cache.resize(int(2.5*nbytes))
+
+    for twist in [1.0, 3.0]:
+        cached_section(twist=twist).section(nn=51)
+    assert section_cache.evictions == 1 and len(section_cache) == 2 and section_cache.nbytes <= 2.5*nbytes
+
+    # The least recently used section is evicted
+    cached_section().section(nn=51)
+    cached_section(twist=3.0).section(nn=51)
+    assert section_cache.misses == 4 and section_cache.hits == 1
+
+def test_check_valid():
+    x, yu, yl, _, RLE = cst_foil(101, CST_U, CST_L)
+
+    assert check_valid(x, yu, yl, RLE=RLE) == [0]*10
+    assert check_valid(x, yl, yu)[0] == 1
+
+    cu, cl = random_coefs(200, scale=1.0)
+    RLE = np.linspace(0.0, 0.02, 200)
+    _, YU, YL, _, _ = cst_foil_batch(101, cu, cl, x=x, dtype=np.float64)
+
+    rule_invalid = check_valid_batch(x, YU, YL, RLE=RLE, neg_tcri=-0.002)
+    n_invalid = np.zeros(10, dtype=int)
+    for i in range(200):
+        ref = check_valid_loop(x, YU[i], YL[i], RLE=RLE[i], neg_tcri=-0.002)
+        assert check_valid(x, YU[i], YL[i], RLE=RLE[i], neg_tcri=-0.002) == ref
+        assert rule_invalid[i].astype(int).tolist() == ref
+        n_invalid += ref
+
+    # The random airfoils break each of the 7 rules at least once, and pass them at least once
+    assert np.all(n_invalid[:7] > 0) and np.all(n_invalid[:7] < 200)
+
+def test_fit_auto_order():
+    x, yu, yl, _, _ = cst_foil(201, CST_U, CST_L, tail=0.003)
+    BASIS_CACHE.clear()
+
+    coef, n_order, history = fit_curve_auto_order(x, yu, tol=1e-9)
+    assert n_order == 7 and history.shape == (7,) and history[-1] <= 1e-9
+    assert np.allclose(coef, fit_curve(x, yu, n_order=7), rtol=0.0, atol=1e-12)
+
+    _, n_order, history_ = fit_curve_auto_order(x, yu, tol=1e-9, min_order=4)
+    assert n_order == 7 and np.allclose(history_, history[3:], rtol=1e-6, atol=1e-14)
+    for i in range(4):
+        b = yu - x*yu[-1]
+        rms = np.sqrt(np.mean((np.dot(cst_basis(x, i+1, cache=False), fit_curve(x, yu, n_order=i+1)) - b)**2))
+        assert abs(history[i] - rms) <= 1e-6*rms
+
+    for xl, yl_ in [(x, yl), (x[::2], yl[::2])]:
+        cst_u, cst_l, n_order, history = cst_foil_fit_auto_order(x, yu, xl, yl_, tol=1e-9)
+        ref_u, ref_l = cst_foil_fit(x, yu, xl, yl_, n_order=7)
+        assert n_order == 7 and history.shape == (7, 2)
+        assert np.allclose(cst_u, ref_u, rtol=0.0, atol=1e-12) and np.allclose(cst_l, ref_l, rtol=0.0, atol=1e-12)
+
+    assert len(BASIS_CACHE) == 0
+
+@pytest.mark.parametrize('xn1, xn2', [(0.5, 1.0), (1.0, 0.5), (0.3, 1.2)])
+def test_cst_curve(xn1, xn2):
+    x, y = cst_curve(101, CST_U, xn1=xn1, xn2=xn2, dtype=np.float64)
+
+    assert y[0] == 0.0 and y[-1] == 0.0
+    assert np.allclose(y, cst_curve_loop(x, CST_U, xn1, xn2), rtol=0.0, atol=1e-14)
+
+def test_fit_curve():
+    x = np.linspace(0.2, 1.3, 81)
+    y = np.sin(3*x) + 0.1*x**2
+
+    coef = fit_curve(x, y)
+    assert np.allclose(coef, fit_curve_loop(x, y), rtol=0.0, atol=1e-9)
+
+    Y = np.array([y, 2*y, np.cos(x)])
+    coefs = fit_curves_batch(x, Y)
+    for i in range(3):
+        assert np.allclose(coefs[i], fit_curve_loop(x, Y[i]), rtol=0.0, atol=1e-9)
+
+    BASIS_CACHE.clear()
+    assert np.allclose(fit_curve(x, y, cache=True), coef, rtol=0.0, atol=1e-9)
+    cst_u, cst_l = cst_foil_fit(x, Y[0], x, Y[2], cache=True)
+    assert len(BASIS_CACHE) == 1 and BASIS_CACHE.hits == 1
+    assert np.allclose(cst_u, coef, rtol=0.0, atol=1e-9) and np.allclose(cst_l, coefs[2], rtol=0.0, atol=1e-9)
+
+@pytest.mark.parametrize('t', [None, 0.1])
+def test_cst_foil_batch(t):
+    cu, cl = random_coefs(20)
+    tail = np.linspace(0.0, 0.01, 20)
+
+    x, yu, yl, t0, R0 = cst_foil_batch(101, cu, cl, t=t, tail=tail, dtype=np.float64)
+    for i in range(20):
+        x_, yu_, yl_, t0_, R0_ = cst_foil(101, cu[i], cl[i], t=t, tail=tail[i], dtype=np.float64)
+        assert np.array_equal(x, x_)
+        assert np.allclose(yu[i], yu_, rtol=0.0, atol=1e-14) and np.allclose(yl[i], yl_, rtol=0.0, atol=1e-14)
+        assert abs(t0[i]-t0_) < 1e-14 and abs(R0[i]-R0_) < 1e-12
+
+@pytest.mark.parametrize('tail, neg_tcri', [(0.0, 0.0), (0.004, 0.0), (0.0, -0.01)])
+def test_prefilter(tail, neg_tcri):
+    cu, cl = random_coefs(2000, scale=0.6)
+    x, yu, yl, _, R0 = cst_foil_batch(101, cu, cl, tail=tail, dtype=np.float64)
+
+    status = CSTPrefilter(101, x=x, tail=tail, neg_tcri=neg_tcri).check(cu, cl)
+    rule_invalid = check_valid_batch(x, yu, yl, RLE=R0, neg_tcri=neg_tcri)
+
+    # A rule proved to pass (0) or fail (1) is never contradicted by the full check
+    assert not np.any(np.logical_and(status==0, rule_invalid))
+    assert not np.any(np.logical_and(status==1, np.logical_not(rule_invalid)))
+    assert np.count_nonzero(status==1) > 0 and np.count_nonzero(status[:,:7]==0) > 0
+
+def test_naca_series_list():
+    series = naca_series_list()
+    five_digit = [s for s in series if len(s) == 5]
+
+    # Only the standard camber lines, the 5-digit generator has no reflexed camber line
+    assert len(series) == 40*82 + 9*5 and len(set(series)) == len(series)
+    assert sorted(set(s[:3] for s in five_digit)) == ['210', '220', '230', '240', '250']
+
+def test_naca_batch_invalid_series():
+    with pytest.raises(Exception, match='0012345, 012'):
+        naca_batch(['0012', '0012345', '23012', '012'], 50)
+
+@pytest.mark.parametrize('twist', [False, True])
+def test_streaming_curve_fit(twist):
+    x = np.linspace(0.2, 1.3, 301)
+    y = 0.1*np.sin(3*x) + 0.05*x**2 + (0.3*(x-0.2) if twist else 0.0)
+
+    if twist:
+        ref = fit_curve_with_twist(x, y)
+        x_, y_, _ = rotate((x-x[0])/ref[1], (y-y[0])/ref[1], None, angle=-ref[2], axis='Z')
+    else:
+        ref = fit_curve(x, y), x[-1]-x[0], 0.0, 0.0
+        x_, y_ = x, y
+
+    # Residual norm of the same least square problem by lstsq
+    x_ = (x_-x_[0])/(x_[-1]-x_[0])
+    A = cst_basis(x_, 7, cache=False)
+    b = y_ - x_*y_[-1]
+    residual = np.sqrt(np.linalg.lstsq(A, b, rcond=None)[1][0])
+
+    # Chunks smaller than n_order+1 rows, with the points shuffled
+    index = np.random.default_rng(0).permutation(x.shape[0])
+    fit = StreamingCurveFit([x[0], y[0]], [x[-1], y[-1]], n_order=7, twist=twist)
+    for i0 in range(0, x.shape[0], 5):
+        fit.add_points(x[index[i0:i0+5]], y[index[i0:i0+5]])
+
+    coef, chord, angle, thick = fit.result()
+    assert fit.n_point == x.shape[0]
+    assert np.allclose(coef, ref[0], rtol=0.0, atol=1e-12)
+    assert abs(chord-ref[1]) < 1e-14 and abs(angle-ref[2]) < 1e-12 and abs(thick-ref[3]) < 1e-14
+    assert abs(fit.residual-residual) < 1e-12
+
+@pytest.mark.parametrize('rot', [None, 12.0])
+@pytest.mark.parametrize('proj', [False, True])
+@pytest.mark.parametrize('dtype', [np.float64, np.float32])
+def test_transform(rot, proj, dtype):
+    x, yu, yl, _, _ = cst_foil(101, CST_U, CST_L, tail=0.004, dtype=np.float64)
+    kwargs = dict(scale=1.7, rot=rot, dx=0.3, dy=-0.2, proj=proj)
+    atol = 1e-14 if dtype == np.float64 else 1e-6
+
+    xu_, xl_, yu_, yl_ = transform(x.astype(dtype), x.astype(dtype), yu.astype(dtype), yl.astype(dtype), **kwargs)
+    y0 = 0.5*(yu[0]+yl[0]) - 0.2
+    xu_ref, yu_ref = transform_loop(x, yu, y0=y0, **kwargs)
+    xl_ref, yl_ref = transform_loop(x, yl, y0=y0, **kwargs)
+
+    assert xu_.dtype == dtype and yl_.dtype == dtype
+    for a, b in [(xu_, xu_ref), (xl_, xl_ref), (yu_, yu_ref), (yl_, yl_ref)]:
+        assert np.allclose(a, b, rtol=0.0, atol=atol)
+
+@pytest.mark.parametrize('closed', [False, True])
+@pytest.mark.parametrize('proj, flip_x', [(False, False), (True, False), (True, True)])
+@pytest.mark.parametrize('dtype', [np.float64, np.float32])
+def test_section_transform(closed, proj, flip_x, dtype):
+    sec = basic_section(2)
+    if not closed:
+        sec.yy, sec.yu, sec.yl = sec.yu, None, None
+    xx = np.flip(sec.xx) if flip_x else sec.xx
+    atol = 1e-14 if dtype == np.float64 else 1e-6
+
+    kwargs = dict(scale=sec.chord, rot=sec.twist, dx=sec.xLE, dy=sec.yLE, proj=proj)
+    if closed:
+        y0 = 0.5*(sec.yu[0]+sec.yl[0]) + sec.yLE
+        xu, yu = transform_loop(xx, sec.yu, y0=y0, **kwargs)
+        xl, yl = transform_loop(xx, sec.yl, y0=y0, **kwargs)
+        x_ref = np.concatenate((np.flip(xl), xu[1:]))
+        y_ref = np.concatenate((np.flip(yl), yu[1:]))
+    else:
+        x_ref, y_ref = transform_loop(xx, sec.yy, **kwargs)
+
+    sec.section(flip_x=flip_x, proj=proj, dtype=dtype)
+
+    assert sec.x.dtype == dtype and sec.y.dtype == dtype and np.all(sec.z == sec.zLE)
+    assert np.allclose(sec.x, x_ref, rtol=0.0, atol=atol) and np.allclose(sec.y, y_ref, rtol=0.0, atol=atol)
+
+def test_transform_matrix_batch():
+    ns = 5
+    scale = np.linspace(0.5, 2.0, ns)
+    rot = np.linspace(-10.0, 20.0, ns)
+    x0, y0 = np.linspace(0.0, 1.0, ns), np.linspace(-0.1, 0.1, ns)
+    dx, dy = np.linspace(0.0, 0.4, ns), np.linspace(0.3, 0.0, ns)
+
+    x = np.linspace(0.0, 1.0, 21)
+    Y = np.array([0.1*np.sin(np.pi*x)*(1+0.1*i) for i in range(ns)])
+
+    for proj in [False, True]:
+        M = transform_matrix(scale=scale, rot=rot, x0=x0, y0=y0, dx=dx, dy=dy, proj=proj)
+        X_, Y_ = apply_transform(M, x, Y)
+        assert M.shape == (ns, 2, 3) and X_.shape == (ns, 21)
+
+        for i in range(ns):
+            M_ = transform_matrix(scale=scale[i], rot=rot[i], x0=x0[i], y0=y0[i], dx=dx[i], dy=dy[i], proj=proj)
+            x_ref, y_ref = transform_loop(x, Y[i], scale=scale[i], rot=rot[i], x0=x0[i], y0=y0[i],
+                                          dx=dx[i], dy=dy[i], proj=proj)
+            assert np.array_equal(M[i], M_)
+            assert np.allclose(X_[i], x_ref, rtol=0.0, atol=1e-14) and np.allclose(Y_[i], y_ref, rtol=0.0, atol=1e-14)
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from cst_modeling.sampler import sample_airfoils, screen_airfoils
+
+CST_U = np.array([0.1185, 0.1189, 0.1557, 0.1367, 0.2092, 0.1483, 0.1935])
+CST_L = np.array([-0.1155, -0.1341, -0.1091, -0.2532, -0.0122, -0.1184, 0.0641])
+
+
+@pytest.mark.parametrize('tail, neg_tcri', [(0.0, 0.0), (0.004, -0.005)])
+def test_staged_screening(tail, neg_tcri):
+    rng = np.random.default_rng(0)
+    cst_u = CST_U*(1+0.6*rng.normal(size=(3000, 7)))
+    cst_l = CST_L*(1+0.6*rng.normal(size=(3000, 7)))
+
+    ref, n_fail_ref, n_check_ref, _ = screen_airfoils(cst_u, cst_l, nn=501, tail=tail, neg_tcri=neg_tcri,
+                                                        prefilter=False)
+    valid, n_fail, n_check, stats = screen_airfoils(cst_u, cst_l, nn=501, stages=[51, 201], tail=tail,
+                                                    neg_tcri=neg_tcri)
+
+    assert 0 < np.count_nonzero(ref) < 3000
+    assert np.array_equal(valid, ref)
+    assert np.sum(n_fail) <= np.sum(n_fail_ref)
+    assert stats.shape == (4, 4) and stats[-1,2] == np.count_nonzero(ref)
+
+    # Without prefilter and stages, all rules check all airfoils
+    assert np.all(n_check_ref == 3000)
+    assert np.all(n_fail <= n_check) and np.all(n_check >= stats[-1,1]) and np.any(n_check < 3000)
+
+def test_sample_airfoils():
+    lower_upp, upper_upp = 0.8*CST_U, 1.2*CST_U
+    lower_low, upper_low = np.minimum(0.8*CST_L, 1.2*CST_L), np.maximum(0.8*CST_L, 1.2*CST_L)
+
+    kwargs = dict(nn=201, seed=1, n_batch=256, n_process=1, max_sample=4096, info=False)
+    data = sample_airfoils(100, lower_upp, upper_upp, lower_low, upper_low, stages=[51], **kwargs)
+    ref  = sample_airfoils(100, lower_upp, upper_upp, lower_low, upper_low, prefilter=False, **kwargs)
+
+    assert np.array_equal(data['cst_u'], ref['cst_u']) and np.array_equal(data['cst_l'], ref['cst_l'])
+
+    # Samples rejected by the prefilter or the coarse stage are not checked by all rules
+    assert np.any(data['n_check'][:7] < data['n_sample']) and np.all(ref['n_check'] == ref['n_sample'])
+    assert np.array_equal(data['acceptance'], 1.0-data['n_fail']/data['n_check'])
+
+def test_sample_airfoils_process_pool():
+    lower_upp, upper_upp = 0.8*CST_U, 1.2*CST_U
+    lower_low, upper_low = np.minimum(0.8*CST_L, 1.2*CST_L), np.maximum(0.8*CST_L, 1.2*CST_L)
+
+    kwargs = dict(nn=201, seed=2, n_batch=64, stages=[51], info=False)
+    ref  = sample_airfoils(300, lower_upp, upper_upp, lower_low, upper_low, n_process=1, **kwargs)
+    data = sample_airfoils(300, lower_upp, upper_upp, lower_low, upper_low, n_process=3, **kwargs)
+
+    assert ref['cst_u'].shape[0] == 300 and ref['n_batch'] > 3
+    for key in ['cst_u', 'cst_l', 'n_fail', 'n_check']:
+        assert np.array_equal(data[key], ref[key])
+    assert data['n_batch'] == ref['n_batch'] and data['n_sample'] == ref['n_sample']
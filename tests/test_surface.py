@@ -0,0 +1,142 @@
+import numpy as np
+import pytest
+
+from cst_modeling.surface import Surface, interplot_sec
+
+
+def wing(n_sec=6, nn=101, ns=11):
+    surf = Surface(n_sec=n_sec, nn=nn, ns=ns)
+    for i, sec in enumerate(surf.secs):
+        sec.xLE = 0.1*i
+        sec.zLE = float(i)
+        sec.chord = 2.0-0.1*i
+        sec.twist = 1.0-0.2*i
+        sec.thick_set = 0.12
+        sec.cst_u = np.array([0.12, 0.12, 0.15, 0.14, 0.20, 0.15, 0.19])
+        sec.cst_l = np.array([-0.12, -0.13, -0.11, -0.25, -0.01, -0.12, 0.06])
+    return surf
+
+def max_difference(surf0, surf1):
+    return max(np.abs(a-b).max() for s0, s1 in zip(surf0.surfs, surf1.surfs) for a, b in zip(s0, s1))
+
+def wing_like(surfs):
+    surf = wing()
+    surf.surfs = surfs
+    return surf
+
+
+@pytest.mark.parametrize('vectorized', [False, True])
+def test_incremental_geo(vectorized):
+    surf = wing()
+    surf.vectorized = vectorized
+    surf.geo()
+
+    surf.secs[2].chord = 1.7
+    surf.secs[5].cst_u = surf.secs[5].cst_u*1.05
+    report = surf.geo(incremental=True)
+    assert not report['full'] and report['sections'] == [2, 5]
+
+    ref = wing()
+    ref.secs[2].chord = 1.7
+    ref.secs[5].cst_u = ref.secs[5].cst_u*1.05
+    ref.geo()
+    assert max_difference(surf, ref) < 1e-14
+
+    report = surf.geo(incremental=True)
+    assert report['sections'] == [] and report['surfaces'] == []
+
+def test_incremental_after_geo_axisymmetric():
+    surf = wing()
+    surf.geo()
+    surf.geo_axisymmetric(phi=np.linspace(0.0, 90.0, surf.n_sec), update_sec=False)
+
+    report = surf.geo(incremental=True)
+    assert report['full']
+
+    ref = wing()
+    ref.geo()
+    assert max_difference(surf, ref) == 0.0
+
+def test_copyfrom_is_independent():
+    surf = wing()
+    surf.geo()
+    other = Surface(n_sec=surf.n_sec)
+    other.copyfrom(surf)
+
+    x0 = other.surfs[0][0][0,0]
+    surf.surfs[0][0][0,0] += 1.0
+    surf.secs[0].x[0] += 1.0
+
+    assert other.surfs[0][0][0,0] == x0
+    assert other.secs[0].x[0] == x0
+    assert surf.surfs[0][0].flags.writeable and surf.secs[0].x.flags.writeable
+
+def test_clone_isolation():
+    surf = wing()
+    surf.geo()
+    ref = [[a.copy() for a in s] for s in surf.surfs]
+
+    clone = surf.clone()
+    clone2 = clone.clone()
+
+    # Library functions on either side do not change the other
+    surf.translate(dX=1.0)
+    clone2.smooth(1, 3)
+    assert max_difference(clone, wing_like(ref)) == 0.0
+    assert np.abs(surf.surfs[0][0]-ref[0][0]-1.0).max() < 1e-12
+
+    # In-place operators on the clone make a copy, and the source arrays are not frozen
+    x0 = surf.secs[2].x.copy()
+    clone.secs[2].x += 1.0
+    assert np.array_equal(surf.secs[2].x, x0)
+    surf.secs[2].x += 1.0
+    assert np.array_equal(surf.secs[2].x, x0+1.0)
+
+    # Parameters of the clone are its own
+    clone.secs[3].chord = 1.5
+    report = clone.geo(incremental=True)
+    assert report['sections'] == [3] and not surf.secs[3].dirty
+    assert np.abs(surf.surfs[2][0]-ref[2][0]-1.0).max() < 1e-12
+
+def test_interplot_sec_clone():
+    surf = wing()
+    surf.geo_secs()
+    sec0 = surf.secs[1]
+    x0, cst_u0 = sec0.x.copy(), sec0.cst_u.copy()
+
+    sec = interplot_sec(sec0, surf.secs[2], ratio=0.5)
+    assert sec.thick_set is None and sec.dirty and abs(sec.zLE-1.5) < 1e-14
+    assert np.allclose(sec.x, 0.5*(sec0.x+surf.secs[2].x), rtol=0.0, atol=1e-14)
+
+    # The new section owns its arrays
+    sec.x[0] += 1.0
+    sec.cst_u[0] += 1.0
+    assert np.array_equal(sec0.x, x0) and np.array_equal(sec0.cst_u, cst_u0)
+
+    # Writes on sec0 copy or raise
+    x1 = sec.x.copy()
+    sec0.x += 1.0
+    assert np.array_equal(sec0.x, x0+1.0) and np.array_equal(sec.x, x1)
+
+def test_clone_source_writes():
+    surf = wing()
+    surf.geo()
+    clone = surf.clone()
+    ref = [[a.copy() for a in s] for s in clone.surfs]
+    x0, cst_u0 = clone.secs[1].x.copy(), clone.secs[1].cst_u.copy()
+
+    # Item assignment on the source raises, instead of changing the clone
+    for array in [surf.surfs[0][0], surf.secs[1].x, surf.secs[1].cst_u]:
+        with pytest.raises(ValueError):
+            array[0] = 0.0
+
+    # In-place operators and library functions on the source copy the arrays
+    surf.secs[1].x += 1.0
+    surf.secs[1].cst_u *= 1.1
+    surf.surfs[0][0] += 1.0
+    surf.translate(dX=1.0)
+    surf.smooth(1, 3)
+
+    assert max_difference(clone, wing_like(ref)) == 0.0
+    assert np.array_equal(clone.secs[1].x, x0) and np.array_equal(clone.secs[1].cst_u, cst_u0)
+    assert abs(surf.secs[1].x[0]-x0[0]-1.0) < 1e-14